@@ -2,17 +2,38 @@ from __future__ import annotations
 
 import os
 import json
+import asyncio
 import hashlib
-from typing import Dict, Optional
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple, Union
 
-from fastapi.encoders import jsonable_encoder
-from openai import OpenAI
+from pydantic import ValidationError
 
-from .schemas import PlanGenerateInput, PlanResponse, PlanReviseInput
+from fastapi.encoders import jsonable_encoder
+from openai import AsyncOpenAI, OpenAI
+
+from .env import env_int
+from .llm_policy import call_policy
+from .llm_providers import make_async_client, make_client
+from .metrics import record_llm_usage, track_llm
+from .plan_cache import get_plan_cache
+from .plan_patch import apply_patch, render_plan_lines
+from .plan_similarity import near_duplicates
+from .plan_stream import PlanItemParser
+from .schemas import (
+    DetailLevel,
+    PlanDraftResponse,
+    PlanGenerateInput,
+    PlanPatch,
+    PlanResponse,
+    PlanReviseInput,
+    ProposeMilestone,
+    ProposeTask,
+)
 
 _client: OpenAI | None = None
-_cache: Dict[str, PlanResponse] = {}
-_revise_cache: Dict[str, PlanResponse] = {}
+_async_client: AsyncOpenAI | None = None
+_llm_semaphore: asyncio.Semaphore | None = None
+_inflight: Dict[str, "_Flight"] = {}
 
 
 def _clean_opt(v: Optional[str]) -> Optional[str]:
@@ -26,6 +47,28 @@ def _model_name() -> str:
     return os.getenv("OPENAI_MODEL", "gpt-4.1-mini")
 
 
+def _max_concurrency() -> int:
+    return max(1, env_int("OPENAI_MAX_CONCURRENCY", 16))
+
+
+def _revise_mode() -> str:
+    # "patch" (default) asks for a PlanPatch; "full" regenerates the plan.
+    mode = os.getenv("PLAN_REVISE_MODE", "patch").strip().lower()
+    return "full" if mode == "full" else "patch"
+
+
+# max_output_tokens by detail level. A task is roughly 45 tokens of JSON and
+# a patch op roughly 25; the budgets leave headroom for longer wording
+# without letting a runaway answer bill 900 tokens for a small patch.
+_PLAN_TOKEN_BUDGET = {"simple": 700, "detailed": 1100}
+_PATCH_TOKEN_BUDGET = {"simple": 300, "detailed": 450}
+
+
+def _output_budget(detail: Optional[DetailLevel], patch: bool = False) -> int:
+    budgets = _PATCH_TOKEN_BUDGET if patch else _PLAN_TOKEN_BUDGET
+    return budgets.get(detail or "simple", budgets["simple"])
+
+
 _SYSTEM_PROMPT = (
     "You are a planning assistant. Convert the user's goal into an actionable plan.\n"
     "Return ONLY PlanResponse JSON. No commentary.\n"
@@ -67,35 +110,46 @@ def _format_common_user_lines(
     return lines
 
 
+def _normalize_status(status: Optional[str]) -> str:
+    s = (status or "todo").strip().lower()
+
+    if s in {"doing", "in progress", "in-progress", "inprogress", "wip"}:
+        return "in_progress"
+    if s in {"done", "complete", "completed", "finished"}:
+        return "done"
+    return "todo"
+
+
+def _normalize_milestone(m: ProposeMilestone, m_i: int) -> ProposeMilestone:
+    if m.order_index is None:
+        m.order_index = m_i
+    return m
+
+
+def _normalize_task(t: ProposeTask, milestone_count: int) -> ProposeTask:
+    t.status = _normalize_status(getattr(t, "status", None))
+
+    if t.milestone_index is None:
+        t.milestone_index = 0
+    elif milestone_count > 0 and (
+        t.milestone_index < 0 or t.milestone_index >= milestone_count
+    ):
+        t.milestone_index = 0
+
+    if t.estimate not in (None, "S", "M", "L"):
+        t.estimate = None
+
+    return t
+
+
 def _normalize_plan(plan: PlanResponse) -> PlanResponse:
     milestone_count = len(plan.milestones)
 
     for m_i, m in enumerate(plan.milestones):
-        if m.order_index is None:
-            m.order_index = m_i
+        _normalize_milestone(m, m_i)
 
     for t in plan.tasks:
-        s = (getattr(t, "status", None) or "todo").strip().lower()
-
-        if s in {"doing", "in progress", "in-progress", "inprogress", "wip"}:
-            s = "in_progress"
-        elif s in {"todo", "to do", "to-do", "backlog", "pending"}:
-            s = "todo"
-        elif s in {"done", "complete", "completed", "finished"}:
-            s = "done"
-        else:
-            s = "todo"
-        t.status = s
-
-        if t.milestone_index is None:
-            t.milestone_index = 0
-        elif milestone_count > 0 and (
-            t.milestone_index < 0 or t.milestone_index >= milestone_count
-        ):
-            t.milestone_index = 0
-
-        if t.estimate not in (None, "S", "M", "L"):
-            t.estimate = None
+        _normalize_task(t, milestone_count)
 
     return plan
 
@@ -103,31 +157,82 @@ def _normalize_plan(plan: PlanResponse) -> PlanResponse:
 def get_openai_client() -> OpenAI:
     global _client
     if _client is None:
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise RuntimeError("OPENAI_API_KEY is not set in environment variables.")
-        _client = OpenAI(api_key=api_key, timeout=20.0)
+        _client = make_client()
     return _client
 
 
-def _call_plan(model: str, system: str, user: str) -> PlanResponse:
-    client = get_openai_client()
-    resp = client.responses.parse(
-        model=model,
-        input=[
+def get_async_openai_client() -> AsyncOpenAI:
+    global _async_client
+    if _async_client is None:
+        _async_client = make_async_client()
+    return _async_client
+
+
+def _get_llm_semaphore() -> asyncio.Semaphore:
+    global _llm_semaphore
+    if _llm_semaphore is None:
+        _llm_semaphore = asyncio.Semaphore(_max_concurrency())
+    return _llm_semaphore
+
+
+def _plan_request(
+    system: str, user: str, max_output_tokens: int, text_format=PlanResponse
+) -> dict:
+    return {
+        "model": _model_name(),
+        "input": [
             {"role": "system", "content": system},
             {"role": "user", "content": user},
         ],
-        max_output_tokens=900,
-        temperature=0.2,
-        text_format=PlanResponse,
-    )
+        "max_output_tokens": max_output_tokens,
+        "temperature": 0.2,
+        "text_format": text_format,
+    }
+
+
+def _parsed_plan(resp) -> PlanResponse:
     plan = resp.output_parsed
     if not plan or plan.type != "plan":
         raise RuntimeError("AI did not return a valid plan response.")
     return _normalize_plan(plan)
 
 
+# A call is a request dict plus the function that turns the parsed
+# response into a normalised PlanResponse.
+PlanCall = Tuple[dict, Callable[[object], PlanResponse]]
+
+
+def _call_plan(call: PlanCall) -> PlanResponse:
+    request, parse = call
+    client = get_openai_client()
+
+    def send(request: dict, started: Callable[[], None]) -> PlanResponse:
+        model = request["model"]
+        with track_llm(model, "parse"):
+            resp = client.responses.parse(**request)
+        record_llm_usage(model, resp)
+        return parse(resp)
+
+    return call_policy().run_sync(request, send)
+
+
+async def _call_plan_async(call: PlanCall) -> PlanResponse:
+    """Hedged, retried and with fallback per llm_policy."""
+    request, parse = call
+    client = get_async_openai_client()
+
+    async def send(request: dict, started: Callable[[], None]) -> PlanResponse:
+        model = request["model"]
+        with track_llm(model, "parse"):
+            async with _get_llm_semaphore():
+                started()
+                resp = await client.responses.parse(**request)
+        record_llm_usage(model, resp)
+        return parse(resp)
+
+    return await call_policy().run(request, send)
+
+
 def _cache_key_generate(p: PlanGenerateInput) -> str:
     parts = [
         p.goal_text.strip(),
@@ -179,38 +284,56 @@ def _cache_key_revise(p: PlanReviseInput) -> str:
         current_hash,
         (p.adjustment or "").strip(),
         model,
+        _revise_mode(),
     ]
     raw = "|".join(parts).encode("utf-8", errors="ignore")
     return hashlib.sha256(raw).hexdigest()
 
 
-def generate_plan(payload: PlanGenerateInput) -> PlanResponse:
-    key = _cache_key_generate(payload)
-    cached = _cache.get(key)
-    if cached:
-        return cached
+_REVISE_SYSTEM_PROMPT = (
+    _SYSTEM_PROMPT + "\nPreserve what still fits; apply the user's adjustment."
+)
 
-    model = _model_name()
-    user = "\n".join(_format_common_user_lines(payload))
+_PATCH_SYSTEM_PROMPT = (
+    "You are a planning assistant revising an existing plan.\n"
+    "Return ONLY PlanPatch JSON: the fewest ops that apply the ADJUSTMENT. "
+    "No commentary.\n"
+    "CURRENT_PLAN lines: M<i>|title for milestones, "
+    "T<i>|milestone_index|estimate|status|title for tasks.\n"
+    "Ops (index = the number after M or T):\n"
+    "- update: index and only the task fields that change\n"
+    "- remove: index\n"
+    "- add: title, milestone_index, description; estimate if sure. "
+    "Goes last in its milestone unless order_index is set\n"
+    "- milestone: index and a new title and/or description\n"
+    "Keep exactly 3 milestones and the task count rules for DETAIL "
+    "(simple: 8, detailed: 8–12). New titles: short verb phrase.\n"
+)
 
-    plan = _call_plan(model=model, system=_SYSTEM_PROMPT, user=user)
-    _cache[key] = plan
-    return plan
 
+def _generate_user_prompt(payload: PlanGenerateInput) -> str:
+    return "\n".join(_format_common_user_lines(payload))
 
-def revise_plan(payload: PlanReviseInput) -> PlanResponse:
-    key = _cache_key_revise(payload)
-    cached = _revise_cache.get(key)
-    if cached:
-        return cached
 
-    model = _model_name()
+def _patch_user_prompt(payload: PlanReviseInput) -> str:
+    current = PlanResponse.model_validate(payload.current_plan)
+    return "\n".join(
+        [
+            *_format_common_user_lines(payload),
+            "CURRENT_PLAN:",
+            *render_plan_lines(current),
+            "ADJUSTMENT:",
+            payload.adjustment.strip(),
+        ]
+    )
+
 
+def _revise_user_prompt(payload: PlanReviseInput) -> str:
     current = PlanResponse.model_validate(payload.current_plan)
     ctx = jsonable_encoder(_plan_for_revision_context(current))
 
     user_lines = _format_common_user_lines(payload)
-    user = "\n".join(
+    return "\n".join(
         [
             *user_lines,
             "CURRENT_PLAN_SUMMARY_JSON:",
@@ -220,11 +343,267 @@ def revise_plan(payload: PlanReviseInput) -> PlanResponse:
         ]
     )
 
-    plan = _call_plan(
-        model=model,
-        system=_SYSTEM_PROMPT
-        + "\nPreserve what still fits; apply the user's adjustment.",
-        user=user,
+
+def _generate_call(payload: PlanGenerateInput) -> PlanCall:
+    request = _plan_request(
+        _SYSTEM_PROMPT,
+        _generate_user_prompt(payload),
+        _output_budget(payload.detail_level),
+    )
+    return request, _parsed_plan
+
+
+def _revise_call(payload: PlanReviseInput) -> PlanCall:
+    if _revise_mode() == "full":
+        request = _plan_request(
+            _REVISE_SYSTEM_PROMPT,
+            _revise_user_prompt(payload),
+            _output_budget(payload.detail_level),
+        )
+        return request, _parsed_plan
+
+    def parse(resp) -> PlanResponse:
+        patch = resp.output_parsed
+        if not patch or patch.type != "patch":
+            raise RuntimeError("AI did not return a valid plan patch.")
+        current = PlanResponse.model_validate(payload.current_plan)
+        return _normalize_plan(apply_patch(current, patch))
+
+    request = _plan_request(
+        _PATCH_SYSTEM_PROMPT,
+        _patch_user_prompt(payload),
+        _output_budget(payload.detail_level, patch=True),
+        PlanPatch,
+    )
+    return request, parse
+
+
+def _generate_lookup(payload: PlanGenerateInput, key: str) -> Optional[PlanResponse]:
+    """Exact generate cache, then the near-duplicate tier."""
+    cache = get_plan_cache("generate")
+    plan = cache.get(key)
+    index = near_duplicates()
+    if plan is not None or index is None:
+        return plan
+
+    near = index.lookup(payload, _model_name(), cache.get)
+    if near is None:
+        return None
+    plan, similarity = near
+    return PlanDraftResponse.model_construct(
+        type=plan.type,
+        milestones=plan.milestones,
+        tasks=plan.tasks,
+        near_hit=True,
+        similarity=round(similarity, 3),
     )
-    _revise_cache[key] = plan
+
+
+def _generate_store(payload: PlanGenerateInput, key: str, plan: PlanResponse) -> None:
+    get_plan_cache("generate").set(key, plan)
+    index = near_duplicates()
+    if index is not None:
+        index.add(payload, _model_name(), key)
+
+
+def cached_plan(
+    kind: str, payload: PlanGenerateInput | PlanReviseInput
+) -> Optional[PlanResponse]:
+    if kind == "generate":
+        return _generate_lookup(payload, _cache_key_generate(payload))
+    return get_plan_cache("revise").get(_cache_key_revise(payload))
+
+
+def generate_plan(payload: PlanGenerateInput) -> PlanResponse:
+    key = _cache_key_generate(payload)
+    cached = _generate_lookup(payload, key)
+    if cached:
+        return cached
+
+    plan = _call_plan(_generate_call(payload))
+    _generate_store(payload, key, plan)
     return plan
+
+
+def revise_plan(payload: PlanReviseInput) -> PlanResponse:
+    cache = get_plan_cache("revise")
+    key = _cache_key_revise(payload)
+    cached = cache.get(key)
+    if cached:
+        return cached
+
+    plan = _call_plan(_revise_call(payload))
+    cache.set(key, plan)
+    return plan
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+async def _single_flight(
+    key: str, call: Callable[[], Awaitable[PlanResponse]]
+) -> PlanResponse:
+    """Share one in-flight call between concurrent requests for ``key``.
+
+    Every waiter gets the same result or exception. A waiter being cancelled
+    does not cancel the call for the others; the call is only cancelled once
+    nobody is waiting on it anymore.
+    """
+    flight = _inflight.get(key)
+    if flight is None or flight.task.cancelled():
+        flight = _Flight(asyncio.ensure_future(call()))
+        _inflight[key] = flight
+
+        def _forget(_task: asyncio.Task) -> None:
+            if _inflight.get(key) is flight:
+                del _inflight[key]
+
+        flight.task.add_done_callback(_forget)
+
+    flight.waiters += 1
+    try:
+        return await asyncio.shield(flight.task)
+    finally:
+        flight.waiters -= 1
+        if flight.waiters == 0 and not flight.task.done():
+            # Forgotten now, not when the task finishes cancelling: a caller
+            # arriving in between would otherwise join a cancelled flight.
+            if _inflight.get(key) is flight:
+                del _inflight[key]
+            flight.task.cancel()
+
+
+# --- Async path: the plan routes await these so an LLM round trip does not
+# hold a threadpool thread. Cache lookups hit SQLite, so they go to a thread.
+async def generate_plan_async(payload: PlanGenerateInput) -> PlanResponse:
+    key = _cache_key_generate(payload)
+    cached = await asyncio.to_thread(_generate_lookup, payload, key)
+    if cached:
+        return cached
+
+    async def call() -> PlanResponse:
+        plan = await _call_plan_async(_generate_call(payload))
+        await asyncio.to_thread(_generate_store, payload, key, plan)
+        return plan
+
+    return await _single_flight(f"generate:{key}", call)
+
+
+async def revise_plan_async(payload: PlanReviseInput) -> PlanResponse:
+    cache = get_plan_cache("revise")
+    key = _cache_key_revise(payload)
+    cached = await asyncio.to_thread(cache.get, key)
+    if cached:
+        return cached
+
+    async def call() -> PlanResponse:
+        plan = await _call_plan_async(_revise_call(payload))
+        await asyncio.to_thread(cache.set, key, plan)
+        return plan
+
+    return await _single_flight(f"revise:{key}", call)
+
+
+def plan_cache_key(kind: str, payload: PlanGenerateInput | PlanReviseInput) -> str:
+    """Key the ``kind`` cache namespace ("generate" or "revise") uses."""
+    if kind == "revise":
+        return _cache_key_revise(payload)
+    return _cache_key_generate(payload)
+
+
+# --- Streaming: milestones and tasks are yielded as soon as each object is
+# complete in the model's output, then the full normalised plan.
+PlanStreamEvent = Tuple[str, Union[ProposeMilestone, ProposeTask, PlanResponse]]
+
+
+def _streamed_item(
+    kind: str, raw: dict, milestone_count: int
+) -> Union[ProposeMilestone, ProposeTask]:
+    if kind == "milestone":
+        return _normalize_milestone(
+            ProposeMilestone.model_validate(raw), milestone_count
+        )
+
+    raw = {**raw, "status": _normalize_status(raw.get("status"))}
+    if raw.get("estimate") not in (None, "S", "M", "L"):
+        raw["estimate"] = None
+    return _normalize_task(ProposeTask.model_validate(raw), milestone_count)
+
+
+def _replay_plan(plan: PlanResponse) -> list:
+    return [
+        *(("milestone", m) for m in plan.milestones),
+        *(("task", t) for t in plan.tasks),
+        ("plan", plan),
+    ]
+
+
+async def _stream_plan(
+    request: dict,
+    lookup: Callable[[], Optional[PlanResponse]],
+    store: Callable[[PlanResponse], None],
+) -> AsyncIterator[PlanStreamEvent]:
+    cached = await asyncio.to_thread(lookup)
+    if cached:
+        for event in _replay_plan(cached):
+            yield event
+        return
+
+    client = get_async_openai_client()
+    parser = PlanItemParser()
+    milestone_count = 0
+    # Streams are not hedged or retried, but skip a degraded primary model.
+    model = call_policy().models_for(request["model"])[0]
+    request = {**request, "model": model}
+
+    with track_llm(model, "stream"):
+        async with _get_llm_semaphore():
+            async with client.responses.stream(**request) as stream:
+                async for event in stream:
+                    if event.type != "response.output_text.delta":
+                        continue
+                    for kind, raw in parser.feed(event.delta):
+                        try:
+                            item = _streamed_item(kind, raw, milestone_count)
+                        except ValidationError:
+                            continue
+                        if kind == "milestone":
+                            milestone_count += 1
+                        yield kind, item
+                final = await stream.get_final_response()
+
+    record_llm_usage(model, final)
+    plan = _parsed_plan(final)
+    await asyncio.to_thread(store, plan)
+    yield "plan", plan
+
+
+def stream_generate_plan(payload: PlanGenerateInput) -> AsyncIterator[PlanStreamEvent]:
+    key = _cache_key_generate(payload)
+    return _stream_plan(
+        _generate_call(payload)[0],
+        lambda: _generate_lookup(payload, key),
+        lambda plan: _generate_store(payload, key, plan),
+    )
+
+
+async def _replay_revision(payload: PlanReviseInput) -> AsyncIterator[PlanStreamEvent]:
+    for event in _replay_plan(await revise_plan_async(payload)):
+        yield event
+
+
+def stream_revise_plan(payload: PlanReviseInput) -> AsyncIterator[PlanStreamEvent]:
+    # A patch only makes sense once complete, so patch revisions are applied
+    # first and the resulting plan is replayed item by item.
+    if _revise_mode() == "patch":
+        return _replay_revision(payload)
+    cache = get_plan_cache("revise")
+    key = _cache_key_revise(payload)
+    return _stream_plan(
+        _revise_call(payload)[0],
+        lambda: cache.get(key),
+        lambda plan: cache.set(key, plan),
+    )
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+# Row-level change tracking for delta sync, done with SQLite triggers so bulk
+# statements (reorders, rebalances, diff apply) are covered as well as ORM
+# writes. Inserted and updated rows take the current version_counter value as
+# their version; deleted rows leave a tombstone in deleted_rows.
+#
+# Write paths must call versioning.bump_project_version *before* touching
+# rows, so the rows are stamped with the version of the write they belong to.
+# Rows of a deleted project leave no tombstone: nobody can sync it anymore.
+
+_CURRENT_VERSION = "(SELECT value FROM version_counter WHERE id = 1)"
+
+
+def _triggers(table: str, kind: str) -> list[str]:
+    return [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_version_insert
+        AFTER INSERT ON {table}
+        BEGIN
+            UPDATE {table} SET version = {_CURRENT_VERSION} WHERE id = NEW.id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_version_update
+        AFTER UPDATE ON {table}
+        WHEN NEW.version IS OLD.version
+        BEGIN
+            UPDATE {table} SET version = {_CURRENT_VERSION} WHERE id = NEW.id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_tombstone
+        AFTER DELETE ON {table}
+        WHEN EXISTS (
+            SELECT 1 FROM projects
+            WHERE id = OLD.project_id AND deleted_at IS NULL
+        )
+        BEGIN
+            INSERT INTO deleted_rows (project_id, kind, row_id, version)
+            VALUES (OLD.project_id, '{kind}', OLD.id, {_CURRENT_VERSION});
+        END
+        """,
+    ]
+
+
+TRIGGERS = [*_triggers("tasks", "task"), *_triggers("milestones", "milestone")]
+
+
+def drop_tombstone_triggers(conn: Connection) -> None:
+    for table in ("tasks", "milestones"):
+        conn.execute(text(f"DROP TRIGGER IF EXISTS trg_{table}_tombstone"))
+
+
+def install_triggers(conn: Connection) -> None:
+    for ddl in TRIGGERS:
+        conn.execute(text(ddl))
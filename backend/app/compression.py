@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import gzip
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .env import env_int
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+
+_COMPRESSIBLE = ("application/json", "text/")
+_SKIP = ("text/event-stream",)
+# Bodies above this are compressed off the event loop.
+_THREAD_THRESHOLD = 64 * 1024
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header (q=0 excludes)."""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip()] = q
+    for encoding in ("br", "gzip"):
+        if encoding == "br" and brotli is None:
+            continue
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+class CompressionMiddleware:
+    """Brotli/gzip for single-body responses of at least ``minimum_size``.
+
+    Streamed responses (SSE, chunked bodies) pass through untouched, so
+    events are never held back in a compressor buffer. The ETag of a
+    compressed body is made weak, as the bytes differ from the identity
+    representation.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 5,
+        brotli_quality: int = 4,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    @staticmethod
+    def options_from_env() -> dict:
+        return {
+            "minimum_size": env_int("COMPRESSION_MIN_BYTES", 1024),
+            "gzip_level": env_int("COMPRESSION_GZIP_LEVEL", 5),
+            "brotli_quality": env_int("COMPRESSION_BROTLI_QUALITY", 4),
+        }
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        start: Optional[Message] = None
+        passthrough = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start["headers"])
+            eligible = (
+                not message.get("more_body", False)
+                and len(body) >= self.minimum_size
+                and self._compressible(headers)
+            )
+            if eligible:
+                # Caches must key on Accept-Encoding even for identity bodies.
+                headers.add_vary_header("Accept-Encoding")
+            if not eligible or encoding is None:
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            if len(body) > _THREAD_THRESHOLD:
+                compressed = await run_in_threadpool(self._compress, body, encoding)
+            else:
+                compressed = self._compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = "W/" + etag
+            await send(start)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    def _compressible(headers: MutableHeaders) -> bool:
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        return content_type.startswith(_COMPRESSIBLE) and not content_type.startswith(
+            _SKIP
+        )
+
+    def _compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
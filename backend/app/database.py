@@ -1,17 +1,60 @@
 from __future__ import annotations
 
+import os
 from collections.abc import Generator
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import Session, declarative_base, sessionmaker
 
-DATABASE_URL = "sqlite:///./app.db"
+from .env import env_int  # also loads .env before settings are read
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
+
+
+def _engine_kwargs(url: str) -> dict:
+    if not url.startswith("sqlite"):
+        return {
+            "pool_size": env_int("DB_POOL_SIZE", 10),
+            "max_overflow": env_int("DB_MAX_OVERFLOW", 20),
+            "pool_pre_ping": True,
+        }
+
+    kwargs: dict = {
+        "connect_args": {
+            "check_same_thread": False,
+            "timeout": env_int("DB_BUSY_TIMEOUT_MS", 5000) / 1000,
+        }
+    }
+    if ":memory:" not in url and "mode=memory" not in url:
+        # File databases: each pooled connection keeps its page cache and
+        # mmap warm, so keep enough around for the threadpool.
+        kwargs["pool_size"] = env_int("DB_POOL_SIZE", 10)
+        kwargs["max_overflow"] = env_int("DB_MAX_OVERFLOW", 20)
+    return kwargs
+
+
+engine = create_engine(DATABASE_URL, future=True, **_engine_kwargs(DATABASE_URL))
+
+
+if engine.dialect.name == "sqlite":
+
+    @event.listens_for(engine, "connect")
+    def _sqlite_pragmas(dbapi_conn, _record) -> None:
+        # WAL lets readers run alongside the single writer; NORMAL sync is
+        # durable across application crashes in WAL mode.
+        cursor = dbapi_conn.cursor()
+        try:
+            cursor.execute(f"PRAGMA journal_mode={os.getenv('DB_JOURNAL_MODE', 'WAL')}")
+            cursor.execute(
+                f"PRAGMA synchronous={os.getenv('DB_SYNCHRONOUS', 'NORMAL')}"
+            )
+            cursor.execute(f"PRAGMA busy_timeout={env_int('DB_BUSY_TIMEOUT_MS', 5000)}")
+            cursor.execute("PRAGMA foreign_keys=ON")
+            cursor.execute(f"PRAGMA mmap_size={env_int('DB_MMAP_SIZE', 268435456)}")
+            cursor.execute("PRAGMA temp_store=MEMORY")
+        finally:
+            cursor.close()
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    future=True,
-)
 
 SessionLocal = sessionmaker(
     bind=engine,
@@ -0,0 +1,26 @@
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# Loaded on import so module-level settings (e.g. the database engine) see
+# values from backend/.env, not only code that runs inside create_app.
+ENV_PATH = Path(__file__).resolve().parent.parent / ".env"
+
+load_dotenv(dotenv_path=ENV_PATH)
+
+
+# Numeric settings: a malformed value falls back to the default rather than
+# failing at import or on first use.
+def env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
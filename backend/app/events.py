@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set
+
+from .env import env_int
+from .metrics import REGISTRY
+
+# Per-project change feed. Write paths publish after commit; the
+# /projects/{id}/events route drains one Subscription per client.
+#
+# Events are hints, not the source of truth: each carries the project
+# version, and a client that falls behind is sent a single "resync" event
+# and catches up through GET /projects/{id}/changes?since=<version>.
+# That keeps memory per subscriber bounded and never blocks a writer on a
+# slow reader.
+
+Event = Dict[str, Any]
+
+RESYNC = "resync"
+
+
+def make_event(
+    event_type: str, project_id: int, version: int, data: Optional[dict] = None
+) -> Event:
+    return {
+        "type": event_type,
+        "project_id": project_id,
+        "version": version,
+        "data": data or {},
+    }
+
+
+class Subscription:
+    """Bounded event queue owned by one consumer on one event loop.
+
+    Only touched from its loop's thread; brokers hand events over with
+    ``loop.call_soon_threadsafe``. When more than ``max_queue`` events are
+    waiting, the backlog is replaced by one resync event.
+    """
+
+    def __init__(
+        self,
+        broker: "EventBroker",
+        project_id: int,
+        loop: asyncio.AbstractEventLoop,
+        max_queue: int,
+    ):
+        self.broker = broker
+        self.project_id = project_id
+        self.loop = loop
+        self.max_queue = max_queue
+        self.dropped = 0
+        self.closed = False
+        self._queue: Deque[Event] = deque()
+        self._ready = asyncio.Event()
+
+    @property
+    def backlog(self) -> int:
+        return len(self._queue)
+
+    def push(self, event: Event) -> None:
+        if self.closed:
+            return
+        if len(self._queue) >= self.max_queue:
+            self.dropped += len(self._queue) + 1
+            self._queue.clear()
+            event = make_event(RESYNC, self.project_id, event["version"])
+        self._queue.append(event)
+        self._ready.set()
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Event]:
+        """Next event, or None if ``timeout`` passes first."""
+        while not self._queue:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        return self._queue.popleft()
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self._queue.clear()
+            self.broker.unsubscribe(self)
+
+
+class EventBroker(ABC):
+    """Fan-out interface. Swap in a broker backed by an external bus (Redis
+    pub/sub, NATS, ...) with ``set_broker`` when running several workers."""
+
+    @abstractmethod
+    def publish(self, event: Event) -> None: ...
+
+    @abstractmethod
+    def subscribe(self, project_id: int) -> Subscription: ...
+
+    @abstractmethod
+    def unsubscribe(self, sub: Subscription) -> None: ...
+
+    def stats(self) -> Dict[str, int]:
+        return {}
+
+
+class InProcessBroker(EventBroker):
+    """Fan-out within one process.
+
+    ``publish`` may be called from any thread (sync routes run in the
+    threadpool). Delivery is batched per event loop, so an event costs one
+    loop wake-up however many subscribers it has.
+    """
+
+    def __init__(self, max_queue: int):
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._subs: Dict[int, Set[Subscription]] = {}
+        self._published = 0
+
+    def subscribe(self, project_id: int) -> Subscription:
+        sub = Subscription(self, project_id, asyncio.get_running_loop(), self.max_queue)
+        with self._lock:
+            self._subs.setdefault(project_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            subs = self._subs.get(sub.project_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subs[sub.project_id]
+
+    def publish(self, event: Event) -> None:
+        with self._lock:
+            self._published += 1
+            subs = list(self._subs.get(event["project_id"], ()))
+        if not subs:
+            return
+
+        by_loop: Dict[asyncio.AbstractEventLoop, List[Subscription]] = {}
+        for sub in subs:
+            by_loop.setdefault(sub.loop, []).append(sub)
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        for loop, targets in by_loop.items():
+            if loop is running:
+                _deliver(targets, event)
+            elif not loop.is_closed():
+                loop.call_soon_threadsafe(_deliver, targets, event)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            subs = [s for group in self._subs.values() for s in group]
+            return {
+                "projects": len(self._subs),
+                "subscribers": len(subs),
+                "published": self._published,
+                "dropped": sum(s.dropped for s in subs),
+            }
+
+
+def _deliver(subs: List[Subscription], event: Event) -> None:
+    for sub in subs:
+        sub.push(event)
+
+
+_broker: Optional[EventBroker] = None
+_broker_lock = threading.Lock()
+
+
+def get_broker() -> EventBroker:
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = InProcessBroker(max_queue=env_int("EVENTS_MAX_QUEUE", 256))
+        return _broker
+
+
+def set_broker(broker: EventBroker) -> None:
+    global _broker
+    with _broker_lock:
+        _broker = broker
+
+
+def publish(
+    event_type: str, project_id: int, version: int, data: Optional[dict] = None
+) -> None:
+    get_broker().publish(make_event(event_type, project_id, version, data))
+
+
+def _collect_metrics():
+    stats = get_broker().stats()
+    described = {
+        "subscribers": ("gauge", "Open project event subscriptions."),
+        "published": ("counter", "Events published."),
+        "dropped": ("counter", "Events dropped for slow open subscribers."),
+    }
+    return [
+        (
+            f"project_events_{key}{'_total' if kind == 'counter' else ''}",
+            kind,
+            doc,
+            (),
+            [((), stats[key])],
+        )
+        for key, (kind, doc) in described.items()
+        if key in stats
+    ]
+
+
+REGISTRY.add_collector(_collect_metrics)
@@ -0,0 +1,353 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from .env import env_float, env_int
+from .metrics import REGISTRY, Counter
+
+# Latency-aware plan calls. Each call gets up to LLM_MAX_ATTEMPTS attempts
+# with jittered exponential backoff between them. Within an attempt, if the
+# request has not answered by the model's recent p95 latency, a hedged
+# second request goes out (to the fallback model when one is set) and the
+# first answer wins; the other is cancelled.
+#
+# Hedges and retries are paid for from one process-wide retry budget that
+# refills with normal traffic, so an upstream outage cannot multiply load.
+# A primary model that keeps failing is skipped in favour of
+# OPENAI_FALLBACK_MODEL for a cooldown period; later attempts use the
+# fallback too.
+
+# Callers pass a send function: it makes one request and calls ``started``
+# once the request is past local queueing, so latency samples and hedge
+# deadlines only count time spent upstream.
+Send = Callable[[dict, Callable[[], None]], Awaitable[Any]]
+SyncSend = Callable[[dict, Callable[[], None]], Any]
+
+LLM_CALLS = REGISTRY.register(
+    Counter(
+        "llm_calls_total",
+        "Plan calls by the request that answered (primary, hedge, retry; "
+        "failed when none did) and the model role that served it.",
+        ("path", "model"),
+    )
+)
+LLM_EXTRA_REQUESTS = REGISTRY.register(
+    Counter(
+        "llm_extra_requests_total",
+        "Hedged and retried requests, sent or refused by the retry budget.",
+        ("kind", "result"),
+    )
+)
+
+
+class LatencyTracker:
+    """Recent successful round trips per model, over a sliding window."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def observe(self, model: str, seconds: float) -> None:
+        with self._lock:
+            samples = self._samples.get(model)
+            if samples is None:
+                samples = self._samples[model] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def models(self) -> List[str]:
+        with self._lock:
+            return list(self._samples)
+
+    def quantile(self, model: str, q: float) -> Optional[float]:
+        """None until the model has ``min_samples`` samples."""
+        with self._lock:
+            samples = sorted(self._samples.get(model, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, math.ceil(q * len(samples)) - 1)]
+
+
+class RetryBudget:
+    """Token bucket shared by hedges and retries.
+
+    Every call deposits ``ratio`` tokens, up to ``burst``; each hedge or
+    retry spends one. Extra requests are thereby held to about ``ratio`` of
+    normal traffic once the initial burst is used up.
+    """
+
+    def __init__(self, ratio: float, burst: float):
+        self.ratio = ratio
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._balance = burst
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._balance = min(self.burst, self._balance + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._balance < 1:
+                return False
+            self._balance -= 1
+            return True
+
+    @property
+    def balance(self) -> float:
+        with self._lock:
+            return self._balance
+
+
+class ModelHealth:
+    """Consecutive failures per model; a model that reaches ``threshold`` is
+    degraded until ``cooldown`` seconds pass without another failure."""
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures: Dict[str, Tuple[int, float]] = {}
+
+    def failure(self, model: str) -> None:
+        with self._lock:
+            count, _ = self._failures.get(model, (0, 0.0))
+            self._failures[model] = (count + 1, time.monotonic())
+
+    def success(self, model: str) -> None:
+        with self._lock:
+            self._failures.pop(model, None)
+
+    def degraded(self, model: str) -> bool:
+        with self._lock:
+            count, last = self._failures.get(model, (0, 0.0))
+        return count >= self.threshold and time.monotonic() - last < self.cooldown
+
+
+class CallPolicy:
+    def __init__(
+        self,
+        fallback_model: Optional[str],
+        max_attempts: int,
+        backoff_seconds: float,
+        hedge: bool,
+        hedge_default_seconds: float,
+        hedge_min_seconds: float,
+        budget: RetryBudget,
+        health: ModelHealth,
+    ):
+        self.fallback_model = fallback_model
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.hedge = hedge
+        self.hedge_default_seconds = hedge_default_seconds
+        self.hedge_min_seconds = hedge_min_seconds
+        self.budget = budget
+        self.health = health
+        self.latency = LatencyTracker()
+
+    def hedge_delay(self, model: str) -> float:
+        """p95 of the model's recent latency, or the default until known."""
+        p95 = self.latency.quantile(model, 0.95)
+        return max(
+            self.hedge_min_seconds, self.hedge_default_seconds if p95 is None else p95
+        )
+
+    def _backoff(self, attempt: int) -> float:
+        delay = self.backoff_seconds * 2 ** (attempt - 1)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def models_for(self, primary: str) -> Tuple[str, str]:
+        """Model for the first attempt, and for hedges and later attempts."""
+        fallback = self.fallback_model or primary
+        first = fallback if self.health.degraded(primary) else primary
+        return first, fallback
+
+    def _sent(self, model: str, seconds: Optional[float], error: bool) -> None:
+        if error:
+            self.health.failure(model)
+        else:
+            self.health.success(model)
+            if seconds is not None:
+                self.latency.observe(model, seconds)
+
+    def _record(self, path: str, model: str, primary: str) -> None:
+        LLM_CALLS.inc(path, "primary" if model == primary else "fallback")
+
+    # --- async ---
+    async def _timed(
+        self, request: dict, send: Send, started: Callable[[], None]
+    ) -> Any:
+        start: Optional[float] = None
+
+        def on_start() -> None:
+            nonlocal start
+            start = time.perf_counter()
+            started()
+
+        try:
+            result = await send(request, on_start)
+        except Exception:
+            self._sent(request["model"], None, error=True)
+            raise
+        elapsed = time.perf_counter() - start if start is not None else None
+        self._sent(request["model"], elapsed, error=False)
+        return result
+
+    async def _hedged(
+        self, request: dict, model: str, hedge_model: str, send: Send
+    ) -> Tuple[Any, str, bool]:
+        """One attempt, hedged past the deadline. Returns (result, model,
+        whether the hedge answered)."""
+        started = asyncio.Event()
+        main = asyncio.ensure_future(
+            self._timed({**request, "model": model}, send, started.set)
+        )
+        tasks: Dict[asyncio.Future, Tuple[str, bool]] = {main: (model, False)}
+        try:
+            if self.hedge:
+                waiter = asyncio.ensure_future(started.wait())
+                await asyncio.wait({main, waiter}, return_when=asyncio.FIRST_COMPLETED)
+                waiter.cancel()
+                if not main.done():
+                    await asyncio.wait({main}, timeout=self.hedge_delay(model))
+                if not main.done():
+                    if self.budget.try_spend():
+                        LLM_EXTRA_REQUESTS.inc("hedge", "sent")
+                        hedge = asyncio.ensure_future(
+                            self._timed(
+                                {**request, "model": hedge_model}, send, lambda: None
+                            )
+                        )
+                        tasks[hedge] = (hedge_model, True)
+                    else:
+                        LLM_EXTRA_REQUESTS.inc("hedge", "denied")
+
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        return (task.result(), *tasks[task])
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def run(self, request: dict, send: Send) -> Any:
+        primary = request["model"]
+        first, fallback = self.models_for(primary)
+        self.budget.deposit()
+        error: Optional[Exception] = None
+        for attempt in range(self.max_attempts):
+            if attempt:
+                if not self.budget.try_spend():
+                    LLM_EXTRA_REQUESTS.inc("retry", "denied")
+                    break
+                LLM_EXTRA_REQUESTS.inc("retry", "sent")
+                await asyncio.sleep(self._backoff(attempt))
+            model = first if attempt == 0 else fallback
+            try:
+                result, used, hedged = await self._hedged(
+                    request, model, fallback, send
+                )
+            except Exception as exc:
+                error = exc
+                continue
+            path = "hedge" if hedged else "retry" if attempt else "primary"
+            self._record(path, used, primary)
+            return result
+        self._record("failed", primary, primary)
+        raise error
+
+    # --- sync: retries and fallback, no hedging ---
+    def run_sync(self, request: dict, send: SyncSend) -> Any:
+        primary = request["model"]
+        first, fallback = self.models_for(primary)
+        self.budget.deposit()
+        error: Optional[Exception] = None
+        for attempt in range(self.max_attempts):
+            if attempt:
+                if not self.budget.try_spend():
+                    LLM_EXTRA_REQUESTS.inc("retry", "denied")
+                    break
+                LLM_EXTRA_REQUESTS.inc("retry", "sent")
+                time.sleep(self._backoff(attempt))
+            model = first if attempt == 0 else fallback
+            start = time.perf_counter()
+            try:
+                result = send({**request, "model": model}, lambda: None)
+            except Exception as exc:
+                self._sent(model, None, error=True)
+                error = exc
+                continue
+            self._sent(model, time.perf_counter() - start, error=False)
+            self._record("retry" if attempt else "primary", model, primary)
+            return result
+        self._record("failed", primary, primary)
+        raise error
+
+
+_policy: Optional[CallPolicy] = None
+_policy_lock = threading.Lock()
+
+
+def call_policy() -> CallPolicy:
+    """The process-wide policy, configured from the environment."""
+    global _policy
+    with _policy_lock:
+        if _policy is None:
+            _policy = CallPolicy(
+                fallback_model=os.getenv("OPENAI_FALLBACK_MODEL", "").strip() or None,
+                max_attempts=max(1, env_int("LLM_MAX_ATTEMPTS", 3)),
+                backoff_seconds=env_float("LLM_RETRY_BACKOFF_SECONDS", 0.5),
+                hedge=os.getenv("LLM_HEDGE", "1").strip() not in ("0", "false", ""),
+                hedge_default_seconds=env_float("LLM_HEDGE_DEFAULT_SECONDS", 8),
+                hedge_min_seconds=env_float("LLM_HEDGE_MIN_SECONDS", 0.5),
+                budget=RetryBudget(
+                    ratio=env_float("LLM_RETRY_BUDGET_RATIO", 0.1),
+                    burst=env_float("LLM_RETRY_BUDGET_BURST", 10),
+                ),
+                health=ModelHealth(
+                    threshold=max(1, env_int("LLM_FALLBACK_AFTER_FAILURES", 3)),
+                    cooldown=env_float("LLM_FALLBACK_COOLDOWN_SECONDS", 30),
+                ),
+            )
+        return _policy
+
+
+def _collect_metrics():
+    if _policy is None:
+        return []
+    models = _policy.latency.models()
+    return [
+        (
+            "llm_retry_budget_tokens",
+            "gauge",
+            "Hedges and retries the retry budget can pay for right now.",
+            (),
+            [((), _policy.budget.balance)],
+        ),
+        (
+            "llm_hedge_delay_seconds",
+            "gauge",
+            "Time after which a request to the model is hedged.",
+            ("model",),
+            [((m,), _policy.hedge_delay(m)) for m in models],
+        ),
+    ]
+
+
+REGISTRY.add_collector(_collect_metrics)
@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Tuple
+
+from openai import AsyncOpenAI, OpenAI
+
+from .env import env_float, env_int
+from .schemas import PlanPatch, PlanResponse
+
+# LLM providers build the clients ai.py calls. A client only needs the
+# Responses API surface used there: ``responses.parse(**request)`` and, on
+# the async client, ``responses.stream(**request)``. LLM_PROVIDER picks the
+# provider (default "openai"); register_provider adds others.
+
+ClientFactory = Callable[[], Any]
+_PROVIDERS: Dict[str, Tuple[ClientFactory, ClientFactory]] = {}
+
+
+def register_provider(
+    name: str, sync_factory: ClientFactory, async_factory: ClientFactory
+) -> None:
+    _PROVIDERS[name] = (sync_factory, async_factory)
+
+
+def provider_name() -> str:
+    return os.getenv("LLM_PROVIDER", "openai").strip().lower() or "openai"
+
+
+def _factories() -> Tuple[ClientFactory, ClientFactory]:
+    name = provider_name()
+    if name not in _PROVIDERS:
+        raise RuntimeError(
+            f"Unknown LLM_PROVIDER '{name}'. Known: {', '.join(sorted(_PROVIDERS))}."
+        )
+    return _PROVIDERS[name]
+
+
+def make_client() -> Any:
+    return _factories()[0]()
+
+
+def make_async_client() -> Any:
+    return _factories()[1]()
+
+
+# --- OpenAI ---
+def _timeout() -> float:
+    return env_float("OPENAI_TIMEOUT", 20)
+
+
+def _api_key() -> str:
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise RuntimeError("OPENAI_API_KEY is not set in environment variables.")
+    return api_key
+
+
+def _max_retries() -> int:
+    # ai.py retries under a shared budget (see llm_policy); SDK retries on
+    # top of that would multiply the load during an outage.
+    return env_int("OPENAI_MAX_RETRIES", 0)
+
+
+register_provider(
+    "openai",
+    lambda: OpenAI(api_key=_api_key(), timeout=_timeout(), max_retries=_max_retries()),
+    lambda: AsyncOpenAI(
+        api_key=_api_key(), timeout=_timeout(), max_retries=_max_retries()
+    ),
+)
+
+
+# --- Local fake ---
+class FakeLLMError(RuntimeError):
+    pass
+
+
+_VERBS = ("Draft", "Review", "Set up", "Outline", "Practice", "Build", "Test", "Ship")
+_NOUNS = ("scope", "notes", "prototype", "checklist", "schedule", "draft", "demo")
+_ESTIMATES = ("S", "M", "L", None)
+_DETAIL = re.compile(r"^DETAIL:\s*(\w+)", re.MULTILINE)
+_PLAN_TASK = re.compile(r"^T(\d+)\|", re.MULTILINE)
+
+
+def fake_plan(user_prompt: str) -> PlanResponse:
+    """Valid PlanResponse derived only from the prompt text.
+
+    Same prompt, same plan: follows the system prompt's shape (3
+    milestones, 8 tasks or 12 for DETAIL: detailed).
+    """
+    seed = int.from_bytes(hashlib.sha256(user_prompt.encode()).digest()[:8], "big")
+    rng = random.Random(seed)
+    detail = _DETAIL.search(user_prompt)
+    task_count = 12 if detail and detail.group(1) == "detailed" else 8
+
+    milestones = [
+        {
+            "title": f"Phase {i + 1}: {rng.choice(_NOUNS)}",
+            "description": "Generated by the local fake LLM.",
+            "order_index": i,
+        }
+        for i in range(3)
+    ]
+    tasks = []
+    per_milestone: Dict[int, int] = {}
+    for i in range(task_count):
+        m = i * 3 // task_count
+        tasks.append(
+            {
+                "title": f"{rng.choice(_VERBS)} {rng.choice(_NOUNS)} {i + 1}",
+                "description": "Work through this step.",
+                "milestone_index": m,
+                "status": "todo",
+                "estimate": rng.choice(_ESTIMATES),
+                "order_index": per_milestone.get(m, 0),
+            }
+        )
+        per_milestone[m] = per_milestone.get(m, 0) + 1
+    return PlanResponse(type="plan", milestones=milestones, tasks=tasks)
+
+
+def fake_patch(user_prompt: str) -> PlanPatch:
+    """Small PlanPatch against the CURRENT_PLAN in the prompt: one update,
+    one add, and one remove when the plan has more than 8 tasks."""
+    seed = int.from_bytes(hashlib.sha256(user_prompt.encode()).digest()[:8], "big")
+    rng = random.Random(seed)
+    task_count = len(_PLAN_TASK.findall(user_prompt))
+
+    ops: List[dict] = []
+    if task_count:
+        ops.append(
+            {
+                "op": "update",
+                "index": rng.randrange(task_count),
+                "title": f"{rng.choice(_VERBS)} {rng.choice(_NOUNS)} again",
+            }
+        )
+    if task_count > 8:
+        ops.append({"op": "remove", "index": task_count - 1})
+    ops.append(
+        {
+            "op": "add",
+            "title": f"{rng.choice(_VERBS)} {rng.choice(_NOUNS)}",
+            "description": "Added by the local fake LLM.",
+            "milestone_index": rng.randrange(3),
+            "estimate": rng.choice(_ESTIMATES),
+        }
+    )
+    return PlanPatch(type="patch", ops=ops)
+
+
+class _FakeBehaviour:
+    """Latency, jitter and failure settings shared by the fake clients.
+
+    Plans are always deterministic. Latency and failures are random unless
+    FAKE_LLM_SEED is set, which makes the whole sequence reproducible.
+    FAKE_LLM_MS_PER_OUTPUT_TOKEN adds decode time, so longer answers take
+    longer, as they do with a real model. FAKE_LLM_SLOW_RATE of the calls
+    take FAKE_LLM_SLOW_MS longer, for a latency tail.
+    """
+
+    def __init__(self):
+        self.latency = env_float("FAKE_LLM_LATENCY_MS", 800) / 1000
+        self.jitter = env_float("FAKE_LLM_JITTER_MS", 200) / 1000
+        self.failure_rate = env_float("FAKE_LLM_FAILURE_RATE", 0)
+        self.per_token = env_float("FAKE_LLM_MS_PER_OUTPUT_TOKEN", 0) / 1000
+        self.slow_rate = env_float("FAKE_LLM_SLOW_RATE", 0)
+        self.slow = env_float("FAKE_LLM_SLOW_MS", 5000) / 1000
+        seed = os.getenv("FAKE_LLM_SEED")
+        self._rng = random.Random(int(seed) if seed else None)
+        self._lock = threading.Lock()
+
+    def draw(self, response: Any) -> Tuple[float, bool]:
+        with self._lock:
+            delay = self.latency + self._rng.uniform(-self.jitter, self.jitter)
+            fail = self._rng.random() < self.failure_rate
+            if self.slow_rate and self._rng.random() < self.slow_rate:
+                delay += self.slow
+        delay += response.usage.output_tokens * self.per_token
+        return max(0.0, delay), fail
+
+    @staticmethod
+    def respond(request: dict) -> Tuple[Any, str]:
+        user = next((m["content"] for m in request["input"] if m["role"] == "user"), "")
+        text_format = request.get("text_format", PlanResponse)
+        if text_format is PlanPatch:
+            text = fake_patch(user).model_dump_json(exclude_none=True)
+        else:
+            text = fake_plan(user).model_dump_json(exclude_none=True)
+        usage = SimpleNamespace(
+            input_tokens=sum(len(m["content"]) for m in request["input"]) // 4,
+            output_tokens=len(text) // 4,
+        )
+        response = SimpleNamespace(
+            output_parsed=text_format.model_validate_json(text),
+            output_text=text,
+            usage=usage,
+        )
+        return response, text
+
+
+class _FakeResponses:
+    def __init__(self, behaviour: _FakeBehaviour):
+        self._behaviour = behaviour
+
+    def parse(self, **request: Any) -> Any:
+        response = self._behaviour.respond(request)[0]
+        delay, fail = self._behaviour.draw(response)
+        time.sleep(delay)
+        if fail:
+            raise FakeLLMError("Fake LLM failure")
+        return response
+
+
+class _AsyncFakeResponses:
+    def __init__(self, behaviour: _FakeBehaviour):
+        self._behaviour = behaviour
+
+    async def parse(self, **request: Any) -> Any:
+        response = self._behaviour.respond(request)[0]
+        delay, fail = self._behaviour.draw(response)
+        await asyncio.sleep(delay)
+        if fail:
+            raise FakeLLMError("Fake LLM failure")
+        return response
+
+    def stream(self, **request: Any) -> "_FakeStream":
+        return _FakeStream(self._behaviour, request)
+
+
+class _FakeStream:
+    """Emits the plan JSON as output_text deltas spread over the latency."""
+
+    CHUNK = 48
+
+    def __init__(self, behaviour: _FakeBehaviour, request: dict):
+        self._behaviour = behaviour
+        self._request = request
+        self._final = None
+
+    async def __aenter__(self) -> "_FakeStream":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        return None
+
+    def __aiter__(self):
+        return self._events()
+
+    async def _events(self):
+        response, text = self._behaviour.respond(self._request)
+        delay, fail = self._behaviour.draw(response)
+        chunks: List[str] = [
+            text[i : i + self.CHUNK] for i in range(0, len(text), self.CHUNK)
+        ]
+        pause = delay / max(1, len(chunks))
+        for i, chunk in enumerate(chunks):
+            await asyncio.sleep(pause)
+            if fail and i == len(chunks) // 2:
+                raise FakeLLMError("Fake LLM failure")
+            yield SimpleNamespace(type="response.output_text.delta", delta=chunk)
+        self._final = response
+
+    async def get_final_response(self) -> Any:
+        if self._final is None:
+            async for _ in self._events():
+                pass
+        return self._final
+
+
+def _fake_client(responses_cls) -> Any:
+    return SimpleNamespace(responses=responses_cls(_FakeBehaviour()))
+
+
+register_provider(
+    "fake",
+    lambda: _fake_client(_FakeResponses),
+    lambda: _fake_client(_AsyncFakeResponses),
+)
@@ -1,18 +1,39 @@
-from pathlib import Path
+from contextlib import asynccontextmanager
 
-from dotenv import load_dotenv
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from .routes import projects, plans, tasks
+from .compression import CompressionMiddleware
+from .database import engine
+from .metrics import MetricsMiddleware, instrument_engine, render as render_metrics
+from .migrations import run_migrations
+from .plan_jobs import start_workers, stop_workers
+from .project_purge import start_purger, stop_purger
+from .responses import FastJSONResponse
+from .routes import projects, plans, search, tasks, transfer
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    await start_workers()
+    await start_purger()
+    try:
+        yield
+    finally:
+        await stop_purger()
+        await stop_workers()
 
 
 def create_app() -> FastAPI:
-    env_path = Path(__file__).resolve().parent.parent / ".env"
-    load_dotenv(dotenv_path=env_path)
+    run_migrations(engine)
+    instrument_engine(engine)
 
-    app = FastAPI()
+    app = FastAPI(default_response_class=FastJSONResponse, lifespan=lifespan)
 
+    app.add_middleware(
+        CompressionMiddleware, **CompressionMiddleware.options_from_env()
+    )
     app.add_middleware(
         CORSMiddleware,
         allow_origins=[
@@ -22,16 +43,26 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["ETag", "X-Next-Cursor"],
     )
+    app.add_middleware(MetricsMiddleware)
 
     @app.get("/health")
     def health():
         return {"status": "ok"}
 
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return PlainTextResponse(
+            render_metrics(), media_type="text/plain; version=0.0.4"
+        )
+
     app.include_router(projects.router)
     app.include_router(plans.draft_router)
     app.include_router(plans.router)
     app.include_router(tasks.router)
+    app.include_router(search.router)
+    app.include_router(transfer.router)
 
     return app
 
@@ -0,0 +1,324 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Minimal Prometheus text-format registry. Observations take one lock and a
+# dict lookup keyed by the label tuple, so it is cheap enough to leave on.
+# Values that other modules already count (plan cache, event broker) are
+# read at scrape time through collectors instead of being double-counted.
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.doc = doc
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = ()):
+        super().__init__(name, doc, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_labels(self.label_names, k)} {_num(v)}" for k, v in items
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        doc: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = (),
+    ):
+        super().__init__(name, doc, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(labels)
+            if row is None:
+                row = self._values[labels] = [0] * (len(self.buckets) + 2)
+            row[i] += 1
+            row[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        lines = self.header()
+        for key, row in items:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), row):
+                cumulative += count
+                le = _labels(self.label_names, key, f'le="{_num(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            labels = _labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_num(row[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+# A collector returns (name, kind, doc, label names, [(label values, value)]).
+Collector = Callable[
+    [], List[Tuple[str, str, str, Sequence[str], List[Tuple[LabelValues, float]]]]
+]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Collector] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Collector) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            for name, kind, doc, names, samples in collector():
+                lines.append(f"# HELP {name} {doc}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.extend(f"{name}{_labels(names, k)} {_num(v)}" for k, v in samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+_LLM_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+_QUERY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1)
+_QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+HTTP_LATENCY = REGISTRY.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "HTTP request latency by route template.",
+        ("method", "route", "status"),
+        _LATENCY_BUCKETS,
+    )
+)
+HTTP_IN_FLIGHT = REGISTRY.register(
+    Gauge("http_requests_in_flight", "Requests currently being served.", ("method",))
+)
+LLM_LATENCY = REGISTRY.register(
+    Histogram(
+        "llm_request_duration_seconds",
+        "OpenAI round-trip time, including time queued on the concurrency limit.",
+        ("model", "mode", "outcome"),
+        _LLM_BUCKETS,
+    )
+)
+LLM_TOKENS = REGISTRY.register(
+    Counter(
+        "llm_tokens_total",
+        "Tokens reported in Responses API usage.",
+        ("model", "kind"),
+    )
+)
+LLM_FAILURES = REGISTRY.register(
+    Counter(
+        "llm_failures_total",
+        "Failed OpenAI calls by exception type.",
+        ("model", "mode", "error"),
+    )
+)
+DB_QUERY_LATENCY = REGISTRY.register(
+    Histogram(
+        "db_query_duration_seconds",
+        "Duration of individual SQL statements.",
+        (),
+        _QUERY_BUCKETS,
+    )
+)
+DB_QUERIES_PER_REQUEST = REGISTRY.register(
+    Histogram(
+        "db_queries_per_request",
+        "SQL statements executed while serving one request.",
+        ("route",),
+        _QUERY_COUNT_BUCKETS,
+    )
+)
+DB_TIME_PER_REQUEST = REGISTRY.register(
+    Histogram(
+        "db_time_per_request_seconds",
+        "Total SQL time while serving one request.",
+        ("route",),
+        _LATENCY_BUCKETS,
+    )
+)
+
+
+# --- HTTP ---
+class _RequestDB:
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+# Shared by reference with threadpool workers, which run in a copy of the
+# request's context.
+_request_db: ContextVar[Optional[_RequestDB]] = ContextVar("request_db", default=None)
+
+
+def _route_template(scope: Scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "<unmatched>"
+
+
+class MetricsMiddleware:
+    """Times each HTTP request and attributes SQL work to its route."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = "500"
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        db = _RequestDB()
+        token = _request_db.set(db)
+        HTTP_IN_FLIGHT.inc(method)
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = perf_counter() - start
+            HTTP_IN_FLIGHT.dec(method)
+            _request_db.reset(token)
+            route = _route_template(scope)
+            HTTP_LATENCY.observe(elapsed, method, route, status)
+            DB_QUERIES_PER_REQUEST.observe(db.queries, route)
+            DB_TIME_PER_REQUEST.observe(db.seconds, route)
+
+
+# --- SQLAlchemy ---
+def instrument_engine(engine: Engine) -> None:
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = perf_counter() - conn.info["query_start"].pop()
+        DB_QUERY_LATENCY.observe(elapsed)
+        db = _request_db.get()
+        if db is not None:
+            db.queries += 1
+            db.seconds += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        # after_cursor_execute does not run for a failed statement.
+        conn = context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
+
+
+# --- LLM ---
+@contextmanager
+def track_llm(model: str, mode: str) -> Iterator[None]:
+    """Time an OpenAI call; works around ``await`` and ``async with`` too."""
+    start = perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except asyncio.CancelledError:
+        # A hedge that lost, or a client that went away: not a failure.
+        outcome = "cancelled"
+        raise
+    except BaseException as exc:
+        outcome = "error"
+        LLM_FAILURES.inc(model, mode, type(exc).__name__)
+        raise
+    finally:
+        LLM_LATENCY.observe(perf_counter() - start, model, mode, outcome)
+
+
+def record_llm_usage(model: str, response) -> None:
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    for kind in ("input_tokens", "output_tokens"):
+        count = getattr(usage, kind, None)
+        if count:
+            LLM_TOKENS.inc(model, kind.removesuffix("_tokens"), amount=count)
+
+
+def render() -> str:
+    return REGISTRY.render()
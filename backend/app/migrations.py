@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+from typing import Callable, List, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+from .change_tracking import drop_tombstone_triggers, install_triggers
+from .database import Base
+from .ordering import ORDER_GAP
+from .progress import install_progress, rebuild_progress
+from .search import install_search, rebuild_search
+
+# Schema steps for databases created before the step existed. A fresh
+# database is built straight from the models and stamped with the latest
+# version, so each step only has to handle upgrading existing data.
+# The version is tracked in SQLite's ``PRAGMA user_version``.
+
+
+def _sparse_task_order(conn: Connection) -> None:
+    # Dense 0..n positions become gapped keys with the same relative order.
+    conn.execute(
+        text("UPDATE tasks SET order_index = (order_index + 1) * :gap"),
+        {"gap": ORDER_GAP},
+    )
+
+
+def _project_listing_index(conn: Connection) -> None:
+    conn.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS ix_projects_created_at_id "
+            "ON projects (created_at, id)"
+        )
+    )
+
+
+def _board_indexes(conn: Connection) -> None:
+    conn.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS ix_tasks_project_status_order "
+            "ON tasks (project_id, status, order_index)"
+        )
+    )
+    conn.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS ix_milestones_project_order "
+            "ON milestones (project_id, order_index)"
+        )
+    )
+
+
+def _add_column(conn: Connection, table: str, column: str, ddl: str) -> None:
+    if column not in {c["name"] for c in inspect(conn).get_columns(table)}:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def _project_version(conn: Connection) -> None:
+    _add_column(conn, "projects", "version", "INTEGER NOT NULL DEFAULT 0")
+
+
+def _row_versions(conn: Connection) -> None:
+    # Existing rows keep version 0, i.e. they predate any client's sync point.
+    for table in ("tasks", "milestones"):
+        _add_column(conn, table, "version", "INTEGER NOT NULL DEFAULT 0")
+        conn.execute(
+            text(
+                f"CREATE INDEX IF NOT EXISTS ix_{table}_project_version "
+                f"ON {table} (project_id, version)"
+            )
+        )
+
+
+def _project_soft_delete(conn: Connection) -> None:
+    _add_column(conn, "projects", "deleted_at", "FLOAT")
+    conn.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS ix_projects_deleted_at "
+            "ON projects (deleted_at) WHERE deleted_at IS NOT NULL"
+        )
+    )
+    # Recreated by install_triggers with the deleted-project condition.
+    drop_tombstone_triggers(conn)
+
+
+def _search_index(conn: Connection) -> None:
+    install_search(conn)
+    rebuild_search(conn)
+
+
+def _task_progress(conn: Connection) -> None:
+    from .models import TaskProgress
+
+    TaskProgress.__table__.create(conn, checkfirst=True)
+    rebuild_progress(conn)
+
+
+def _plan_job_claim_indexes(conn: Connection) -> None:
+    # Claims now pick a client first, then its job (see plan_jobs._CLAIM).
+    if not inspect(conn).has_table("plan_jobs"):
+        return  # created from the model
+    for name, columns in (
+        ("ix_plan_jobs_claim", "status, client_id"),
+        ("ix_plan_jobs_client_status", "client_id, status, created_at"),
+    ):
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        conn.execute(text(f"CREATE INDEX {name} ON plan_jobs ({columns})"))
+
+
+MIGRATIONS: List[Tuple[int, Callable[[Connection], None]]] = [
+    (1, _sparse_task_order),
+    (2, _project_listing_index),
+    (3, _board_indexes),
+    (4, _project_version),
+    (5, _row_versions),
+    (6, _project_soft_delete),
+    (7, _search_index),
+    (8, _task_progress),
+    (9, _plan_job_claim_indexes),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def run_migrations(engine: Engine) -> None:
+    from . import models  # noqa: F401  (registers tables on Base.metadata)
+
+    with engine.begin() as conn:
+        fresh = not inspect(conn).has_table("projects")
+        version = conn.execute(text("PRAGMA user_version")).scalar() or 0
+
+        if not fresh:
+            for step_version, step in MIGRATIONS:
+                if step_version > version:
+                    step(conn)
+
+        Base.metadata.create_all(conn)
+        conn.execute(
+            text("INSERT OR IGNORE INTO version_counter (id, value) VALUES (1, 0)")
+        )
+        install_triggers(conn)
+        install_search(conn)
+        install_progress(conn)
+        conn.execute(text(f"PRAGMA user_version = {LATEST_VERSION}"))
@@ -1,4 +1,14 @@
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    text,
+)
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
@@ -16,9 +26,12 @@ class Project(Base):
     goal_text = Column(Text, nullable=False)
     deadline = Column(String, nullable=True)
     hours_per_week = Column(Integer, nullable=True)
+    version = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(
         DateTime(timezone=True), server_default=func.now(), nullable=False
     )
+    # Epoch seconds; set when the project is deleted, until it is purged.
+    deleted_at = Column(Float, nullable=True)
 
     milestones = relationship(
         "Milestone",
@@ -35,6 +48,15 @@ class Project(Base):
         order_by="Task.order_index",
     )
 
+    __table_args__ = (
+        Index("ix_projects_created_at_id", "created_at", "id"),
+        Index(
+            "ix_projects_deleted_at",
+            "deleted_at",
+            sqlite_where=text("deleted_at IS NOT NULL"),
+        ),
+    )
+
 
 class Milestone(Base):
     __tablename__ = "milestones"
@@ -49,6 +71,7 @@ class Milestone(Base):
     title = Column(String, nullable=False)
     description = Column(Text, nullable=True)
     order_index = Column(Integer, nullable=False, default=0)
+    version = Column(Integer, nullable=False, default=0, server_default="0")
 
     project = relationship("Project", back_populates="milestones")
     tasks = relationship(
@@ -59,6 +82,11 @@ class Milestone(Base):
         order_by="Task.order_index",
     )
 
+    __table_args__ = (
+        Index("ix_milestones_project_order", "project_id", "order_index"),
+        Index("ix_milestones_project_version", "project_id", "version"),
+    )
+
 
 class Task(Base):
     __tablename__ = "tasks"
@@ -83,6 +111,122 @@ class Task(Base):
     due_date = Column(String, nullable=True)
     estimate = Column(String, nullable=True)  # S, M, L
     order_index = Column(Integer, nullable=False, default=0)
+    version = Column(Integer, nullable=False, default=0, server_default="0")
 
     project = relationship("Project", back_populates="tasks")
     milestone = relationship("Milestone", back_populates="tasks")
+
+    # Board columns: neighbour lookups for ordering keys and column reads;
+    # (project_id, version) serves delta sync.
+    __table_args__ = (
+        Index("ix_tasks_project_status_order", "project_id", "status", "order_index"),
+        Index("ix_tasks_project_version", "project_id", "version"),
+    )
+
+
+class TaskProgress(Base):
+    """Task counts for a project (milestone_id 0) or one of its milestones,
+    maintained by the triggers in app/progress.py."""
+
+    __tablename__ = "task_progress"
+
+    project_id = Column(
+        Integer, ForeignKey("projects.id", ondelete="CASCADE"), primary_key=True
+    )
+    milestone_id = Column(Integer, primary_key=True)
+    todo = Column(Integer, nullable=False, default=0, server_default="0")
+    in_progress = Column(Integer, nullable=False, default=0, server_default="0")
+    done = Column(Integer, nullable=False, default=0, server_default="0")
+    # Sum of estimate weights (see progress.ESTIMATE_WEIGHTS).
+    weight = Column(Integer, nullable=False, default=0, server_default="0")
+    done_weight = Column(Integer, nullable=False, default=0, server_default="0")
+
+
+class PlanCacheEntry(Base):
+    __tablename__ = "plan_cache"
+
+    namespace = Column(String, primary_key=True)  # generate, revise
+    key = Column(String, primary_key=True)
+    payload = Column(Text, nullable=False)  # PlanResponse JSON
+    created_at = Column(Float, nullable=False)
+    expires_at = Column(Float, nullable=False, index=True)
+
+
+class PlanSimilarEntry(Base):
+    """Near-duplicate index row: a canonicalised generate request pointing at
+    its plan in the generate namespace of plan_cache."""
+
+    __tablename__ = "plan_similar"
+
+    key = Column(String, primary_key=True)  # hash of partition + text
+    partition = Column(String, nullable=False)  # fields that must match
+    text = Column(Text, nullable=False)  # canonical goal and constraints
+    cache_key = Column(String, nullable=False)
+    created_at = Column(Float, nullable=False, index=True)
+    expires_at = Column(Float, nullable=False, index=True)
+
+
+class VersionCounter(Base):
+    __tablename__ = "version_counter"
+
+    id = Column(Integer, primary_key=True)  # single row, id 1
+    value = Column(Integer, nullable=False, default=0)
+
+
+class DeletedRow(Base):
+    """Tombstone for a deleted task or milestone, written by a trigger.
+
+    No foreign key to projects: rows are written while a project's children
+    are being cascade-deleted. Project deletes clear them explicitly.
+    """
+
+    __tablename__ = "deleted_rows"
+
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, nullable=False)
+    kind = Column(String, nullable=False)  # task, milestone
+    row_id = Column(Integer, nullable=False)
+    version = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("ix_deleted_rows_project_version", "project_id", "version"),
+    )
+
+
+class PlanJob(Base):
+    """Queued plan generation or revision, claimed by plan_jobs workers.
+
+    Times are epoch seconds, like the plan cache. ``lease_until`` bounds how
+    long a claim holds: a job whose worker died is requeued once it passes.
+    """
+
+    __tablename__ = "plan_jobs"
+
+    id = Column(String, primary_key=True)  # uuid4 hex
+    kind = Column(String, nullable=False)  # generate, revise
+    client_id = Column(String, nullable=False)
+    project_id = Column(Integer, nullable=True)
+    cache_key = Column(String, nullable=False)
+    priority = Column(Integer, nullable=False, default=5)
+    status = Column(String, nullable=False)  # queued, running, succeeded, failed
+    payload = Column(Text, nullable=False)  # merged input JSON
+    result = Column(Text, nullable=True)  # PlanResponse JSON
+    error = Column(String, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    worker = Column(String, nullable=True)
+    run_after = Column(Float, nullable=False)
+    lease_until = Column(Float, nullable=True)
+    created_at = Column(Float, nullable=False)
+    started_at = Column(Float, nullable=True)
+    finished_at = Column(Float, nullable=True)
+
+    # Claiming groups queued jobs by client, ranks each client by its running
+    # count and last start, then takes that client's top-priority job;
+    # submits look for an identical pending job.
+    __table_args__ = (
+        Index("ix_plan_jobs_claim", "status", "client_id"),
+        Index("ix_plan_jobs_client_status", "client_id", "status", "created_at"),
+        Index("ix_plan_jobs_client_started", "client_id", "started_at"),
+        Index("ix_plan_jobs_kind_cache_key", "kind", "cache_key"),
+    )
@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+from bisect import bisect_left
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import case
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Tasks are ordered inside a (project, status) column by a sparse integer key
+# stored in Task.order_index. New keys are picked between the neighbours so a
+# single insert or move writes one row; the column is only rewritten when two
+# neighbours end up adjacent.
+ORDER_GAP = 1 << 16
+
+
+def spaced_keys(count: int) -> List[int]:
+    return [(i + 1) * ORDER_GAP for i in range(count)]
+
+
+def key_between(before: Optional[int], after: Optional[int]) -> Optional[int]:
+    if before is None and after is None:
+        return ORDER_GAP
+    if before is None:
+        return after - ORDER_GAP
+    if after is None:
+        return before + ORDER_GAP
+    if after - before < 2:
+        return None
+    return before + (after - before) // 2
+
+
+def _column_query(db: Session, project_id: int, status: str):
+    return db.query(models.Task.id, models.Task.order_index).filter(
+        models.Task.project_id == project_id,
+        models.Task.status == status,
+    )
+
+
+def _bulk_set_keys(db: Session, keys: Dict[int, int]) -> None:
+    if not keys:
+        return
+    db.query(models.Task).filter(models.Task.id.in_(keys.keys())).update(
+        {models.Task.order_index: case(keys, value=models.Task.id)},
+        synchronize_session=False,
+    )
+
+
+def rebalance_column(
+    db: Session, project_id: int, status: str, ordered_ids: Sequence[int] = ()
+) -> Dict[int, int]:
+    """Respace a column; ``ordered_ids`` go first, the rest keep their order."""
+    current = [
+        task_id
+        for task_id, _ in _column_query(db, project_id, status).order_by(
+            models.Task.order_index, models.Task.id
+        )
+    ]
+    leading = set(ordered_ids)
+    final = [*ordered_ids, *(i for i in current if i not in leading)]
+    keys = dict(zip(final, spaced_keys(len(final))))
+    _bulk_set_keys(db, keys)
+    return keys
+
+
+def insert_key(
+    db: Session,
+    project_id: int,
+    status: str,
+    position: int,
+    exclude: Optional[int] = None,
+) -> int:
+    """Key for a task placed at ``position`` in its column; ``exclude`` is
+    the moving task's id, left out when counting positions."""
+    position = max(position, 0)
+    column = _column_query(db, project_id, status).order_by(
+        models.Task.order_index, models.Task.id
+    )
+    if exclude is not None:
+        column = column.filter(models.Task.id != exclude)
+    if position == 0:
+        neighbours = [None, *(k for _, k in column.limit(1))]
+    else:
+        neighbours = [k for _, k in column.offset(position - 1).limit(2)]
+        if not neighbours:
+            last = column.order_by(None).order_by(
+                models.Task.order_index.desc(), models.Task.id.desc()
+            )
+            neighbours = [k for _, k in last.limit(1)]
+    before = neighbours[0] if neighbours else None
+    after = neighbours[1] if len(neighbours) > 1 else None
+
+    key = key_between(before, after)
+    if key is None:
+        rebalance_column(db, project_id, status)
+        return insert_key(db, project_id, status, position, exclude)
+    return key
+
+
+def _stable_positions(keys: Sequence[Optional[int]]) -> set[int]:
+    """Indices of the longest strictly increasing run of existing keys.
+
+    Those tasks are already in the right relative order and keep their keys.
+    """
+    tails: List[int] = []
+    tail_idx: List[int] = []
+    parent: List[int] = [-1] * len(keys)
+    for i, k in enumerate(keys):
+        if k is None:
+            continue
+        pos = bisect_left(tails, k)
+        if pos == len(tails):
+            tails.append(k)
+            tail_idx.append(i)
+        else:
+            tails[pos] = k
+            tail_idx[pos] = i
+        parent[i] = tail_idx[pos - 1] if pos > 0 else -1
+
+    stable = set()
+    i = tail_idx[-1] if tail_idx else -1
+    while i != -1:
+        stable.add(i)
+        i = parent[i]
+    return stable
+
+
+def assign_keys(
+    ordered_ids: Sequence[Hashable], current_keys: Sequence[Optional[int]]
+) -> Optional[Dict[Hashable, int]]:
+    """New keys for the items of a column that are out of order.
+
+    Items whose current key already fits keep it and are left out of the
+    result. Returns None when there is no room and the column needs
+    rebalancing.
+    """
+    stable = _stable_positions(current_keys)
+    result: Dict[Hashable, int] = {}
+    before: Optional[int] = None
+    i = 0
+    while i < len(ordered_ids):
+        if i in stable:
+            before = current_keys[i]
+            i += 1
+            continue
+        j = i
+        while j < len(ordered_ids) and j not in stable:
+            j += 1
+        after = current_keys[j] if j < len(ordered_ids) else None
+        for n in range(i, j):
+            key = key_between(before, after)
+            if key is None:
+                return None
+            result[ordered_ids[n]] = key
+            before = key
+        i = j
+    return result
+
+
+def reorder(
+    db: Session,
+    project_id: int,
+    current: Dict[int, Tuple[str, int]],
+    desired: Iterable[Tuple[int, str, int]],
+) -> Dict[int, Tuple[str, int]]:
+    """Move tasks to the desired (status, position) slots.
+
+    ``current`` maps task id to its stored (status, key). Tasks that are
+    already in the right relative order keep their key; the others get a key
+    between their new neighbours. Returns the final (status, key) per task.
+    """
+    columns: Dict[str, List[Tuple[int, int]]] = {}
+    for task_id, status, position in desired:
+        columns.setdefault(status, []).append((position, task_id))
+
+    final: Dict[int, Tuple[str, int]] = {}
+    for status, entries in columns.items():
+        ordered_ids = [task_id for _, task_id in sorted(entries)]
+        current_keys = [
+            current[t][1] if current[t][0] == status else None for t in ordered_ids
+        ]
+        assigned = assign_keys(ordered_ids, current_keys)
+        if assigned is None:
+            db.query(models.Task).filter(models.Task.id.in_(ordered_ids)).update(
+                {models.Task.status: status}, synchronize_session=False
+            )
+            keys = rebalance_column(db, project_id, status, ordered_ids)
+            for task_id in ordered_ids:
+                final[task_id] = (status, keys[task_id])
+            continue
+
+        for task_id, key in zip(ordered_ids, current_keys):
+            final[task_id] = (status, assigned.get(task_id, key))
+
+    moved = {t: v for t, v in final.items() if current[t] != v}
+    if moved:
+        db.query(models.Task).filter(models.Task.id.in_(moved.keys())).update(
+            {
+                models.Task.status: case(
+                    {t: s for t, (s, _) in moved.items()}, value=models.Task.id
+                ),
+                models.Task.order_index: case(
+                    {t: k for t, (_, k) in moved.items()}, value=models.Task.id
+                ),
+            },
+            synchronize_session=False,
+        )
+    return final
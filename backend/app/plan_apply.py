@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, insert, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .ordering import assign_keys, spaced_keys
+from .schemas import (
+    PlanApplyChanges,
+    PlanApplyInput,
+    PlanResponse,
+    ProjectCreate,
+    ProposeTask,
+)
+from .versioning import next_version
+
+
+def plan_columns(tasks: Sequence[ProposeTask]) -> Dict[str, List[int]]:
+    """Indices of ``tasks`` per status column, in plan order."""
+    columns: Dict[str, List[int]] = {}
+    ordered = sorted(
+        range(len(tasks)),
+        key=lambda i: (
+            tasks[i].milestone_index if tasks[i].milestone_index is not None else -1,
+            tasks[i].order_index,
+        ),
+    )
+    for i in ordered:
+        columns.setdefault(tasks[i].status, []).append(i)
+    return columns
+
+
+def _title_key(title: str) -> str:
+    return title.strip().casefold()
+
+
+def _match(
+    incoming: Sequence[str], existing: Sequence[Tuple[int, str]]
+) -> List[Optional[int]]:
+    """Pair incoming items with existing row ids, by title first then position.
+
+    ``incoming`` holds titles in plan order and ``existing`` (id, title) pairs
+    in stored order. Returns the matched id (or None) for each incoming item.
+    """
+    by_title: Dict[str, List[int]] = {}
+    for row_id, title in existing:
+        by_title.setdefault(_title_key(title), []).append(row_id)
+
+    matched: List[Optional[int]] = [None] * len(incoming)
+    used = set()
+    for i, title in enumerate(incoming):
+        candidates = by_title.get(_title_key(title))
+        if candidates:
+            matched[i] = candidates.pop(0)
+            used.add(matched[i])
+
+    leftovers = iter(row_id for row_id, _ in existing if row_id not in used)
+    for i in range(len(incoming)):
+        if matched[i] is None:
+            matched[i] = next(leftovers, None)
+    return matched
+
+
+def apply_diff(
+    db: Session, project_id: int, payload: PlanApplyInput
+) -> PlanApplyChanges:
+    """Bring the project's milestones and tasks in line with ``payload``.
+
+    Rows are matched to plan items by title, then by position, and only the
+    INSERT/UPDATE/DELETE statements needed for the differences are issued,
+    so unchanged rows keep their ids and are not rewritten.
+    """
+    changes = PlanApplyChanges()
+
+    # --- milestones ---
+    milestone_cols = (
+        models.Milestone.id,
+        models.Milestone.title,
+        models.Milestone.description,
+        models.Milestone.order_index,
+    )
+    existing_ms = (
+        db.query(*milestone_cols)
+        .filter(models.Milestone.project_id == project_id)
+        .order_by(models.Milestone.order_index, models.Milestone.id)
+        .all()
+    )
+    ms_by_id = {m.id: m for m in existing_ms}
+    ms_match = _match(
+        [m.title for m in payload.milestones],
+        [(m.id, m.title) for m in existing_ms],
+    )
+
+    milestone_ids: List[Optional[int]] = list(ms_match)
+    ms_updates = []
+    ms_inserts = []
+    for i, (m, row_id) in enumerate(zip(payload.milestones, ms_match)):
+        values = {
+            "title": m.title,
+            "description": m.description,
+            "order_index": m.order_index,
+        }
+        if row_id is None:
+            ms_inserts.append((i, {"project_id": project_id, **values}))
+            continue
+        row = ms_by_id[row_id]
+        if any(getattr(row, k) != v for k, v in values.items()):
+            ms_updates.append({"id": row_id, **values})
+
+    if ms_inserts:
+        new_ids = db.scalars(
+            insert(models.Milestone).returning(
+                models.Milestone.id, sort_by_parameter_order=True
+            ),
+            [values for _, values in ms_inserts],
+        ).all()
+        for (i, _), new_id in zip(ms_inserts, new_ids):
+            milestone_ids[i] = new_id
+    if ms_updates:
+        db.execute(update(models.Milestone), ms_updates)
+
+    # --- tasks ---
+    task_cols = (
+        models.Task.id,
+        models.Task.milestone_id,
+        models.Task.title,
+        models.Task.description,
+        models.Task.status,
+        models.Task.due_date,
+        models.Task.estimate,
+        models.Task.order_index,
+    )
+    existing_tasks = (
+        db.query(*task_cols)
+        .filter(models.Task.project_id == project_id)
+        .order_by(models.Task.status, models.Task.order_index, models.Task.id)
+        .all()
+    )
+    tasks_by_id = {t.id: t for t in existing_tasks}
+    task_match = _match(
+        [t.title for t in payload.tasks],
+        [(t.id, t.title) for t in existing_tasks],
+    )
+
+    order_keys: Dict[int, int] = {}
+    for status, indices in plan_columns(payload.tasks).items():
+        current_keys = []
+        for i in indices:
+            row = tasks_by_id.get(task_match[i])
+            current_keys.append(
+                row.order_index if row is not None and row.status == status else None
+            )
+        assigned = assign_keys(indices, current_keys)
+        if assigned is None:
+            order_keys.update(zip(indices, spaced_keys(len(indices))))
+        else:
+            for i, key in zip(indices, current_keys):
+                order_keys[i] = assigned.get(i, key)
+
+    task_inserts = []
+    task_updates = []
+    for i, (t, row_id) in enumerate(zip(payload.tasks, task_match)):
+        values = {
+            "milestone_id": (
+                milestone_ids[t.milestone_index]
+                if t.milestone_index is not None
+                else None
+            ),
+            "title": t.title,
+            "description": t.description,
+            "status": t.status,
+            "due_date": t.due_date,
+            "estimate": t.estimate,
+            "order_index": order_keys[i],
+        }
+        if row_id is None:
+            task_inserts.append({"project_id": project_id, **values})
+            continue
+        row = tasks_by_id[row_id]
+        if any(getattr(row, k) != v for k, v in values.items()):
+            task_updates.append({"id": row_id, **values})
+
+    if task_inserts:
+        db.execute(insert(models.Task), task_inserts)
+    if task_updates:
+        db.execute(update(models.Task), task_updates)
+
+    stale_tasks = set(tasks_by_id) - {i for i in task_match if i is not None}
+    if stale_tasks:
+        db.execute(
+            delete(models.Task).where(models.Task.id.in_(stale_tasks)),
+            execution_options={"synchronize_session": False},
+        )
+    stale_ms = set(ms_by_id) - {i for i in ms_match if i is not None}
+    if stale_ms:
+        db.execute(
+            delete(models.Milestone).where(models.Milestone.id.in_(stale_ms)),
+            execution_options={"synchronize_session": False},
+        )
+
+    changes.milestones_inserted = len(ms_inserts)
+    changes.milestones_updated = len(ms_updates)
+    changes.milestones_deleted = len(stale_ms)
+    changes.tasks_inserted = len(task_inserts)
+    changes.tasks_updated = len(task_updates)
+    changes.tasks_deleted = len(stale_tasks)
+    return changes
+
+
+def insert_projects_with_plans(
+    db: Session, items: Sequence[Tuple[ProjectCreate, PlanResponse]]
+) -> List[models.Project]:
+    """Create a project per item with its plan applied, in three statements.
+
+    Projects, milestones and tasks are each inserted with one executemany;
+    every row gets the same new version. Returns the projects in item order.
+    """
+    version = next_version(db)
+    projects = db.scalars(
+        insert(models.Project).returning(models.Project, sort_by_parameter_order=True),
+        [{**project.model_dump(), "version": version} for project, _ in items],
+    ).all()
+
+    ms_rows = [
+        {
+            "project_id": project.id,
+            "title": m.title,
+            "description": m.description,
+            "order_index": m.order_index,
+        }
+        for project, (_, plan) in zip(projects, items)
+        for m in plan.milestones
+    ]
+    ms_ids = (
+        db.scalars(
+            insert(models.Milestone).returning(
+                models.Milestone.id, sort_by_parameter_order=True
+            ),
+            ms_rows,
+        ).all()
+        if ms_rows
+        else []
+    )
+
+    task_rows = []
+    offset = 0
+    for project, (_, plan) in zip(projects, items):
+        milestone_ids = ms_ids[offset : offset + len(plan.milestones)]
+        offset += len(plan.milestones)
+        order_keys = {
+            i: key
+            for column in plan_columns(plan.tasks).values()
+            for i, key in zip(column, spaced_keys(len(column)))
+        }
+        for i, t in enumerate(plan.tasks):
+            task_rows.append(
+                {
+                    "project_id": project.id,
+                    "milestone_id": (
+                        milestone_ids[t.milestone_index]
+                        if t.milestone_index is not None
+                        else None
+                    ),
+                    "title": t.title,
+                    "description": t.description,
+                    "status": t.status,
+                    "due_date": t.due_date,
+                    "estimate": t.estimate,
+                    "order_index": order_keys[i],
+                }
+            )
+    if task_rows:
+        db.execute(insert(models.Task), task_rows)
+    return list(projects)
@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from . import models
+from .database import engine
+from .env import env_int
+from .metrics import REGISTRY
+from .schemas import PlanResponse
+
+
+class PlanCache:
+    """Two-tier cache for AI plans.
+
+    Tier 1 is an in-process LRU bounded by entry count, total bytes and TTL.
+    Tier 2 is the ``plan_cache`` table in the app database, shared by every
+    worker and kept across restarts. Keys are the sha256 hashes from
+    ``ai._cache_key_generate`` / ``ai._cache_key_revise``.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        ttl_seconds: int,
+        max_entries: int,
+        max_bytes: int,
+        disk_max_entries: int,
+    ):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_max_entries = disk_max_entries
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[PlanResponse, int, float]]" = (
+            OrderedDict()
+        )
+        self._bytes = 0
+        self._stats = {
+            "hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+
+    # --- memory tier ---
+    def _mem_get(self, key: str, now: float) -> Optional[PlanResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            plan, size, expires_at = entry
+            if expires_at <= now:
+                self._drop(key)
+                self._stats["expirations"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return plan
+
+    def _mem_put(
+        self, key: str, plan: PlanResponse, size: int, expires_at: float
+    ) -> None:
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (plan, size, expires_at)
+            self._bytes += size
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self._stats["evictions"] += 1
+
+    def _drop(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    # --- disk tier ---
+    def _disk_get(self, key: str, now: float) -> Optional[Tuple[str, float]]:
+        table = models.PlanCacheEntry.__table__
+        with engine.connect() as conn:
+            row = conn.execute(
+                select(table.c.payload, table.c.expires_at).where(
+                    table.c.namespace == self.namespace,
+                    table.c.key == key,
+                    table.c.expires_at > now,
+                )
+            ).first()
+        return (row.payload, row.expires_at) if row else None
+
+    def _disk_put(self, key: str, payload: str, now: float, expires_at: float):
+        table = models.PlanCacheEntry.__table__
+        stmt = sqlite_insert(table).values(
+            namespace=self.namespace,
+            key=key,
+            payload=payload,
+            created_at=now,
+            expires_at=expires_at,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.namespace, table.c.key],
+            set_={
+                "payload": stmt.excluded.payload,
+                "created_at": stmt.excluded.created_at,
+                "expires_at": stmt.excluded.expires_at,
+            },
+        )
+        with engine.begin() as conn:
+            conn.execute(stmt)
+            conn.execute(delete(table).where(table.c.expires_at <= now))
+
+            count = conn.execute(
+                select(func.count())
+                .select_from(table)
+                .where(table.c.namespace == self.namespace)
+            ).scalar_one()
+            overflow = count - self.disk_max_entries
+            if overflow > 0:
+                oldest = (
+                    select(table.c.key)
+                    .where(table.c.namespace == self.namespace)
+                    .order_by(table.c.created_at)
+                    .limit(overflow)
+                )
+                conn.execute(
+                    delete(table).where(
+                        table.c.namespace == self.namespace,
+                        table.c.key.in_(oldest),
+                    )
+                )
+                with self._lock:
+                    self._stats["evictions"] += overflow
+
+    # --- public ---
+    def get(self, key: str) -> Optional[PlanResponse]:
+        now = time.time()
+        plan = self._mem_get(key, now)
+        if plan is not None:
+            return plan
+
+        row = self._disk_get(key, now)
+        if row is None:
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+
+        payload, expires_at = row
+        plan = PlanResponse.model_validate_json(payload)
+        self._mem_put(key, plan, len(payload), expires_at)
+        with self._lock:
+            self._stats["disk_hits"] += 1
+        return plan
+
+    def set(self, key: str, plan: PlanResponse) -> None:
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        payload = plan.model_dump_json()
+        self._mem_put(key, plan, len(payload), expires_at)
+        self._disk_put(key, payload, now, expires_at)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+
+_caches: Dict[str, PlanCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_plan_cache(namespace: str) -> PlanCache:
+    # Built lazily so limits pick up .env values loaded in create_app.
+    with _caches_lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            cache = PlanCache(
+                namespace,
+                ttl_seconds=env_int("PLAN_CACHE_TTL_SECONDS", 7 * 24 * 3600),
+                max_entries=env_int("PLAN_CACHE_MAX_ENTRIES", 512),
+                max_bytes=env_int("PLAN_CACHE_MAX_BYTES", 16 * 1024 * 1024),
+                disk_max_entries=env_int("PLAN_CACHE_DISK_MAX_ENTRIES", 20000),
+            )
+            _caches[namespace] = cache
+        return cache
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    with _caches_lock:
+        caches = list(_caches.values())
+    return {c.namespace: c.stats() for c in caches}
+
+
+def _collect_metrics():
+    stats = cache_stats()
+    results = (("hits", "hit"), ("disk_hits", "disk_hit"), ("misses", "miss"))
+    return [
+        (
+            "plan_cache_lookups_total",
+            "counter",
+            "Plan cache lookups by result (disk_hit: memory miss, table hit).",
+            ("namespace", "result"),
+            [
+                ((ns, label), s[key])
+                for ns, s in stats.items()
+                for key, label in results
+            ],
+        ),
+        (
+            "plan_cache_removals_total",
+            "counter",
+            "Entries dropped from the in-memory tier.",
+            ("namespace", "reason"),
+            [
+                ((ns, reason), s[reason])
+                for ns, s in stats.items()
+                for reason in ("evictions", "expirations")
+            ],
+        ),
+        (
+            "plan_cache_entries",
+            "gauge",
+            "Entries in the in-memory tier.",
+            ("namespace",),
+            [((ns,), s["entries"]) for ns, s in stats.items()],
+        ),
+        (
+            "plan_cache_bytes",
+            "gauge",
+            "Payload bytes held by the in-memory tier.",
+            ("namespace",),
+            [((ns,), s["bytes"]) for ns, s in stats.items()],
+        ),
+    ]
+
+
+REGISTRY.add_collector(_collect_metrics)
@@ -0,0 +1,433 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select, text, update
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+
+from . import models
+from .ai import cached_plan, generate_plan_async, plan_cache_key, revise_plan_async
+from .database import engine
+from .env import env_float, env_int
+from .metrics import REGISTRY, Counter, Histogram
+from .schemas import (
+    GeneratePlanJob,
+    PlanGenerateInput,
+    PlanDraftResponse,
+    PlanJobResponse,
+    PlanReviseInput,
+    RevisePlanJob,
+)
+
+# Background plan generation. POST /plan/jobs writes a plan_jobs row and
+# returns; a bounded pool of asyncio workers claims rows and runs them
+# through the same cached, single-flight calls as the synchronous routes,
+# so finished jobs fill the plan cache too.
+#
+# The table is the queue, so jobs survive a restart. A claim is a single
+# UPDATE ... RETURNING that picks the client with the fewest running jobs
+# and the longest wait since it was last served, then that client's job of
+# highest priority, oldest first. Priority is the client's own, so it only
+# orders that client's jobs and cannot starve others. Claims hold a lease:
+# a job whose worker died is requeued once the lease passes. Failed
+# attempts are retried with exponential backoff and jitter.
+
+PENDING = ("queued", "running")
+TERMINAL = ("succeeded", "failed")
+
+_RUNNERS = {
+    "generate": (PlanGenerateInput, generate_plan_async, "Generate failed"),
+    "revise": (PlanReviseInput, revise_plan_async, "Revise failed"),
+}
+
+PLAN_JOBS = REGISTRY.register(
+    Counter(
+        "plan_jobs_total",
+        "Plan job outcomes. cached and deduplicated are resolved at submit.",
+        ("kind", "outcome"),
+    )
+)
+PLAN_JOB_QUEUE_SECONDS = REGISTRY.register(
+    Histogram(
+        "plan_job_queue_seconds",
+        "Time from submit to a job's first claim.",
+        ("kind",),
+        (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900),
+    )
+)
+
+
+class QueueFull(Exception):
+    pass
+
+
+# --- Submit / read (sync; routes call these from the threadpool) ---
+def submit_job(
+    db: Session, job: GeneratePlanJob | RevisePlanJob, client_id: str
+) -> models.PlanJob:
+    """Queue ``job``, or resolve it straight away.
+
+    A cached plan, exact or near-duplicate, yields an already-succeeded
+    job. An identical job that is still pending is returned instead of
+    queueing a duplicate.
+    """
+    key = plan_cache_key(job.kind, job.input)
+    Job = models.PlanJob
+
+    pending = (
+        db.query(Job)
+        .filter(Job.kind == job.kind, Job.cache_key == key, Job.status.in_(PENDING))
+        .first()
+    )
+    if pending is not None:
+        if job.priority > pending.priority:
+            pending.priority = job.priority
+            db.commit()
+        PLAN_JOBS.inc(job.kind, "deduplicated")
+        return pending
+
+    queued = (
+        db.query(func.count(Job.id))
+        .filter(Job.client_id == client_id, Job.status == "queued")
+        .scalar()
+    )
+    if queued >= env_int("PLAN_JOB_MAX_QUEUED_PER_CLIENT", 100):
+        raise QueueFull(client_id)
+
+    now = time.time()
+    cached = cached_plan(job.kind, job.input)
+    row = Job(
+        id=uuid.uuid4().hex,
+        kind=job.kind,
+        client_id=client_id,
+        project_id=job.project_id,
+        cache_key=key,
+        priority=job.priority,
+        status="succeeded" if cached else "queued",
+        payload=job.input.model_dump_json(),
+        result=cached.model_dump_json() if cached else None,
+        attempts=0,
+        max_attempts=max(1, env_int("PLAN_JOB_MAX_ATTEMPTS", 3)),
+        run_after=now,
+        created_at=now,
+        finished_at=now if cached else None,
+    )
+    db.add(row)
+    db.commit()
+
+    if cached:
+        PLAN_JOBS.inc(job.kind, "cached")
+    elif _pool is not None:
+        _pool.wake()
+    return row
+
+
+def job_response(job) -> PlanJobResponse:
+    return PlanJobResponse(
+        id=job.id,
+        kind=job.kind,
+        status=job.status,
+        priority=job.priority,
+        project_id=job.project_id,
+        attempts=job.attempts,
+        max_attempts=job.max_attempts,
+        error=job.error,
+        result=(
+            PlanDraftResponse.model_validate_json(job.result) if job.result else None
+        ),
+        created_at=job.created_at,
+        run_after=job.run_after,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+    )
+
+
+def load_job(job_id: str) -> Optional[PlanJobResponse]:
+    table = models.PlanJob.__table__
+    with engine.connect() as conn:
+        row = conn.execute(select(table).where(table.c.id == job_id)).first()
+    return job_response(row) if row else None
+
+
+# --- Workers ---
+_CLAIM = text("""
+    UPDATE plan_jobs
+    SET status = 'running', attempts = attempts + 1, worker = :worker,
+        started_at = :now, lease_until = :lease_until
+    WHERE status = 'queued' AND id = (
+        WITH RECURSIVE queued(client_id) AS (
+            -- One index seek per client with queued jobs, not a scan of them.
+            SELECT MIN(client_id) FROM plan_jobs WHERE status = 'queued'
+            UNION ALL
+            SELECT (SELECT MIN(client_id) FROM plan_jobs
+                    WHERE status = 'queued' AND client_id > q.client_id)
+            FROM queued AS q WHERE q.client_id IS NOT NULL
+        ), clients AS (
+            SELECT q.client_id,
+              (SELECT COUNT(*) FROM plan_jobs AS r
+               WHERE r.client_id = q.client_id AND r.status = 'running') AS running,
+              (SELECT COALESCE(MAX(r.started_at), 0) FROM plan_jobs AS r
+               WHERE r.client_id = q.client_id) AS served,
+              (SELECT MIN(r.created_at) FROM plan_jobs AS r
+               WHERE r.client_id = q.client_id AND r.status = 'queued') AS oldest
+            FROM queued AS q
+            WHERE q.client_id IS NOT NULL AND EXISTS (
+              SELECT 1 FROM plan_jobs AS r
+              WHERE r.client_id = q.client_id AND r.status = 'queued'
+                AND r.run_after <= :now
+            )
+        )
+        SELECT j.id FROM plan_jobs AS j
+        WHERE j.status = 'queued' AND j.run_after <= :now AND j.client_id = (
+            SELECT client_id FROM clients
+            WHERE :per_client = 0 OR running < :per_client
+            ORDER BY running, served, oldest
+            LIMIT 1
+        )
+        ORDER BY j.priority DESC, j.created_at
+        LIMIT 1
+    )
+    RETURNING id, kind, payload, attempts, max_attempts, created_at
+    """)
+
+# Jobs whose worker went away (crash, kill -9) without releasing them.
+_REQUEUE_EXPIRED = text("""
+    UPDATE plan_jobs
+    SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+        finished_at = CASE WHEN attempts >= max_attempts THEN :now END,
+        error = 'Worker lost', worker = NULL, lease_until = NULL, run_after = :now
+    WHERE status = 'running' AND lease_until < :now
+    """)
+
+
+class PlanJobPool:
+    """Bounded set of worker tasks on one event loop.
+
+    Several processes can each run a pool against the same database; the
+    claim statement is atomic, so a job is handed to one worker at a time.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.lease_seconds = env_float("PLAN_JOB_LEASE_SECONDS", 120)
+        self.poll_seconds = env_float("PLAN_JOB_POLL_SECONDS", 1)
+        self.backoff_seconds = env_float("PLAN_JOB_BACKOFF_SECONDS", 2)
+        self.backoff_max_seconds = env_float("PLAN_JOB_BACKOFF_MAX_SECONDS", 60)
+        self.max_running_per_client = env_int("PLAN_JOB_MAX_RUNNING_PER_CLIENT", 0)
+        self.retention_seconds = env_float("PLAN_JOB_RETENTION_SECONDS", 86400)
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        # job id -> (event set when it finishes here, number of waiters)
+        self._waiters: Dict[str, Tuple[asyncio.Event, int]] = {}
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._sweep())]
+        self._tasks += [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def wake(self) -> None:
+        """Wake idle workers; safe to call from any thread."""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def wait(self, job_id: str, timeout: float) -> None:
+        """Return when ``job_id`` finishes in this pool or ``timeout`` passes."""
+        event, count = self._waiters.get(job_id, (asyncio.Event(), 0))
+        self._waiters[job_id] = (event, count + 1)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            event, count = self._waiters[job_id]
+            if count > 1:
+                self._waiters[job_id] = (event, count - 1)
+            else:
+                del self._waiters[job_id]
+
+    def _finished(self, job_id: str) -> None:
+        waiter = self._waiters.get(job_id)
+        if waiter is not None:
+            waiter[0].set()
+
+    # --- database ---
+    def _claim(self) -> Optional[Row]:
+        now = time.time()
+        with engine.begin() as conn:
+            return conn.execute(
+                _CLAIM,
+                {
+                    "worker": self.worker_id,
+                    "now": now,
+                    "lease_until": now + self.lease_seconds,
+                    "per_client": self.max_running_per_client,
+                },
+            ).first()
+
+    def _release(self, job_id: str, **values) -> bool:
+        """Update a job this worker holds; False if its lease was lost."""
+        table = models.PlanJob.__table__
+        with engine.begin() as conn:
+            result = conn.execute(
+                update(table)
+                .where(
+                    table.c.id == job_id,
+                    table.c.worker == self.worker_id,
+                    table.c.status == "running",
+                )
+                .values(worker=None, lease_until=None, **values)
+            )
+        return result.rowcount == 1
+
+    def _housekeeping(self) -> int:
+        now = time.time()
+        table = models.PlanJob.__table__
+        with engine.begin() as conn:
+            requeued = conn.execute(_REQUEUE_EXPIRED, {"now": now}).rowcount
+            conn.execute(
+                delete(table).where(
+                    table.c.status.in_(TERMINAL),
+                    table.c.finished_at < now - self.retention_seconds,
+                )
+            )
+        return requeued
+
+    # --- loops ---
+    async def _sweep(self) -> None:
+        while True:
+            try:
+                if await asyncio.to_thread(self._housekeeping):
+                    self._wake.set()
+            except Exception:
+                pass
+            await asyncio.sleep(max(self.poll_seconds, self.lease_seconds / 4))
+
+    async def _work(self) -> None:
+        while True:
+            self._wake.clear()
+            try:
+                job = await asyncio.to_thread(self._claim)
+            except Exception:
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.backoff_max_seconds, self.backoff_seconds * 2 ** (attempt - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    async def _run(self, job: Row) -> None:
+        input_model, call, fail_msg = _RUNNERS[job.kind]
+        if job.attempts == 1:
+            PLAN_JOB_QUEUE_SECONDS.observe(time.time() - job.created_at, job.kind)
+
+        try:
+            payload = input_model.model_validate_json(job.payload)
+            plan = await asyncio.wait_for(call(payload), self.lease_seconds)
+        except asyncio.CancelledError:
+            # Shutting down: hand the job back without spending an attempt.
+            self._release(
+                job.id, status="queued", attempts=job.attempts - 1, run_after=0
+            )
+            raise
+        except Exception:
+            now = time.time()
+            if job.attempts < job.max_attempts:
+                outcome = "retried"
+                values = {
+                    "status": "queued",
+                    "error": fail_msg,
+                    "run_after": now + self._backoff(job.attempts),
+                }
+            else:
+                outcome = "failed"
+                values = {"status": "failed", "error": fail_msg, "finished_at": now}
+        else:
+            outcome = "succeeded"
+            values = {
+                "status": "succeeded",
+                "result": plan.model_dump_json(),
+                "error": None,
+                "finished_at": time.time(),
+            }
+
+        if await asyncio.to_thread(self._release, job.id, **values):
+            PLAN_JOBS.inc(job.kind, outcome)
+            if outcome != "retried":
+                self._finished(job.id)
+
+
+_pool: Optional[PlanJobPool] = None
+
+
+async def start_workers() -> None:
+    """Start this process's pool; PLAN_JOB_WORKERS=0 leaves it API-only."""
+    global _pool
+    workers = env_int("PLAN_JOB_WORKERS", 4)
+    if workers > 0 and _pool is None:
+        _pool = PlanJobPool(workers)
+        await _pool.start()
+
+
+async def stop_workers() -> None:
+    global _pool
+    if _pool is not None:
+        pool, _pool = _pool, None
+        await pool.stop()
+
+
+async def wait_for_job(job_id: str, timeout: float) -> None:
+    # Jobs run by another process are only noticed by re-reading the row,
+    # so callers poll with short timeouts.
+    if _pool is not None:
+        await _pool.wait(job_id, timeout)
+    else:
+        await asyncio.sleep(timeout)
+
+
+def _collect_metrics():
+    table = models.PlanJob.__table__
+    try:
+        with engine.connect() as conn:
+            counts = dict(
+                conn.execute(
+                    select(table.c.status, func.count())
+                    .where(table.c.status.in_(PENDING))
+                    .group_by(table.c.status)
+                ).all()
+            )
+    except Exception:
+        counts = {}
+    return [
+        (
+            "plan_jobs",
+            "gauge",
+            "Plan jobs waiting or running.",
+            ("status",),
+            [((status,), counts.get(status, 0)) for status in PENDING],
+        )
+    ]
+
+
+REGISTRY.add_collector(_collect_metrics)
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+from typing import List, Optional
+
+from pydantic import ValidationError
+
+from .schemas import PlanPatch, PlanResponse, ProposeTask
+
+# Compact revision protocol. The model sees the current plan as one short
+# line per milestone and task, and answers with a PlanPatch whose indices
+# refer to those lines. The patch is applied here; the caller normalises
+# the result like any other model output.
+
+_TASK_FIELDS = (
+    "title",
+    "description",
+    "milestone_index",
+    "status",
+    "estimate",
+    "order_index",
+)
+
+
+def _one_line(text: str) -> str:
+    return " ".join(text.split())
+
+
+def render_plan_lines(plan: PlanResponse) -> List[str]:
+    """``M<i>|title`` per milestone, ``T<i>|milestone|estimate|status|title``
+    per task."""
+    lines = [f"M{i}|{_one_line(m.title)}" for i, m in enumerate(plan.milestones)]
+    lines += [
+        f"T{i}|{'' if t.milestone_index is None else t.milestone_index}"
+        f"|{t.estimate or ''}|{t.status}|{_one_line(t.title)}"
+        for i, t in enumerate(plan.tasks)
+    ]
+    return lines
+
+
+def apply_patch(plan: PlanResponse, patch: PlanPatch) -> PlanResponse:
+    """Apply ``patch`` to a copy of ``plan``.
+
+    Ops with an index outside the plan, or that would leave a task without
+    a title, are skipped. Added tasks go to the end of their milestone
+    unless they carry an order_index; order_index is then renumbered 0..
+    within each milestone.
+    """
+    milestones = [m.model_copy() for m in plan.milestones]
+    tasks: List[Optional[ProposeTask]] = [t.model_copy() for t in plan.tasks]
+    added: List[ProposeTask] = []
+    placed = set()  # ids of tasks whose order_index the patch set
+
+    for op in patch.ops:
+        fields = {
+            name: value
+            for name in _TASK_FIELDS
+            if (value := getattr(op, name)) is not None
+        }
+        if "title" in fields and not fields["title"].strip():
+            del fields["title"]
+        if "order_index" in fields:  # a position; the model may go below 0
+            fields["order_index"] = max(0, fields["order_index"])
+
+        if op.op == "add":
+            try:
+                task = ProposeTask.model_validate(fields)
+            except ValidationError:
+                continue
+            if op.order_index is not None:
+                placed.add(id(task))
+            added.append(task)
+            continue
+
+        index = op.index
+        if op.op == "milestone":
+            if index is not None and 0 <= index < len(milestones):
+                update = {k: fields[k] for k in ("title", "description") if k in fields}
+                milestones[index] = milestones[index].model_copy(update=update)
+            continue
+
+        if index is None or not 0 <= index < len(tasks) or tasks[index] is None:
+            continue
+        if op.op == "remove":
+            tasks[index] = None
+        else:
+            tasks[index] = tasks[index].model_copy(update=fields)
+
+    kept = [t for t in tasks if t is not None]
+    result = kept + added
+
+    def milestone_of(task: ProposeTask) -> int:
+        m = task.milestone_index
+        return m if m is not None and 0 <= m < len(milestones) else 0
+
+    def sort_key(item):
+        position, task = item
+        appended = position >= len(kept) and id(task) not in placed
+        return (
+            milestone_of(task),
+            float("inf") if appended else task.order_index,
+            position,
+        )
+
+    ordered = [t for _, t in sorted(enumerate(result), key=sort_key)]
+    counters: dict = {}
+    for task in ordered:
+        m = milestone_of(task)
+        task.order_index = counters.get(m, 0)
+        counters[m] = task.order_index + 1
+
+    return PlanResponse(type="plan", milestones=milestones, tasks=ordered)
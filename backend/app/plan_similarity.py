@@ -0,0 +1,307 @@
+from __future__ import annotations
+
+import hashlib
+import random
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from . import models
+from .database import engine
+from .env import env_float, env_int
+from .metrics import REGISTRY
+from .schemas import PlanGenerateInput, PlanResponse
+
+# Near-duplicate tier for generated plans. Goals are canonicalised (case,
+# whitespace, punctuation, number formats) and requests are partitioned by
+# the fields that must match exactly. Within a partition, a MinHash/LSH
+# index over character shingles finds candidates; the Jaccard similarity
+# of their shingle sets decides whether a cached plan is close enough.
+#
+# Entries point at plans in the exact generate cache, so the plans are
+# stored once. Rows persist in plan_similar; each process keeps the index
+# in memory and picks up rows written elsewhere on its next lookup.
+
+SHINGLE = 3
+BANDS = 16
+ROWS = 4  # BANDS * ROWS hash functions; candidates from ~J 0.5 up
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240611)
+_PERMS = [
+    (_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(BANDS * ROWS)
+]
+
+_NUMBER_WORDS = {
+    word: str(i)
+    for i, word in enumerate(
+        "zero one two three four five six seven eight nine ten eleven twelve "
+        "thirteen fourteen fifteen sixteen seventeen eighteen nineteen "
+        "twenty".split()
+    )
+}
+_NUMBER_WORDS.update(
+    {
+        w: str(n)
+        for w, n in zip(("thirty", "forty", "fifty", "sixty"), range(30, 70, 10))
+    }
+)
+
+_THOUSANDS = re.compile(r"(?<=\d)[,_](?=\d{3}(?!\d))")
+_TRAILING_ZEROS = re.compile(r"(\d+)\.0+(?!\d)")
+_NON_DECIMAL_DOT = re.compile(r"(?<!\d)\.|\.(?!\d)")
+_PUNCTUATION = re.compile(r"[^\w\s.]|_")
+
+
+def canonicalize(text: Optional[str]) -> str:
+    """Casefolded, unpunctuated ``text`` with number words as digits."""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = _THOUSANDS.sub("", text)
+    text = _TRAILING_ZEROS.sub(r"\1", text)
+    text = _NON_DECIMAL_DOT.sub(" ", text)
+    text = _PUNCTUATION.sub(" ", text)
+    return " ".join(_NUMBER_WORDS.get(word, word) for word in text.split())
+
+
+def _partition(p: PlanGenerateInput, model: str) -> str:
+    return "|".join(
+        [
+            str(p.experience_level or ""),
+            str(p.detail_level or ""),
+            str(p.hours_per_week if p.hours_per_week is not None else ""),
+            canonicalize(p.deadline),
+            model,
+        ]
+    )
+
+
+def _text(p: PlanGenerateInput) -> str:
+    constraints = canonicalize(p.constraints)
+    goal = canonicalize(p.goal_text)
+    return f"{goal} | {constraints}" if constraints else goal
+
+
+def shingles(text: str) -> Set[str]:
+    if len(text) <= SHINGLE:
+        return {text}
+    return {text[i : i + SHINGLE] for i in range(len(text) - SHINGLE + 1)}
+
+
+def signature(items: Set[str]) -> Tuple[int, ...]:
+    hashes = [
+        int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big")
+        for s in items
+    ]
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMS)
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+class _Entry(NamedTuple):
+    partition: str
+    shingles: Set[str]
+    bands: List[Tuple[int, ...]]
+    cache_key: str
+    expires_at: float
+
+
+class NearDuplicateIndex:
+    def __init__(self, threshold: float, max_entries: int, ttl_seconds: float):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._buckets: Dict[Tuple[str, int, Tuple[int, ...]], Set[str]] = {}
+        self._loaded_until = 0.0  # created_at of the newest row loaded
+        self._stats = {"near_hits": 0, "misses": 0}
+
+    # --- memory ---
+    def _insert(
+        self, key: str, partition: str, text: str, cache_key: str, expires_at: float
+    ):
+        items = shingles(text)
+        sig = signature(items)
+        bands = [sig[i * ROWS : (i + 1) * ROWS] for i in range(BANDS)]
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(partition, items, bands, cache_key, expires_at)
+            for i, band in enumerate(bands):
+                self._buckets.setdefault((partition, i, band), set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for i, band in enumerate(entry.bands):
+            bucket = self._buckets.get((entry.partition, i, band))
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[(entry.partition, i, band)]
+
+    def _candidates(self, partition: str, items: Set[str], now: float):
+        sig = signature(items)
+        with self._lock:
+            keys: Set[str] = set()
+            for i in range(BANDS):
+                band = sig[i * ROWS : (i + 1) * ROWS]
+                keys |= self._buckets.get((partition, i, band), set())
+            entries = [(k, self._entries[k]) for k in keys]
+        scored = [
+            (jaccard(items, e.shingles), k, e.cache_key)
+            for k, e in entries
+            if e.expires_at > now
+        ]
+        return sorted((c for c in scored if c[0] >= self.threshold), reverse=True)
+
+    # --- disk ---
+    def _refresh(self, now: float) -> None:
+        table = models.PlanSimilarEntry.__table__
+        with engine.connect() as conn:
+            rows = conn.execute(
+                select(table)
+                .where(
+                    table.c.created_at > self._loaded_until,
+                    table.c.expires_at > now,
+                )
+                .order_by(table.c.created_at)
+                .limit(self.max_entries)
+            ).all()
+        for row in rows:
+            self._insert(
+                row.key, row.partition, row.text, row.cache_key, row.expires_at
+            )
+            self._loaded_until = max(self._loaded_until, row.created_at)
+
+    def _forget(self, key: str) -> None:
+        with self._lock:
+            self._remove(key)
+        table = models.PlanSimilarEntry.__table__
+        with engine.begin() as conn:
+            conn.execute(delete(table).where(table.c.key == key))
+
+    # --- public ---
+    def lookup(
+        self,
+        payload: PlanGenerateInput,
+        model: str,
+        fetch: Callable[[str], Optional[PlanResponse]],
+    ) -> Optional[Tuple[PlanResponse, float]]:
+        """Best cached plan at or above the threshold, with its similarity.
+
+        ``fetch`` reads a plan from the exact cache; entries whose plan has
+        gone from it are dropped.
+        """
+        now = time.time()
+        self._refresh(now)
+        partition = _partition(payload, model)
+        for score, key, cache_key in self._candidates(
+            partition, shingles(_text(payload)), now
+        ):
+            plan = fetch(cache_key)
+            if plan is not None:
+                with self._lock:
+                    self._stats["near_hits"] += 1
+                return plan, score
+            self._forget(key)
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def add(self, payload: PlanGenerateInput, model: str, cache_key: str) -> None:
+        now = time.time()
+        partition = _partition(payload, model)
+        text = _text(payload)
+        key = hashlib.sha256(f"{partition}\n{text}".encode()).hexdigest()
+        expires_at = now + self.ttl_seconds
+        self._insert(key, partition, text, cache_key, expires_at)
+
+        table = models.PlanSimilarEntry.__table__
+        stmt = sqlite_insert(table).values(
+            key=key,
+            partition=partition,
+            text=text,
+            cache_key=cache_key,
+            created_at=now,
+            expires_at=expires_at,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.key],
+            set_={
+                "cache_key": stmt.excluded.cache_key,
+                "created_at": stmt.excluded.created_at,
+                "expires_at": stmt.excluded.expires_at,
+            },
+        )
+        with engine.begin() as conn:
+            conn.execute(stmt)
+            conn.execute(delete(table).where(table.c.expires_at <= now))
+            overflow = (
+                conn.execute(select(func.count()).select_from(table)).scalar_one()
+                - self.max_entries
+            )
+            if overflow > 0:
+                oldest = (
+                    select(table.c.key)
+                    .order_by(table.c.created_at)
+                    .limit(overflow)
+                    .scalar_subquery()
+                )
+                conn.execute(delete(table).where(table.c.key.in_(oldest)))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries)}
+
+
+_index: Optional[NearDuplicateIndex] = None
+_index_lock = threading.Lock()
+
+
+def near_duplicates() -> Optional[NearDuplicateIndex]:
+    """The process-wide index, or None when PLAN_CACHE_NEAR_THRESHOLD <= 0."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            threshold = env_float("PLAN_CACHE_NEAR_THRESHOLD", 0.85)
+            if threshold <= 0:
+                return None
+            _index = NearDuplicateIndex(
+                threshold=min(threshold, 1.0),
+                max_entries=env_int("PLAN_CACHE_DISK_MAX_ENTRIES", 20000),
+                ttl_seconds=env_float("PLAN_CACHE_TTL_SECONDS", 7 * 24 * 3600),
+            )
+        return _index
+
+
+def _collect_metrics():
+    stats = _index.stats() if _index is not None else {}
+    return [
+        (
+            "plan_cache_near_lookups_total",
+            "counter",
+            "Near-duplicate lookups after an exact generate cache miss.",
+            ("result",),
+            [
+                (("near_hit",), stats.get("near_hits", 0)),
+                (("miss",), stats.get("misses", 0)),
+            ],
+        )
+    ]
+
+
+REGISTRY.add_collector(_collect_metrics)
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import json
+import re
+from typing import Iterator, List, Optional, Tuple
+
+_KEY_BEFORE_ARRAY = re.compile(r'"(\w+)"\s*:\s*$')
+_ITEM_ARRAYS = {"milestones": "milestone", "tasks": "task"}
+
+
+class PlanItemParser:
+    """Pull complete milestone/task objects out of a partial PlanResponse JSON.
+
+    Text is fed as it streams in; each object inside the top-level
+    ``milestones`` or ``tasks`` arrays is yielded once its closing brace has
+    arrived, as ``("milestone" | "task", dict)``.
+    """
+
+    def __init__(self) -> None:
+        self._buf = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._array: Optional[str] = None
+        self._item_start: Optional[int] = None
+
+    def feed(self, text: str) -> List[Tuple[str, dict]]:
+        self._buf += text
+        return list(self._scan())
+
+    def _scan(self) -> Iterator[Tuple[str, dict]]:
+        buf = self._buf
+        while self._pos < len(buf):
+            i = self._pos
+            ch = buf[i]
+            self._pos += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if ch == "[" and self._depth == 1:
+                    m = _KEY_BEFORE_ARRAY.search(buf[max(0, i - 64) : i])
+                    self._array = _ITEM_ARRAYS.get(m.group(1)) if m else None
+                elif ch == "{" and self._depth == 2 and self._array:
+                    self._item_start = i
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if ch == "}" and self._depth == 2 and self._item_start is not None:
+                    raw = buf[self._item_start : i + 1]
+                    self._item_start = None
+                    try:
+                        yield self._array, json.loads(raw)
+                    except ValueError:
+                        pass
+                elif ch == "]" and self._depth == 1:
+                    self._array = None
+
+
+def sse_event(event: str, data: dict, event_id: Optional[int] = None) -> str:
+    payload = json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {payload}\n\n"
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+# Per-project and per-milestone task counts in task_progress, so listing
+# progress costs one row per project instead of a scan of its tasks. Like
+# change tracking, they are kept by SQLite triggers in the writing
+# transaction, which covers ORM writes, plan apply's bulk statements and
+# milestone deletes (whose tasks are moved out by ON DELETE SET NULL).
+#
+# milestone_id 0 holds the whole project. Increments upsert, so a row
+# appears with its first task; decrements only update, so a row removed with
+# its milestone is not brought back. Tasks of a deleted project are not
+# counted down: the project's rows go with it when it is purged.
+
+ESTIMATE_WEIGHTS = {"S": 1, "M": 2, "L": 3}
+
+_COLUMNS = ("todo", "in_progress", "done", "weight", "done_weight")
+
+
+def _weight(r: str) -> str:
+    cases = " ".join(f"WHEN '{k}' THEN {w}" for k, w in ESTIMATE_WEIGHTS.items())
+    return f"(CASE {r}.estimate {cases} ELSE 0 END)"
+
+
+def _counts(r: str) -> tuple[str, ...]:
+    return (
+        f"({r}.status = 'todo')",
+        f"({r}.status = 'in_progress')",
+        f"({r}.status = 'done')",
+        _weight(r),
+        f"({r}.status = 'done') * {_weight(r)}",
+    )
+
+
+def _add(r: str) -> str:
+    counts = ", ".join(_counts(r))
+    updates = ", ".join(f"{c} = {c} + excluded.{c}" for c in _COLUMNS)
+    return f"""
+        INSERT INTO task_progress (project_id, milestone_id, {", ".join(_COLUMNS)})
+        SELECT {r}.project_id, m.id, {counts}
+        FROM (
+            SELECT 0 AS id
+            UNION ALL SELECT {r}.milestone_id WHERE {r}.milestone_id IS NOT NULL
+        ) AS m
+        WHERE true
+        ON CONFLICT (project_id, milestone_id) DO UPDATE SET {updates};
+    """
+
+
+def _subtract(r: str) -> str:
+    updates = ", ".join(f"{c} = {c} - {e}" for c, e in zip(_COLUMNS, _counts(r)))
+    return f"""
+        UPDATE task_progress SET {updates}
+        WHERE project_id = {r}.project_id AND milestone_id IN (0, {r}.milestone_id);
+    """
+
+
+TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_tasks_progress_insert
+    AFTER INSERT ON tasks
+    BEGIN
+        {_add("NEW")}
+    END
+    """,
+    # Reorders rewrite status without changing it; the WHEN skips them.
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_tasks_progress_update
+    AFTER UPDATE OF status, estimate, milestone_id, project_id ON tasks
+    WHEN NEW.status IS NOT OLD.status
+        OR NEW.estimate IS NOT OLD.estimate
+        OR NEW.milestone_id IS NOT OLD.milestone_id
+        OR NEW.project_id IS NOT OLD.project_id
+    BEGIN
+        {_subtract("OLD")}
+        {_add("NEW")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_tasks_progress_delete
+    AFTER DELETE ON tasks
+    WHEN EXISTS (
+        SELECT 1 FROM projects
+        WHERE id = OLD.project_id AND deleted_at IS NULL
+    )
+    BEGIN
+        {_subtract("OLD")}
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_milestones_progress_delete
+    AFTER DELETE ON milestones
+    BEGIN
+        DELETE FROM task_progress
+        WHERE project_id = OLD.project_id AND milestone_id = OLD.id;
+    END
+    """,
+]
+
+
+def install_progress(conn: Connection) -> None:
+    for ddl in TRIGGERS:
+        conn.execute(text(ddl))
+
+
+def rebuild_progress(conn: Connection) -> None:
+    """Recount every project and milestone from its tasks."""
+    sums = ", ".join(f"sum({e})" for e in _counts("t"))
+    columns = ", ".join(_COLUMNS)
+    conn.execute(text("DELETE FROM task_progress"))
+    conn.execute(text(f"""
+            INSERT INTO task_progress (project_id, milestone_id, {columns})
+            SELECT t.project_id, 0, {sums} FROM tasks AS t GROUP BY t.project_id
+            """))
+    conn.execute(text(f"""
+            INSERT INTO task_progress (project_id, milestone_id, {columns})
+            SELECT t.project_id, t.milestone_id, {sums} FROM tasks AS t
+            WHERE t.milestone_id IS NOT NULL
+            GROUP BY t.project_id, t.milestone_id
+            """))
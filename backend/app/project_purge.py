@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import List, Optional
+
+from sqlalchemy import delete, select
+
+from . import models
+from .database import engine
+from .env import env_float, env_int
+
+# Project deletion in two steps. The delete request only stamps
+# projects.deleted_at (and bumps the version), which hides the project from
+# every read. Purging then removes its tasks and milestones in chunks of
+# PROJECT_PURGE_CHUNK rows, one short transaction per chunk with a
+# PROJECT_PURGE_PAUSE_MS gap, so waiting writers get the lock in between
+# (SQLite's busy handler polls, so without the gap the next chunk usually
+# wins). The project row and its tombstones go last. Tombstone triggers
+# skip rows of deleted projects (see change_tracking), so the purge does
+# not write one per row.
+#
+# DELETE /projects/{id} purges inline; with ?soft=true it returns at once
+# and the background purger below does it. The purger also finishes
+# purges that a restart interrupted.
+
+
+def _chunk_size() -> int:
+    return max(1, env_int("PROJECT_PURGE_CHUNK", 500))
+
+
+def _delete_children(model, project_id: int, chunk: int, pause: float) -> None:
+    while True:
+        ids = (
+            select(model.id).where(model.project_id == project_id).limit(chunk)
+        ).scalar_subquery()
+        with engine.begin() as conn:
+            if not conn.execute(delete(model).where(model.id.in_(ids))).rowcount:
+                return
+        time.sleep(pause)
+
+
+def purge_project(project_id: int) -> None:
+    """Remove a project marked deleted, with everything under it."""
+    chunk = _chunk_size()
+    pause = env_float("PROJECT_PURGE_PAUSE_MS", 10) / 1000
+    # Tasks first: deleting milestones would otherwise rewrite each of
+    # their tasks' milestone_id (ON DELETE SET NULL).
+    _delete_children(models.Task, project_id, chunk, pause)
+    _delete_children(models.Milestone, project_id, chunk, pause)
+    with engine.begin() as conn:
+        conn.execute(
+            delete(models.Project).where(
+                models.Project.id == project_id,
+                models.Project.deleted_at.is_not(None),
+            )
+        )
+        conn.execute(
+            delete(models.DeletedRow).where(models.DeletedRow.project_id == project_id)
+        )
+
+
+def pending_purges(limit: int = 100) -> List[int]:
+    with engine.connect() as conn:
+        return list(
+            conn.execute(
+                select(models.Project.id)
+                .where(models.Project.deleted_at.is_not(None))
+                .order_by(models.Project.deleted_at)
+                .limit(limit)
+            ).scalars()
+        )
+
+
+class ProjectPurger:
+    """Purges soft-deleted projects in the background, one at a time."""
+
+    def __init__(self, poll_seconds: float):
+        self.poll_seconds = poll_seconds
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def wake(self) -> None:
+        """Safe to call from any thread."""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def _run(self) -> None:
+        while True:
+            self._wake.clear()
+            try:
+                for project_id in await asyncio.to_thread(pending_purges):
+                    await asyncio.to_thread(purge_project, project_id)
+            except Exception:
+                pass  # retried on the next pass
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+
+_purger: Optional[ProjectPurger] = None
+
+
+async def start_purger() -> None:
+    global _purger
+    if _purger is None:
+        _purger = ProjectPurger(env_float("PROJECT_PURGE_POLL_SECONDS", 30))
+        await _purger.start()
+
+
+async def stop_purger() -> None:
+    global _purger
+    if _purger is not None:
+        purger, _purger = _purger, None
+        await purger.stop()
+
+
+def schedule_purge() -> bool:
+    """Wake this process's purger; False when none is running."""
+    if _purger is None:
+        return False
+    _purger.wake()
+    return True
@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+import base64
+import json
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import TypeAdapter
+from sqlalchemy import String, and_, func, select, tuple_, type_coerce
+from sqlalchemy.orm import Session
+
+from . import models
+from .schemas import (
+    MilestoneProgress,
+    MilestoneResponse,
+    Progress,
+    ProjectChanges,
+    ProjectDetailResponse,
+    ProjectResponse,
+    ProjectStats,
+    ProjectSummary,
+    TaskResponse,
+)
+
+# Read paths that select only the response columns on the session's
+# connection (no ORM entity loading) and hand plain dicts to pydantic-core
+# in one validation pass.
+_milestone_list = TypeAdapter(List[MilestoneResponse])
+_task_list = TypeAdapter(List[TaskResponse])
+_project_list = TypeAdapter(List[ProjectResponse])
+_summary_list = TypeAdapter(List[ProjectSummary])
+
+GOAL_EXCERPT_CHARS = 240
+
+_PROJECT_COLUMNS = (
+    models.Project.id,
+    models.Project.title,
+    models.Project.goal_text,
+    models.Project.deadline,
+    models.Project.hours_per_week,
+    models.Project.version,
+)
+_MILESTONE_COLUMNS = (
+    models.Milestone.id,
+    models.Milestone.title,
+    models.Milestone.description,
+    models.Milestone.order_index,
+)
+_TASK_COLUMNS = (
+    models.Task.id,
+    models.Task.title,
+    models.Task.description,
+    models.Task.status,
+    models.Task.due_date,
+    models.Task.estimate,
+    models.Task.order_index,
+    models.Task.milestone_id,
+)
+_PROGRESS_COLUMNS = (
+    models.TaskProgress.todo,
+    models.TaskProgress.in_progress,
+    models.TaskProgress.done,
+    models.TaskProgress.weight,
+    models.TaskProgress.done_weight,
+)
+
+
+def _rows(db: Session, stmt) -> List[dict]:
+    result = db.connection().execute(stmt)
+    keys = list(result.keys())
+    return [dict(zip(keys, row)) for row in result]
+
+
+# --- Progress: precomputed counts from task_progress (see progress.py) ---
+def _with_progress(stmt, project_id=models.Project.id, milestone_id=0):
+    """Add the progress columns of the row for (``project_id``,
+    ``milestone_id``), which may be columns; outer joined, as projects and
+    milestones without tasks have none."""
+    return stmt.add_columns(*_PROGRESS_COLUMNS).outerjoin(
+        models.TaskProgress,
+        and_(
+            models.TaskProgress.project_id == project_id,
+            models.TaskProgress.milestone_id == milestone_id,
+        ),
+    )
+
+
+def _progress(row: dict) -> Progress:
+    """Pop the progress columns off ``row``."""
+    todo, in_progress, done, weight, done_weight = (
+        row.pop(c.key) or 0 for c in _PROGRESS_COLUMNS
+    )
+    total = todo + in_progress + done
+    return Progress(
+        todo=todo,
+        in_progress=in_progress,
+        done=done,
+        task_count=total,
+        estimate_weight=weight,
+        done_weight=done_weight,
+        percent_done=round(100 * done / total, 1) if total else 0.0,
+    )
+
+
+def project_progress(db: Session, project_ids: List[int]) -> Dict[int, Progress]:
+    rows = _rows(
+        db,
+        _with_progress(
+            select(models.Project.id).where(models.Project.id.in_(project_ids))
+        ),
+    )
+    return {r["id"]: _progress(r) for r in rows}
+
+
+def project_stats(db: Session, project_id: int) -> Optional[ProjectStats]:
+    project = _rows(
+        db,
+        _with_progress(
+            select(models.Project.id, models.Project.version).where(
+                models.Project.id == project_id, models.Project.deleted_at.is_(None)
+            )
+        ),
+    )
+    if not project:
+        return None
+    milestones = _rows(
+        db,
+        _with_progress(
+            select(models.Milestone.id, models.Milestone.title)
+            .where(models.Milestone.project_id == project_id)
+            .order_by(models.Milestone.order_index),
+            models.Milestone.project_id,
+            models.Milestone.id,
+        ),
+    )
+    return ProjectStats(
+        **project[0],
+        progress=_progress(project[0]),
+        milestones=[MilestoneProgress(**m, progress=_progress(m)) for m in milestones],
+    )
+
+
+def project_detail(db: Session, project_id: int) -> Optional[ProjectDetailResponse]:
+    project = _rows(
+        db,
+        _with_progress(
+            select(*_PROJECT_COLUMNS).where(
+                models.Project.id == project_id, models.Project.deleted_at.is_(None)
+            )
+        ),
+    )
+    if not project:
+        return None
+    project[0]["progress"] = _progress(project[0])
+
+    milestones = _rows(
+        db,
+        select(*_MILESTONE_COLUMNS)
+        .where(models.Milestone.project_id == project_id)
+        .order_by(models.Milestone.order_index),
+    )
+    tasks = _rows(
+        db,
+        select(*_TASK_COLUMNS)
+        .where(models.Task.project_id == project_id)
+        .order_by(models.Task.order_index),
+    )
+
+    return ProjectDetailResponse.model_construct(
+        **project[0],
+        milestones=_milestone_list.validate_python(milestones),
+        tasks=_task_list.validate_python(tasks),
+    )
+
+
+def project_changes(
+    db: Session, project_id: int, version: int, since: int
+) -> ProjectChanges:
+    """Milestones and tasks written after ``since``, plus tombstones.
+
+    ``version`` is the project's current version, read by the caller; when
+    nothing changed the row and tombstone queries are skipped.
+    """
+    changes = ProjectChanges(since=since, version=version)
+    if version <= since:
+        return changes
+
+    milestones = _rows(
+        db,
+        select(*_MILESTONE_COLUMNS)
+        .where(
+            models.Milestone.project_id == project_id,
+            models.Milestone.version > since,
+        )
+        .order_by(models.Milestone.order_index),
+    )
+    tasks = _rows(
+        db,
+        select(*_TASK_COLUMNS)
+        .where(models.Task.project_id == project_id, models.Task.version > since)
+        .order_by(models.Task.order_index),
+    )
+    deleted = db.connection().execute(
+        select(models.DeletedRow.kind, models.DeletedRow.row_id).where(
+            models.DeletedRow.project_id == project_id,
+            models.DeletedRow.version > since,
+        )
+    )
+
+    changes.milestones = _milestone_list.validate_python(milestones)
+    changes.tasks = _task_list.validate_python(tasks)
+    changes.progress = project_progress(db, [project_id]).get(project_id)
+    for kind, row_id in deleted:
+        if kind == "task":
+            changes.deleted_task_ids.append(row_id)
+        else:
+            changes.deleted_milestone_ids.append(row_id)
+    return changes
+
+
+# --- Project listing: keyset pagination on (created_at, id), newest first ---
+# created_at is compared as the stored text so the cursor round-trips exactly
+# and the ix_projects_created_at_id index is used.
+_created_at_raw = type_coerce(models.Project.created_at, String)
+
+
+def encode_cursor(created_at: str, project_id: int) -> str:
+    raw = json.dumps([created_at, project_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Raises ValueError for malformed cursors."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, project_id = json.loads(base64.urlsafe_b64decode(padded))
+        return str(created_at), int(project_id)
+    except Exception as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def _page(stmt, limit: Optional[int], cursor: Optional[str]):
+    stmt = stmt.where(models.Project.deleted_at.is_(None)).order_by(
+        _created_at_raw.desc(), models.Project.id.desc()
+    )
+    if cursor:
+        created_at, project_id = decode_cursor(cursor)
+        stmt = stmt.where(
+            tuple_(_created_at_raw, models.Project.id) < tuple_(created_at, project_id)
+        )
+    if limit is not None:
+        stmt = stmt.limit(limit + 1)
+    return stmt
+
+
+def _next_cursor(rows: List[dict], limit: Optional[int]) -> Optional[str]:
+    if limit is None or len(rows) <= limit:
+        return None
+    del rows[limit:]
+    last = rows[-1]
+    return encode_cursor(last["cursor_created_at"], last["id"])
+
+
+def list_projects(
+    db: Session, limit: Optional[int] = None, cursor: Optional[str] = None
+) -> Tuple[List[ProjectResponse], Optional[str]]:
+    rows = _rows(
+        db,
+        _page(
+            _with_progress(
+                select(*_PROJECT_COLUMNS, _created_at_raw.label("cursor_created_at"))
+            ),
+            limit,
+            cursor,
+        ),
+    )
+    next_cursor = _next_cursor(rows, limit)
+    for r in rows:
+        r["progress"] = _progress(r)
+    return _project_list.validate_python(rows), next_cursor
+
+
+def list_project_summaries(
+    db: Session, limit: int, cursor: Optional[str] = None
+) -> Tuple[List[ProjectSummary], Optional[str]]:
+    rows = _rows(
+        db,
+        _page(
+            _with_progress(
+                select(
+                    models.Project.id,
+                    models.Project.title,
+                    func.substr(models.Project.goal_text, 1, GOAL_EXCERPT_CHARS).label(
+                        "goal_excerpt"
+                    ),
+                    models.Project.deadline,
+                    models.Project.hours_per_week,
+                    _created_at_raw.label("cursor_created_at"),
+                )
+            ),
+            limit,
+            cursor,
+        ),
+    )
+    next_cursor = _next_cursor(rows, limit)
+    for r in rows:
+        progress = _progress(r)
+        r["task_count"], r["done_count"] = progress.task_count, progress.done
+    return _summary_list.validate_python(rows), next_cursor
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Mapping, Optional
+
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, TypeAdapter
+from starlette.types import Receive, Scope, Send
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib encoder
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    """Default response class: orjson when installed, stdlib json otherwise.
+
+    Covers routes that return plain dicts. Large model payloads go through
+    ``model_response`` instead.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def model_response(
+    value: Any,
+    adapter: Optional[TypeAdapter] = None,
+    headers: Optional[Mapping[str, str]] = None,
+) -> Response:
+    """Serialise an already-validated model (or list via ``adapter``) once.
+
+    Returning a Response skips FastAPI's response_model pass, which would
+    validate the value again and then encode it. The route keeps its
+    ``response_model`` for the OpenAPI schema. ``value`` must already be
+    the response type: nothing re-checks it.
+    """
+    if adapter is not None:
+        body = adapter.dump_json(value)
+    elif isinstance(value, BaseModel):
+        body = value.model_dump_json().encode()
+    else:
+        raise TypeError("model_response needs a BaseModel or a TypeAdapter")
+    return Response(body, media_type="application/json", headers=dict(headers or {}))
+
+
+def ndjson_line(value: Any) -> bytes:
+    """One newline-delimited JSON line."""
+    if orjson is not None:
+        return orjson.dumps(value) + b"\n"
+    return json.dumps(value, separators=(",", ":")).encode() + b"\n"
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """A streamed response whose body iterator also reads the request body.
+
+    StreamingResponse listens for the client disconnecting by reading
+    ``receive``, which would swallow request body chunks; here the iterator
+    sees a disconnect through ``request.stream()`` instead.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
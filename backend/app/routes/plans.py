@@ -1,28 +1,72 @@
-from fastapi import APIRouter, Depends, HTTPException
+from time import monotonic
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from ..database import get_db
+from ..events import publish
 from .. import models
 from ..schemas import (
+    ApplyMode,
     PlanGenerateInput,
+    PlanApplyChanges,
     PlanApplyInput,
-    ProjectDetailResponse,
+    PlanApplyResponse,
+    PlanDraftResponse,
+    PlanJobCreate,
+    PlanJobResponse,
     PlanResponse,
     PlanReviseInput,
 )
-from ..ai import generate_plan, revise_plan
+from ..ai import (
+    generate_plan_async,
+    revise_plan_async,
+    stream_generate_plan,
+    stream_revise_plan,
+)
+from ..plan_cache import cache_stats
+from ..plan_jobs import (
+    TERMINAL,
+    QueueFull,
+    job_response,
+    load_job,
+    submit_job,
+    wait_for_job,
+)
+from ..plan_stream import sse_event
+from ..queries import project_detail
+from ..responses import model_response
+from ..versioning import bump_project_version
+from ..ordering import spaced_keys
+from ..plan_apply import apply_diff, plan_columns
 
 router = APIRouter(prefix="/projects/{project_id}/plan", tags=["plans"])
 draft_router = APIRouter(prefix="/plan", tags=["plan-draft"])
 
 
 def _get_project(db: Session, project_id: int) -> models.Project:
-    project = db.query(models.Project).filter(models.Project.id == project_id).first()
+    project = (
+        db.query(models.Project)
+        .filter(models.Project.id == project_id, models.Project.deleted_at.is_(None))
+        .first()
+    )
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     return project
 
 
+def _load_project(db: Session, project_id: int) -> models.Project:
+    # For the AI routes: the session is closed before the model call so a
+    # slow LLM round trip does not hold a pooled connection. The loaded
+    # columns stay readable on the detached instance.
+    try:
+        return _get_project(db, project_id)
+    finally:
+        db.close()
+
+
 def _merge_plan_defaults(
     payload: PlanGenerateInput | PlanReviseInput, project: models.Project
 ):
@@ -39,42 +83,144 @@ def _merge_plan_defaults(
     )
 
 
-def _ai_call(fn, payload, fail_msg: str):
+async def _ai_call(fn, payload, fail_msg: str):
     try:
-        return fn(payload)
+        return await fn(payload)
     except Exception:
         raise HTTPException(status_code=502, detail=fail_msg)
 
 
-@router.post("/generate", response_model=PlanResponse)
-def generate(
+@router.post("/generate", response_model=PlanDraftResponse)
+async def generate(
     project_id: int, payload: PlanGenerateInput, db: Session = Depends(get_db)
 ):
-    project = _get_project(db, project_id)
+    project = await run_in_threadpool(_load_project, db, project_id)
     merged = _merge_plan_defaults(payload, project)
-    return _ai_call(generate_plan, merged, "Generate failed")
+    return await _ai_call(generate_plan_async, merged, "Generate failed")
 
 
-@draft_router.post("/generate", response_model=PlanResponse)
-def draft_generate(payload: PlanGenerateInput):
-    return _ai_call(generate_plan, payload, "Draft generate failed")
+@draft_router.post("/generate", response_model=PlanDraftResponse)
+async def draft_generate(payload: PlanGenerateInput):
+    return await _ai_call(generate_plan_async, payload, "Draft generate failed")
 
 
 @router.post("/revise", response_model=PlanResponse)
-def revise(project_id: int, payload: PlanReviseInput, db: Session = Depends(get_db)):
-    project = _get_project(db, project_id)
+async def revise(
+    project_id: int, payload: PlanReviseInput, db: Session = Depends(get_db)
+):
+    project = await run_in_threadpool(_load_project, db, project_id)
     merged = _merge_plan_defaults(payload, project)
-    return _ai_call(revise_plan, merged, "Revise failed")
+    return await _ai_call(revise_plan_async, merged, "Revise failed")
 
 
 @draft_router.post("/revise", response_model=PlanResponse)
-def draft_revise(payload: PlanReviseInput):
-    return _ai_call(revise_plan, payload, "AI revise failed")
+async def draft_revise(payload: PlanReviseInput):
+    return await _ai_call(revise_plan_async, payload, "AI revise failed")
+
+
+def _sse_response(events, fail_msg: str) -> StreamingResponse:
+    async def body():
+        try:
+            async for kind, item in events:
+                yield sse_event(kind, item.model_dump(mode="json"))
+        except Exception:
+            yield sse_event("error", {"detail": fail_msg})
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/generate/stream")
+async def generate_stream(
+    project_id: int, payload: PlanGenerateInput, db: Session = Depends(get_db)
+):
+    project = await run_in_threadpool(_load_project, db, project_id)
+    merged = _merge_plan_defaults(payload, project)
+    return _sse_response(stream_generate_plan(merged), "Generate failed")
+
+
+@draft_router.post("/generate/stream")
+async def draft_generate_stream(payload: PlanGenerateInput):
+    return _sse_response(stream_generate_plan(payload), "Draft generate failed")
+
+
+@router.post("/revise/stream")
+async def revise_stream(
+    project_id: int, payload: PlanReviseInput, db: Session = Depends(get_db)
+):
+    project = await run_in_threadpool(_load_project, db, project_id)
+    merged = _merge_plan_defaults(payload, project)
+    return _sse_response(stream_revise_plan(merged), "Revise failed")
+
+
+@draft_router.post("/revise/stream")
+async def draft_revise_stream(payload: PlanReviseInput):
+    return _sse_response(stream_revise_plan(payload), "AI revise failed")
+
+
+@draft_router.get("/cache")
+def plan_cache_stats():
+    return cache_stats()
+
+
+def _client_id(request: Request) -> str:
+    # Fairness is per client: an explicit X-Client-Id, else the peer address.
+    client_id = (request.headers.get("X-Client-Id") or "").strip()
+    if client_id:
+        return client_id[:64]
+    return request.client.host if request.client else "anonymous"
+
 
+@draft_router.post("/jobs", response_model=PlanJobResponse, status_code=202)
+def create_plan_job(
+    payload: PlanJobCreate,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+):
+    if payload.project_id is not None:
+        project = _get_project(db, payload.project_id)
+        payload = payload.model_copy(
+            update={"input": _merge_plan_defaults(payload.input, project)}
+        )
+
+    try:
+        job = submit_job(db, payload, _client_id(request))
+    except QueueFull:
+        raise HTTPException(
+            status_code=429, detail="Too many queued plan jobs for this client"
+        )
+
+    response.headers["Location"] = f"/plan/jobs/{job.id}"
+    return job_response(job)
 
-@router.post("/apply", response_model=ProjectDetailResponse)
-def apply(project_id: int, payload: PlanApplyInput, db: Session = Depends(get_db)):
-    project = _get_project(db, project_id)
+
+@draft_router.get("/jobs/{job_id}", response_model=PlanJobResponse)
+async def get_plan_job(job_id: str, wait: float = Query(0, ge=0, le=30)):
+    # ``wait`` long-polls: the response is held until the job finishes or
+    # that many seconds pass, whichever comes first.
+    deadline = monotonic() + wait
+    while True:
+        job = await run_in_threadpool(load_job, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Plan job not found")
+        remaining = deadline - monotonic()
+        if job.status in TERMINAL or remaining <= 0:
+            return model_response(job)
+        await wait_for_job(job_id, min(remaining, 1.0))
+
+
+@router.post("/apply", response_model=PlanApplyResponse)
+def apply(
+    project_id: int,
+    payload: PlanApplyInput,
+    mode: ApplyMode = "replace",
+    db: Session = Depends(get_db),
+):
+    _get_project(db, project_id)
 
     milestone_count = len(payload.milestones)
     for t in payload.tasks:
@@ -87,46 +233,27 @@ def apply(project_id: int, payload: PlanApplyInput, db: Session = Depends(get_db
             )
 
     try:
-        db.query(models.Task).filter(models.Task.project_id == project_id).delete()
-        db.query(models.Milestone).filter(
-            models.Milestone.project_id == project_id
-        ).delete()
-
-        milestones = []
-        for m in payload.milestones:
-            milestone = models.Milestone(
-                project_id=project_id,
-                title=m.title,
-                description=m.description,
-                order_index=m.order_index,
-            )
-            db.add(milestone)
-            milestones.append(milestone)
-
-        db.flush()
-
-        for t in payload.tasks:
-            milestone_id = (
-                milestones[t.milestone_index].id
-                if t.milestone_index is not None
-                else None
-            )
-            db.add(
-                models.Task(
-                    project_id=project_id,
-                    milestone_id=milestone_id,
-                    title=t.title,
-                    description=t.description,
-                    status=t.status,
-                    due_date=t.due_date,
-                    estimate=t.estimate,
-                    order_index=t.order_index,
-                )
-            )
+        # Bumped first so the row triggers stamp this write's version.
+        version = bump_project_version(db, project_id)
+        if mode == "diff":
+            changes = apply_diff(db, project_id, payload)
+        else:
+            changes = _apply_replace(db, project_id, payload)
 
         db.commit()
-        db.refresh(project)
-        return project
+        # Milestone and task rows changed by the apply are picked up through
+        # GET /projects/{id}/changes; the event carries the counts.
+        publish(
+            "plan.applied",
+            project_id,
+            version,
+            {"mode": mode, "changes": changes.model_dump()},
+        )
+        return model_response(
+            PlanApplyResponse.model_construct(
+                **dict(project_detail(db, project_id)), changes=changes
+            )
+        )
 
     except HTTPException:
         db.rollback()
@@ -134,3 +261,59 @@ def apply(project_id: int, payload: PlanApplyInput, db: Session = Depends(get_db
     except Exception:
         db.rollback()
         raise
+
+
+def _apply_replace(
+    db: Session, project_id: int, payload: PlanApplyInput
+) -> PlanApplyChanges:
+    tasks_deleted = (
+        db.query(models.Task).filter(models.Task.project_id == project_id).delete()
+    )
+    milestones_deleted = (
+        db.query(models.Milestone)
+        .filter(models.Milestone.project_id == project_id)
+        .delete()
+    )
+
+    milestones = []
+    for m in payload.milestones:
+        milestone = models.Milestone(
+            project_id=project_id,
+            title=m.title,
+            description=m.description,
+            order_index=m.order_index,
+        )
+        db.add(milestone)
+        milestones.append(milestone)
+
+    db.flush()
+
+    order_keys = {
+        i: key
+        for column in plan_columns(payload.tasks).values()
+        for i, key in zip(column, spaced_keys(len(column)))
+    }
+
+    for i, t in enumerate(payload.tasks):
+        milestone_id = (
+            milestones[t.milestone_index].id if t.milestone_index is not None else None
+        )
+        db.add(
+            models.Task(
+                project_id=project_id,
+                milestone_id=milestone_id,
+                title=t.title,
+                description=t.description,
+                status=t.status,
+                due_date=t.due_date,
+                estimate=t.estimate,
+                order_index=order_keys[i],
+            )
+        )
+
+    return PlanApplyChanges(
+        milestones_inserted=len(payload.milestones),
+        milestones_deleted=milestones_deleted,
+        tasks_inserted=len(payload.tasks),
+        tasks_deleted=tasks_deleted,
+    )
@@ -1,41 +1,447 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import time
+from functools import partial
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 
-from ..database import get_db
-from .. import models
-from ..schemas import ProjectCreate, ProjectResponse, ProjectDetailResponse
+from ..ai import generate_plan_async, plan_cache_key
+from ..database import SessionLocal, get_db
+from ..env import env_float, env_int
+from .. import models, queries
+from ..events import get_broker, publish
+from ..ordering import reorder
+from ..plan_apply import insert_projects_with_plans
+from ..plan_stream import sse_event
+from ..project_purge import purge_project, schedule_purge
+from ..responses import model_response
+from ..schemas import (
+    BulkProjectCreate,
+    BulkProjectItem,
+    BulkProjectResult,
+    BulkProjectSummary,
+    PlanGenerateInput,
+    PlanResponse,
+    ProjectChanges,
+    ProjectCreate,
+    ProjectResponse,
+    ProjectDetailResponse,
+    ProjectStats,
+    ProjectSummaryPage,
+    TaskPosition,
+    TaskReorderInput,
+)
+from ..versioning import (
+    bump_project_version,
+    cache_headers,
+    list_etag,
+    next_version,
+    not_modified,
+    project_etag,
+    project_version,
+)
 
 router = APIRouter(prefix="/projects", tags=["projects"])
 
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 200
+EVENTS_HEARTBEAT_SECONDS = env_float("EVENTS_HEARTBEAT_SECONDS", 15)
+BULK_PLAN_CONCURRENCY = max(1, env_int("BULK_PLAN_CONCURRENCY", 8))
+
+_project_list = TypeAdapter(list[ProjectResponse])
+
 
 @router.post("", response_model=ProjectResponse)
 def create_project(payload: ProjectCreate, db: Session = Depends(get_db)):
-    project = models.Project(**payload.model_dump())
+    project = models.Project(**payload.model_dump(), version=next_version(db))
     db.add(project)
     db.commit()
     db.refresh(project)
     return project
 
 
+def _bulk_plan_input(item: BulkProjectItem) -> PlanGenerateInput:
+    project = item.project
+    if item.plan is None:
+        return PlanGenerateInput(
+            goal_text=project.goal_text,
+            deadline=project.deadline,
+            hours_per_week=project.hours_per_week,
+        )
+    return item.plan.model_copy(
+        update={
+            "deadline": item.plan.deadline or project.deadline,
+            "hours_per_week": (
+                item.plan.hours_per_week
+                if item.plan.hours_per_week is not None
+                else project.hours_per_week
+            ),
+        }
+    )
+
+
+def _plan_error(plan: PlanResponse) -> Optional[str]:
+    # Same check as plan apply; one bad plan must not fail its whole batch.
+    for t in plan.tasks:
+        if t.milestone_index is not None and not (
+            0 <= t.milestone_index < len(plan.milestones)
+        ):
+            return f"Invalid milestone index {t.milestone_index} for task '{t.title}'."
+    return None
+
+
+def _insert_bulk(
+    items: List[BulkProjectItem], done: List[tuple]
+) -> List[BulkProjectResult]:
+    with SessionLocal() as db:
+        projects = insert_projects_with_plans(
+            db, [(items[i].project, plan) for i, plan in done]
+        )
+        db.commit()
+        progress = queries.project_progress(db, [p.id for p in projects])
+        return [
+            BulkProjectResult(
+                index=i,
+                status="created",
+                project=ProjectResponse.model_validate(project).model_copy(
+                    update={"progress": progress[project.id]}
+                ),
+                milestones=len(plan.milestones),
+                tasks=len(plan.tasks),
+                near_hit=getattr(plan, "near_hit", False),
+            )
+            for (i, plan), project in zip(done, projects)
+        ]
+
+
+@router.post("/bulk")
+async def bulk_create_projects(payload: BulkProjectCreate):
+    """Create many projects, each with a generated plan applied.
+
+    Plans are generated concurrently (at most BULK_PLAN_CONCURRENCY LLM
+    calls per request); items with the same plan input share one call.
+    Streams an SSE ``item`` event per item as it is stored, in completion
+    order, then ``done``. Plans finishing together are inserted in one
+    transaction. An item whose plan fails creates no project.
+    """
+    items = payload.items
+    semaphore = asyncio.Semaphore(BULK_PLAN_CONCURRENCY)
+    finished: asyncio.Queue = asyncio.Queue()
+    flights: Dict[str, asyncio.Task] = {}
+
+    async def generate(plan_input: PlanGenerateInput) -> PlanResponse:
+        async with semaphore:
+            return await generate_plan_async(plan_input)
+
+    def finish(i: int, task: asyncio.Task) -> None:
+        finished.put_nowait((i, task))
+
+    async def body():
+        created = failed = 0
+        try:
+            for i, item in enumerate(items):
+                plan_input = _bulk_plan_input(item)
+                key = plan_cache_key("generate", plan_input)
+                if key not in flights:
+                    flights[key] = asyncio.create_task(generate(plan_input))
+                flights[key].add_done_callback(partial(finish, i))
+
+            remaining = len(items)
+            while remaining:
+                batch = [await finished.get()]
+                while not finished.empty():
+                    batch.append(finished.get_nowait())
+                remaining -= len(batch)
+
+                done, results = [], []
+                for i, task in batch:
+                    if task.cancelled() or task.exception() is not None:
+                        results.append(
+                            BulkProjectResult(
+                                index=i, status="failed", detail="Generate failed"
+                            )
+                        )
+                    elif detail := _plan_error(task.result()):
+                        results.append(
+                            BulkProjectResult(index=i, status="failed", detail=detail)
+                        )
+                    else:
+                        done.append((i, task.result()))
+                if done:
+                    try:
+                        results += await run_in_threadpool(_insert_bulk, items, done)
+                    except Exception:
+                        results += [
+                            BulkProjectResult(
+                                index=i, status="failed", detail="Insert failed"
+                            )
+                            for i, _ in done
+                        ]
+
+                for result in sorted(results, key=lambda r: r.index):
+                    if result.status == "created":
+                        created += 1
+                    else:
+                        failed += 1
+                    yield sse_event("item", result.model_dump(mode="json"))
+
+            summary = BulkProjectSummary(
+                created=created, failed=failed, plans=len(flights)
+            )
+            yield sse_event("done", summary.model_dump(mode="json"))
+        finally:
+            # Client gone: stop generating plans nobody will store.
+            for task in flights.values():
+                task.cancel()
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("", response_model=list[ProjectResponse])
-def list_projects(db: Session = Depends(get_db)):
-    return db.query(models.Project).order_by(models.Project.created_at.desc()).all()
+def list_projects(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    etag = list_etag(db, "full", limit, cursor)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
+    try:
+        projects, next_cursor = queries.list_projects(db, limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    headers = cache_headers(etag)
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return model_response(projects, _project_list, headers)
+
+
+@router.get("/summaries", response_model=ProjectSummaryPage)
+def list_project_summaries(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    etag = list_etag(db, "summary", limit, cursor)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
+    try:
+        items, next_cursor = queries.list_project_summaries(db, limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return model_response(
+        ProjectSummaryPage(items=items, next_cursor=next_cursor),
+        headers=cache_headers(etag),
+    )
 
 
 @router.get("/{project_id}", response_model=ProjectDetailResponse)
-def get_project(project_id: int, db: Session = Depends(get_db)):
-    project = db.query(models.Project).filter(models.Project.id == project_id).first()
+def get_project(
+    project_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+):
+    # The version is read before the detail, so a concurrent write can only
+    # make the ETag older than the body (one extra refetch), never newer.
+    version = project_version(db, project_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    etag = project_etag(project_id, version)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
+    project = queries.project_detail(db, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
-    return project
+    return model_response(project, headers=cache_headers(etag))
 
 
-@router.delete("/{project_id}")
-def delete_project(project_id: int, db: Session = Depends(get_db)):
-    project = db.query(models.Project).filter(models.Project.id == project_id).first()
+@router.get("/{project_id}/stats", response_model=ProjectStats)
+def get_project_stats(
+    project_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+):
+    """Task counts by status, estimate weight and percent done for the
+    project and each milestone, read from precomputed counters."""
+    version = project_version(db, project_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    etag = project_etag(project_id, version)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
+    stats = queries.project_stats(db, project_id)
+    if not stats:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return model_response(stats, headers=cache_headers(etag))
+
+
+@router.get("/{project_id}/changes", response_model=ProjectChanges)
+def get_project_changes(
+    project_id: int,
+    since: int = Query(..., ge=0),
+    db: Session = Depends(get_db),
+):
+    # Same read order as get_project: a write racing this request is either
+    # fully included or reported again on the next poll.
+    version = project_version(db, project_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return model_response(queries.project_changes(db, project_id, version, since))
+
+
+@router.patch("/{project_id}/tasks/order", response_model=list[TaskPosition])
+def reorder_tasks(
+    project_id: int, payload: TaskReorderInput, db: Session = Depends(get_db)
+):
+    project = (
+        db.query(models.Project.id)
+        .filter(models.Project.id == project_id, models.Project.deleted_at.is_(None))
+        .first()
+    )
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    db.delete(project)
+    desired = {item.id: item for item in payload.tasks}
+    if len(desired) != len(payload.tasks):
+        raise HTTPException(status_code=400, detail="Duplicate task ids in ordering")
+    if not desired:
+        return []
+
+    current = {
+        task_id: (status, order_index)
+        for task_id, status, order_index in db.query(
+            models.Task.id, models.Task.status, models.Task.order_index
+        ).filter(
+            models.Task.project_id == project_id,
+            models.Task.id.in_(desired.keys()),
+        )
+    }
+    foreign = sorted(set(desired) - set(current))
+    if foreign:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Tasks {foreign} do not belong to project {project_id}.",
+        )
+
+    try:
+        version = bump_project_version(db, project_id)
+        final = reorder(
+            db,
+            project_id,
+            current,
+            ((t.id, t.status, t.order_index) for t in payload.tasks),
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    positions = [
+        TaskPosition(id=task_id, status=status, order_index=key)
+        for task_id, (status, key) in final.items()
+    ]
+    publish(
+        "tasks.reordered",
+        project_id,
+        version,
+        {"tasks": [p.model_dump() for p in positions]},
+    )
+    return positions
+
+
+def _read_project_version(project_id: int) -> Optional[int]:
+    # A short-lived session: the event stream must not hold a pooled
+    # connection for its whole lifetime.
+    with SessionLocal() as db:
+        return project_version(db, project_id)
+
+
+@router.get("/{project_id}/events")
+async def project_events(project_id: int):
+    """Server-sent change feed for one project.
+
+    Starts with a ``ready`` event carrying the current version, then relays
+    published events (SSE id = project version) with comment heartbeats in
+    between. On ``resync`` the client should fetch /changes.
+    """
+    # Subscribe before reading the version so nothing written in between
+    # is missed.
+    sub = get_broker().subscribe(project_id)
+    try:
+        version = await run_in_threadpool(_read_project_version, project_id)
+    except Exception:
+        sub.close()
+        raise
+    if version is None:
+        sub.close()
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    async def body():
+        try:
+            yield sse_event("ready", {"version": version}, version)
+            while True:
+                event = await sub.get(EVENTS_HEARTBEAT_SECONDS)
+                if event is None:
+                    yield ": ping\n\n"
+                    continue
+                yield sse_event(event["type"], event, event["version"])
+                if event["type"] == "project.deleted":
+                    break
+        finally:
+            sub.close()
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.delete("/{project_id}")
+def delete_project(
+    project_id: int,
+    response: Response,
+    soft: bool = Query(False),
+    db: Session = Depends(get_db),
+):
+    """Hide the project at once, then purge its rows in short transactions.
+
+    With ``soft=true`` the purge is left to the background purger and the
+    response is 202.
+    """
+    marked = db.execute(
+        update(models.Project)
+        .where(models.Project.id == project_id, models.Project.deleted_at.is_(None))
+        .values(deleted_at=time.time()),
+        execution_options={"synchronize_session": False},
+    ).rowcount
+    if not marked:
+        raise HTTPException(status_code=404, detail="Project not found")
+    version = bump_project_version(db, project_id)
     db.commit()
+
+    publish("project.deleted", project_id, version)
+    if soft and schedule_purge():
+        response.status_code = 202
+    else:
+        purge_project(project_id)
     return {"ok": True}
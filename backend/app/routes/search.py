@@ -0,0 +1,38 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from .. import search as fts
+from ..database import get_db
+from ..responses import model_response
+from ..schemas import SearchKind, SearchPage, TaskStatus
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+@router.get("", response_model=SearchPage)
+def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    kind: Optional[SearchKind] = None,
+    status: Optional[TaskStatus] = None,
+    project_id: Optional[int] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """Tasks and projects matching every word of ``q``, best first.
+
+    ``status`` implies ``kind=task``. Page with ``next_cursor``.
+    """
+    match = fts.match_expression(q, kind, status, project_id)
+    if match is None:
+        raise HTTPException(status_code=400, detail="Query has no words")
+    try:
+        items, next_cursor = fts.search(db, match, limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return model_response(SearchPage(items=items, next_cursor=next_cursor))
@@ -3,7 +3,10 @@ from sqlalchemy.orm import Session
 
 from .. import models
 from ..database import get_db
+from ..events import publish
+from ..ordering import insert_key
 from ..schemas import TaskResponse, TaskUpdate, TaskCreate
+from ..versioning import bump_project_version
 
 router = APIRouter(prefix="/tasks", tags=["tasks"])
 
@@ -11,7 +14,12 @@ router = APIRouter(prefix="/tasks", tags=["tasks"])
 @router.post("", response_model=TaskResponse)
 def create_task(payload: TaskCreate, db: Session = Depends(get_db)):
     project = (
-        db.query(models.Project).filter(models.Project.id == payload.project_id).first()
+        db.query(models.Project)
+        .filter(
+            models.Project.id == payload.project_id,
+            models.Project.deleted_at.is_(None),
+        )
+        .first()
     )
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
@@ -20,15 +28,10 @@ def create_task(payload: TaskCreate, db: Session = Depends(get_db)):
     if not title:
         raise HTTPException(status_code=400, detail="Title is required")
 
+    # Bumped before insert_key, which may rebalance the column.
+    version = bump_project_version(db, payload.project_id)
     insert_at = 0 if payload.order_index is None else payload.order_index
-    if insert_at < 0:
-        insert_at = 0
-
-    db.query(models.Task).filter(
-        models.Task.project_id == payload.project_id,
-        models.Task.status == payload.status,
-        models.Task.order_index >= insert_at,
-    ).update({models.Task.order_index: models.Task.order_index + 1})
+    order_key = insert_key(db, payload.project_id, payload.status, insert_at)
 
     task = models.Task(
         project_id=payload.project_id,
@@ -38,38 +41,64 @@ def create_task(payload: TaskCreate, db: Session = Depends(get_db)):
         status=payload.status,
         due_date=payload.due_date,
         estimate=payload.estimate,
-        order_index=insert_at,
+        order_index=order_key,
     )
 
     db.add(task)
     db.commit()
     db.refresh(task)
+
+    response = TaskResponse.model_validate(task)
+    publish("task.created", task.project_id, version, response.model_dump())
+    return response
+
+
+def _get_task(db: Session, task_id: int) -> models.Task:
+    # Tasks of a deleted project are hidden while it waits for the purge.
+    task = (
+        db.query(models.Task)
+        .join(models.Project, models.Project.id == models.Task.project_id)
+        .filter(models.Task.id == task_id, models.Project.deleted_at.is_(None))
+        .first()
+    )
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
     return task
 
 
 @router.patch("/{task_id}", response_model=TaskResponse)
 def update_task(task_id: int, payload: TaskUpdate, db: Session = Depends(get_db)):
-    task = db.query(models.Task).filter(models.Task.id == task_id).first()
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
+    task = _get_task(db, task_id)
 
     data = payload.model_dump(exclude_unset=True)
     if not data:
         raise HTTPException(status_code=400, detail="Nothing updated")
+    version = bump_project_version(db, task.project_id)
+    # order_index is a position in the task's column, as in reorder.
+    position = data.pop("order_index", None)
     for field, value in data.items():
         setattr(task, field, value)
+    if position is not None:
+        task.order_index = insert_key(
+            db, task.project_id, task.status, position, exclude=task.id
+        )
 
     db.commit()
     db.refresh(task)
-    return task
+
+    response = TaskResponse.model_validate(task)
+    publish("task.updated", task.project_id, version, response.model_dump())
+    return response
 
 
 @router.delete("/{task_id}")
 def delete_task(task_id: int, db: Session = Depends(get_db)):
-    task = db.query(models.Task).filter(models.Task.id == task_id).first()
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
+    task = _get_task(db, task_id)
 
+    project_id = task.project_id
+    version = bump_project_version(db, project_id)
     db.delete(task)
     db.commit()
+
+    publish("task.deleted", project_id, version, {"id": task_id})
     return {"ok": True}
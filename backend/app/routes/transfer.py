@@ -0,0 +1,135 @@
+from typing import AsyncIterator, List, Optional, Tuple, Union
+
+from fastapi import APIRouter, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter, ValidationError
+
+from .. import transfer
+from ..responses import DuplexStreamingResponse, ndjson_line
+from ..schemas import ExportLine, ImportSummary
+
+router = APIRouter(tags=["transfer"])
+
+NDJSON = "application/x-ndjson"
+
+_export_line = TypeAdapter(ExportLine)
+
+
+@router.get("/export")
+async def export_projects(project_id: Optional[List[int]] = Query(None)):
+    """Every project (or each ``project_id``) as NDJSON: a ``project``
+    line, its ``milestone`` lines, then its ``task`` lines."""
+    chunks = transfer.export_chunks(project_id)
+
+    async def body():
+        try:
+            while True:
+                chunk = await run_in_threadpool(next, chunks, None)
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            chunks.close()
+
+    return StreamingResponse(
+        body(),
+        media_type=NDJSON,
+        headers={"Content-Disposition": 'attachment; filename="projects.ndjson"'},
+    )
+
+
+def _parse(raw: bytes) -> Union[ExportLine, transfer.LineError]:
+    try:
+        return _export_line.validate_json(raw)
+    except ValidationError as exc:
+        error = exc.errors()[0]
+        # The union's errors are located under the line's type tag.
+        kind = error["loc"][0] if error["loc"] else None
+        where = ".".join(str(p) for p in error["loc"])
+        detail = f"{where}: {error['msg']}" if where else error["msg"]
+        return transfer.LineError(kind, detail)
+
+
+async def _lines(
+    request: Request,
+) -> AsyncIterator[Tuple[int, Union[ExportLine, transfer.LineError]]]:
+    """(line number, parsed line or error) for each non-blank body line,
+    holding at most one line in memory."""
+    limit = transfer.IMPORT_MAX_LINE_BYTES
+    buf = b""
+    number = 0
+    oversized = False  # dropping the rest of a line that is too long
+    async for data in request.stream():
+        *complete, rest = (buf + data).split(b"\n")
+        for raw in complete:
+            number += 1
+            if oversized:
+                oversized = False
+            elif len(raw) > limit:
+                yield number, transfer.LineError(
+                    None, f"Line longer than {limit} bytes"
+                )
+            elif raw.strip():
+                yield number, _parse(raw)
+        buf = rest
+        if len(buf) > limit:
+            if not oversized:
+                yield number + 1, transfer.LineError(
+                    None, f"Line longer than {limit} bytes"
+                )
+            oversized, buf = True, b""
+    if len(buf) > limit:
+        yield number + 1, transfer.LineError(None, f"Line longer than {limit} bytes")
+    elif buf.strip() and not oversized:
+        yield number + 1, _parse(buf)
+
+
+@router.post("/import")
+async def import_projects(request: Request):
+    """Create projects from an /export NDJSON body, streamed.
+
+    Lines are written IMPORT_BATCH_ROWS per transaction, with task order
+    kept as exported. The response is NDJSON too: a ``project`` line per
+    project once its rows are committed (``created``, or ``failed`` with
+    the offending line), then ``done`` with totals.
+    """
+    importer = transfer.ProjectImporter()
+
+    async def body():
+        created = failed = 0
+
+        def report(results) -> bytes:
+            nonlocal created, failed
+            for result in results:
+                if result.status == "created":
+                    created += 1
+                else:
+                    failed += 1
+            return b"".join(ndjson_line(r.model_dump()) for r in results)
+
+        finished = False
+        detail = None
+        try:
+            batch = []
+            async for line in _lines(request):
+                batch.append(line)
+                if len(batch) >= transfer.IMPORT_BATCH_ROWS:
+                    results = await run_in_threadpool(importer.write, batch)
+                    batch = []
+                    if results:
+                        yield report(results)
+            results = await run_in_threadpool(importer.write, batch) if batch else []
+            results += await run_in_threadpool(importer.finish)
+            finished = True
+            if results:
+                yield report(results)
+        except Exception:
+            detail = "Import failed"
+        finally:
+            if not finished:
+                importer.abort()
+        summary = ImportSummary(created=created, failed=failed, detail=detail)
+        yield ndjson_line(summary.model_dump())
+
+    return DuplexStreamingResponse(body(), media_type=NDJSON)
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Annotated, List, Literal, Optional
+from typing import Annotated, List, Literal, Optional, Union
 
 from pydantic import BaseModel, Field, ConfigDict
 
@@ -9,6 +9,7 @@ TaskStatus = Literal["todo", "in_progress", "done"]
 TaskSize = Literal["S", "M", "L"]
 ExperienceLevel = Literal["beginner", "intermediate", "advanced"]
 DetailLevel = Literal["simple", "detailed"]
+ApplyMode = Literal["replace", "diff"]
 
 NonEmptyStr = Annotated[str, Field(min_length=1)]
 NonNegInt = Annotated[int, Field(ge=0)]
@@ -22,16 +23,44 @@ class ProjectCreate(BaseModel):
     hours_per_week: Optional[NonNegInt] = None
 
 
+class Progress(BaseModel):
+    todo: int = 0
+    in_progress: int = 0
+    done: int = 0
+    task_count: int = 0
+    # Estimate weights, S=1 M=2 L=3; tasks without an estimate weigh 0.
+    estimate_weight: int = 0
+    done_weight: int = 0
+    percent_done: float = 0.0  # share of tasks done, 0-100
+
+
 class ProjectResponse(BaseModel):
     id: int
     title: str
     goal_text: str
     deadline: Optional[str] = None
     hours_per_week: Optional[int] = None
+    version: int = 0
+    progress: Progress = Field(default_factory=Progress)
 
     model_config = ConfigDict(from_attributes=True)
 
 
+class ProjectSummary(BaseModel):
+    id: int
+    title: str
+    goal_excerpt: str
+    deadline: Optional[str] = None
+    hours_per_week: Optional[int] = None
+    task_count: int = 0
+    done_count: int = 0
+
+
+class ProjectSummaryPage(BaseModel):
+    items: List[ProjectSummary] = Field(default_factory=list)
+    next_cursor: Optional[str] = None
+
+
 class MilestoneResponse(BaseModel):
     id: int
     title: str
@@ -59,6 +88,31 @@ class ProjectDetailResponse(ProjectResponse):
     tasks: List[TaskResponse] = Field(default_factory=list)
 
 
+class MilestoneProgress(BaseModel):
+    id: int
+    title: str
+    progress: Progress
+
+
+class ProjectStats(BaseModel):
+    id: int
+    version: int
+    progress: Progress
+    milestones: List[MilestoneProgress] = Field(default_factory=list)
+
+
+class ProjectChanges(BaseModel):
+    """Rows changed after ``since``; apply deletions before upserts."""
+
+    since: int
+    version: int
+    milestones: List[MilestoneResponse] = Field(default_factory=list)
+    tasks: List[TaskResponse] = Field(default_factory=list)
+    deleted_milestone_ids: List[int] = Field(default_factory=list)
+    deleted_task_ids: List[int] = Field(default_factory=list)
+    progress: Optional[Progress] = None  # current; None when nothing changed
+
+
 class TaskUpdate(BaseModel):
     title: Optional[NonEmptyStr] = None
     description: Optional[str] = None
@@ -80,6 +134,22 @@ class TaskCreate(BaseModel):
     milestone_id: Optional[int] = None
 
 
+class TaskOrderItem(BaseModel):
+    id: int
+    status: TaskStatus
+    order_index: NonNegInt
+
+
+class TaskPosition(BaseModel):
+    id: int
+    status: TaskStatus
+    order_index: int
+
+
+class TaskReorderInput(BaseModel):
+    tasks: List[TaskOrderItem] = Field(default_factory=list)
+
+
 # --- AI generations ---
 class ProposeMilestone(BaseModel):
     title: NonEmptyStr
@@ -103,6 +173,13 @@ class PlanResponse(BaseModel):
     tasks: List[ProposeTask] = Field(default_factory=list)
 
 
+class PlanDraftResponse(PlanResponse):
+    # Set when a cached plan for a similar, not identical, request was
+    # served; similarity is the Jaccard index of the canonicalised inputs.
+    near_hit: bool = False
+    similarity: Optional[float] = None
+
+
 class PlanGenerateInput(BaseModel):
     goal_text: NonEmptyStr
     deadline: Optional[str] = None
@@ -117,6 +194,19 @@ class PlanApplyInput(BaseModel):
     tasks: List[ProposeTask] = Field(default_factory=list)
 
 
+class PlanApplyChanges(BaseModel):
+    milestones_inserted: int = 0
+    milestones_updated: int = 0
+    milestones_deleted: int = 0
+    tasks_inserted: int = 0
+    tasks_updated: int = 0
+    tasks_deleted: int = 0
+
+
+class PlanApplyResponse(ProjectDetailResponse):
+    changes: Optional[PlanApplyChanges] = None
+
+
 class PlanReviseInput(BaseModel):
     goal_text: NonEmptyStr
     deadline: Optional[str] = None
@@ -126,3 +216,167 @@ class PlanReviseInput(BaseModel):
     constraints: Optional[str] = None
     current_plan: PlanResponse
     adjustment: NonEmptyStr
+
+
+# Compact revisions: the model returns ops against CURRENT_PLAN indices
+# instead of the whole plan (see plan_patch.py).
+PatchOpKind = Literal["add", "update", "remove", "milestone"]
+
+
+class PlanPatchOp(BaseModel):
+    op: PatchOpKind
+    index: Optional[int] = None  # task (or milestone) index; unused by add
+    title: Optional[str] = None
+    description: Optional[str] = None
+    milestone_index: Optional[int] = None
+    status: Optional[TaskStatus] = None
+    estimate: Optional[TaskSize] = None
+    order_index: Optional[int] = None  # a position; apply_patch renumbers
+
+
+class PlanPatch(BaseModel):
+    type: Literal["patch"]
+    ops: List[PlanPatchOp] = Field(default_factory=list)
+
+
+# --- Plan jobs ---
+PlanJobKind = Literal["generate", "revise"]
+PlanJobStatus = Literal["queued", "running", "succeeded", "failed"]
+JobPriority = Annotated[int, Field(ge=0, le=9)]
+
+
+class PlanJobBase(BaseModel):
+    # Project defaults (goal, deadline, hours) fill gaps in ``input``.
+    project_id: Optional[int] = None
+    priority: JobPriority = 5  # higher runs first among the client's jobs
+
+
+class GeneratePlanJob(PlanJobBase):
+    kind: Literal["generate"]
+    input: PlanGenerateInput
+
+
+class RevisePlanJob(PlanJobBase):
+    kind: Literal["revise"]
+    input: PlanReviseInput
+
+
+PlanJobCreate = Annotated[
+    Union[GeneratePlanJob, RevisePlanJob], Field(discriminator="kind")
+]
+
+
+class PlanJobResponse(BaseModel):
+    id: str
+    kind: PlanJobKind
+    status: PlanJobStatus
+    priority: int
+    project_id: Optional[int] = None
+    attempts: int
+    max_attempts: int
+    error: Optional[str] = None
+    result: Optional[PlanDraftResponse] = None
+    created_at: float
+    run_after: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+
+# --- Bulk project creation ---
+BulkItemStatus = Literal["created", "failed"]
+
+
+class BulkProjectItem(BaseModel):
+    project: ProjectCreate
+    # Defaults to the project's goal; deadline and hours fall back to it too.
+    plan: Optional[PlanGenerateInput] = None
+
+
+class BulkProjectCreate(BaseModel):
+    items: List[BulkProjectItem] = Field(min_length=1, max_length=100)
+
+
+class BulkProjectResult(BaseModel):
+    index: int  # position in BulkProjectCreate.items
+    status: BulkItemStatus
+    project: Optional[ProjectResponse] = None
+    milestones: int = 0
+    tasks: int = 0
+    near_hit: bool = False
+    detail: Optional[str] = None
+
+
+class BulkProjectSummary(BaseModel):
+    created: int
+    failed: int
+    plans: int  # distinct plan inputs, generated or read from the cache
+
+
+# --- Search ---
+SearchKind = Literal["task", "project"]
+
+
+class SearchHit(BaseModel):
+    kind: SearchKind
+    id: int
+    project_id: int
+    project_title: str
+    # HTML-escaped, with the matched words wrapped in <mark>.
+    title: str
+    snippet: str
+    status: Optional[TaskStatus] = None  # tasks only
+    score: float  # bm25; lower is better
+
+
+class SearchPage(BaseModel):
+    items: List[SearchHit] = Field(default_factory=list)
+    next_cursor: Optional[str] = None
+
+
+# --- Export / import (NDJSON lines; ids are the exporting database's) ---
+class ExportProject(ProjectCreate):
+    type: Literal["project"] = "project"
+    id: int
+
+
+class ExportMilestone(BaseModel):
+    type: Literal["milestone"] = "milestone"
+    id: int
+    title: NonEmptyStr
+    description: Optional[str] = None
+    order_index: int = 0
+
+
+class ExportTask(BaseModel):
+    type: Literal["task"] = "task"
+    id: int
+    milestone_id: Optional[int] = None
+    title: NonEmptyStr
+    description: Optional[str] = None
+    status: TaskStatus = "todo"
+    due_date: Optional[str] = None
+    estimate: Optional[TaskSize] = None
+    order_index: int = 0
+
+
+ExportLine = Annotated[
+    Union[ExportProject, ExportMilestone, ExportTask], Field(discriminator="type")
+]
+
+
+class ImportResult(BaseModel):
+    type: Literal["project"] = "project"
+    index: Optional[int] = None  # position among the file's projects
+    source_id: Optional[int] = None
+    status: Literal["created", "failed"]
+    id: Optional[int] = None  # the new project
+    milestones: int = 0
+    tasks: int = 0
+    detail: Optional[str] = None
+
+
+class ImportSummary(BaseModel):
+    type: Literal["done"] = "done"
+    created: int
+    failed: int
+    detail: Optional[str] = None  # set when the import stopped early
@@ -0,0 +1,313 @@
+from __future__ import annotations
+
+import base64
+import html
+import json
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from .env import env_int
+from .schemas import SearchHit, SearchKind, TaskStatus
+
+# Full-text search over tasks (title, description) and projects (title,
+# goal_text) in one SQLite FTS5 table, kept in sync by triggers so every
+# write path (ORM, bulk statements, purges) is covered.
+#
+# rowid is id * 2 for tasks and id * 2 + 1 for projects. The ``tags``
+# column holds filter tokens (kind, project, status), so filters are part
+# of the MATCH and FTS5 intersects their posting lists instead of checking
+# every matching row; it has weight 0 in the ranking. Ranking is bm25 with
+# titles weighted over bodies.
+#
+# bm25 has to be computed for every match before the best can be picked,
+# which takes seconds for a word found in most of a million tasks (and
+# such a word says next to nothing about relevance anyway). So only the
+# newest SEARCH_RANK_WINDOW matches (highest rowids) are ranked; queries
+# with fewer matches are ranked in full.
+
+_X = "\x02"  # highlight markers; replaced after HTML-escaping
+_Y = "\x03"
+_BM25 = "bm25(search_index, 10.0, 1.0, 0.0)"
+
+
+RANK_WINDOW = max(1, env_int("SEARCH_RANK_WINDOW", 20000))
+
+_TASK_TAGS = "'ktask p' || {r}.project_id || ' s' || replace({r}.status, '_', '')"
+_PROJECT_TAGS = "'kproject p' || {r}.id"
+
+DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        title, body, tags,
+        kind UNINDEXED, ref_id UNINDEXED, project_id UNINDEXED, status UNINDEXED,
+        tokenize = 'porter unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_tasks_search_insert
+    AFTER INSERT ON tasks
+    BEGIN
+        INSERT INTO search_index
+            (rowid, title, body, tags, kind, ref_id, project_id, status)
+        VALUES (
+            NEW.id * 2, NEW.title, NEW.description, {_TASK_TAGS.format(r="NEW")},
+            'task', NEW.id, NEW.project_id, NEW.status
+        );
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_tasks_search_update
+    AFTER UPDATE OF title, description, status, project_id ON tasks
+    BEGIN
+        UPDATE search_index
+        SET title = NEW.title, body = NEW.description,
+            tags = {_TASK_TAGS.format(r="NEW")},
+            project_id = NEW.project_id, status = NEW.status
+        WHERE rowid = NEW.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_tasks_search_delete
+    AFTER DELETE ON tasks
+    BEGIN
+        DELETE FROM search_index WHERE rowid = OLD.id * 2;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_projects_search_insert
+    AFTER INSERT ON projects
+    BEGIN
+        INSERT INTO search_index
+            (rowid, title, body, tags, kind, ref_id, project_id, status)
+        VALUES (
+            NEW.id * 2 + 1, NEW.title, NEW.goal_text,
+            {_PROJECT_TAGS.format(r="NEW")}, 'project', NEW.id, NEW.id, NULL
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_projects_search_update
+    AFTER UPDATE OF title, goal_text ON projects
+    BEGIN
+        UPDATE search_index SET title = NEW.title, body = NEW.goal_text
+        WHERE rowid = NEW.id * 2 + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_projects_search_delete
+    AFTER DELETE ON projects
+    BEGIN
+        DELETE FROM search_index WHERE rowid = OLD.id * 2 + 1;
+    END
+    """,
+]
+
+
+def install_search(conn: Connection) -> None:
+    for ddl in DDL:
+        conn.execute(text(ddl))
+
+
+def rebuild_search(conn: Connection) -> None:
+    """Index every existing task and project from scratch."""
+    conn.execute(text("DELETE FROM search_index"))
+    conn.execute(text(f"""
+            INSERT INTO search_index
+                (rowid, title, body, tags, kind, ref_id, project_id, status)
+            SELECT t.id * 2, t.title, t.description, {_TASK_TAGS.format(r="t")},
+                   'task', t.id, t.project_id, t.status
+            FROM tasks AS t
+            """))
+    conn.execute(text(f"""
+            INSERT INTO search_index
+                (rowid, title, body, tags, kind, ref_id, project_id, status)
+            SELECT p.id * 2 + 1, p.title, p.goal_text,
+                   {_PROJECT_TAGS.format(r="p")}, 'project', p.id, p.id, NULL
+            FROM projects AS p
+            """))
+    conn.execute(text("INSERT INTO search_index(search_index) VALUES ('optimize')"))
+
+
+# --- Queries ---
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def match_expression(
+    q: str,
+    kind: Optional[SearchKind] = None,
+    status: Optional[TaskStatus] = None,
+    project_id: Optional[int] = None,
+) -> Optional[str]:
+    """FTS5 query for free text ``q``: every word must match a title or
+    body, the last one as a prefix unless ``q`` ends in a space. None when
+    ``q`` has no words."""
+    words = _WORD.findall(q)
+    if not words:
+        return None
+    terms = [f'"{w}"' for w in words]
+    if not q[-1].isspace():
+        terms[-1] += "*"
+    expr = "{title body} : (" + " ".join(terms) + ")"
+
+    # A status implies kind=task. Each tag adds a posting list scan to
+    # bm25, so the redundant ktask is left out.
+    tags = []
+    if status is not None:
+        tags.append("s" + status.replace("_", ""))
+    elif kind is not None:
+        tags.append("k" + kind)
+    if project_id is not None:
+        tags.append(f"p{project_id}")
+    if tags:
+        expr += " AND tags : (" + " ".join(tags) + ")"
+    return expr
+
+
+# Windows are rowid ranges [floor, ceiling), ceiling None for the newest.
+# A cursor carries the last hit's (score, rowid) and its window, so the
+# next page ranks the same window, then moves on to older ones.
+def encode_cursor(score: float, rowid: int, floor: int, ceiling: Optional[int]) -> str:
+    raw = json.dumps([score, rowid, floor, ceiling], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int, int, Optional[int]]:
+    """Raises ValueError for malformed cursors."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        score, rowid, floor, ceiling = json.loads(base64.urlsafe_b64decode(padded))
+        ceiling = None if ceiling is None else int(ceiling)
+        return float(score), int(rowid), int(floor), ceiling
+    except Exception as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def _window_floor(conn: Connection, match: str, ceiling: Optional[int]) -> int:
+    """Lowest rowid of the RANK_WINDOW matches below ``ceiling``, 0 if fewer
+    match."""
+    below = "" if ceiling is None else " AND rowid < :ceiling"
+    floor = conn.execute(
+        text(
+            "SELECT rowid FROM search_index WHERE search_index MATCH :match"
+            f"{below} ORDER BY rowid DESC LIMIT 1 OFFSET :offset"
+        ),
+        {"match": match, "ceiling": ceiling, "offset": RANK_WINDOW - 1},
+    ).scalar()
+    return floor or 0
+
+
+def _ranked(
+    conn: Connection,
+    match: str,
+    floor: int,
+    ceiling: Optional[int],
+    after: Optional[Tuple[float, int]],
+    limit: int,
+) -> list:
+    # The rowid bounds are handed to FTS5, so rows outside the window are
+    # never ranked. Soft-deleted projects are few: excluding them by id is
+    # cheaper than joining every match to projects.
+    where = (
+        "search_index MATCH :match AND rowid >= :floor AND project_id NOT IN "
+        "(SELECT id FROM projects WHERE deleted_at IS NOT NULL)"
+    )
+    params = {"match": match, "floor": floor, "limit": limit}
+    if ceiling is not None:
+        where += " AND rowid < :ceiling"
+        params["ceiling"] = ceiling
+    if after is not None:
+        where += f" AND ({_BM25} > :score OR ({_BM25} = :score AND rowid > :rowid))"
+        params.update(score=after[0], rowid=after[1])
+    return conn.execute(
+        text(
+            f"SELECT rowid, {_BM25} AS score FROM search_index "
+            f"WHERE {where} ORDER BY score, rowid LIMIT :limit"
+        ),
+        params,
+    ).all()
+
+
+def _marked(value: Optional[str]) -> str:
+    return html.escape(value or "").replace(_X, "<mark>").replace(_Y, "</mark>")
+
+
+def search(
+    db: Session, match: str, limit: int, cursor: Optional[str] = None
+) -> Tuple[List[SearchHit], Optional[str]]:
+    """Best matches first, ``limit`` per page.
+
+    Ranks with bm25 alone first, then builds snippets for the page only:
+    snippet() is far more expensive than bm25() and would otherwise run
+    for every match.
+    """
+    conn = db.connection()
+    if cursor:
+        score, rowid, floor, ceiling = decode_cursor(cursor)
+        after = (score, rowid)
+    else:
+        ceiling, after = None, None
+        floor = _window_floor(conn, match, ceiling)
+
+    page = []  # (row, floor, ceiling)
+    while True:
+        rows = _ranked(conn, match, floor, ceiling, after, limit + 1 - len(page))
+        page += [(row, floor, ceiling) for row in rows]
+        if len(page) > limit or floor == 0:
+            break
+        ceiling, after = floor, None
+        floor = _window_floor(conn, match, ceiling)
+
+    next_cursor = None
+    if len(page) > limit:
+        del page[limit:]
+        row, floor, ceiling = page[-1]
+        next_cursor = encode_cursor(row.score, row.rowid, floor, ceiling)
+    page = [row for row, _, _ in page]
+    if not page:
+        return [], None
+
+    rowids = [row.rowid for row in page]
+    placeholders = ", ".join(f":r{i}" for i in range(len(rowids)))
+    details = {
+        row.rowid: row
+        for row in conn.execute(
+            text(
+                "SELECT s.rowid AS rowid, s.kind, s.ref_id, s.project_id, "
+                "s.status, p.title AS project_title, "
+                "highlight(search_index, 0, :x, :y) AS title, "
+                "snippet(search_index, 1, :x, :y, '…', 16) AS snippet "
+                "FROM search_index AS s JOIN projects AS p ON p.id = s.project_id "
+                f"WHERE s.search_index MATCH :match AND s.rowid IN ({placeholders})"
+            ),
+            {
+                "match": match,
+                "x": _X,
+                "y": _Y,
+                **{f"r{i}": rowid for i, rowid in enumerate(rowids)},
+            },
+        )
+    }
+
+    hits = []
+    for row in page:
+        d = details.get(row.rowid)
+        if d is None:  # deleted between the two queries
+            continue
+        hits.append(
+            SearchHit(
+                kind=d.kind,
+                id=d.ref_id,
+                project_id=d.project_id,
+                project_title=d.project_title,
+                title=_marked(d.title),
+                snippet=_marked(d.snippet),
+                status=d.status,
+                score=row.score,
+            )
+        )
+    return hits, next_cursor
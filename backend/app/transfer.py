@@ -0,0 +1,318 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from sqlalchemy import insert, select, update
+
+from . import models
+from .database import SessionLocal
+from .env import env_int
+from .project_purge import purge_project, schedule_purge
+from .responses import ndjson_line
+from .schemas import ExportLine, ExportMilestone, ExportProject, ImportResult
+from .versioning import next_version
+
+# Workspace export and import as newline-delimited JSON: a project line,
+# then its milestones, then its tasks, each line one of the Export* models
+# tagged by ``type``. Ids are the source database's; milestone_id refers to
+# a milestone line of the same project. Tasks keep their order_index, so an
+# import restores board order as is, without insert_key's per-insert shift.
+#
+# Both directions stream. Export reads one project at a time in chunks of
+# EXPORT_CHUNK_ROWS; import writes IMPORT_BATCH_ROWS lines per transaction,
+# so a large project is split over several short transactions and many
+# small ones share one.
+
+
+EXPORT_CHUNK_ROWS = max(1, env_int("EXPORT_CHUNK_ROWS", 1000))
+IMPORT_BATCH_ROWS = max(1, env_int("IMPORT_BATCH_ROWS", 2000))
+IMPORT_MAX_LINE_BYTES = max(1, env_int("IMPORT_MAX_LINE_BYTES", 1 << 20))
+
+
+# --- Export ---
+_PROJECT_COLUMNS = (
+    models.Project.id,
+    models.Project.title,
+    models.Project.goal_text,
+    models.Project.deadline,
+    models.Project.hours_per_week,
+)
+_MILESTONE_COLUMNS = (
+    models.Milestone.id,
+    models.Milestone.title,
+    models.Milestone.description,
+    models.Milestone.order_index,
+)
+_TASK_COLUMNS = (
+    models.Task.id,
+    models.Task.milestone_id,
+    models.Task.title,
+    models.Task.description,
+    models.Task.status,
+    models.Task.due_date,
+    models.Task.estimate,
+    models.Task.order_index,
+)
+
+
+def _export_project(project_id: int) -> Iterator[bytes]:
+    with SessionLocal() as db:
+        conn = db.connection().execution_options(yield_per=EXPORT_CHUNK_ROWS)
+        project = (
+            conn.execute(
+                select(*_PROJECT_COLUMNS).where(
+                    models.Project.id == project_id,
+                    models.Project.deleted_at.is_(None),
+                )
+            )
+            .mappings()
+            .first()
+        )
+        if project is None:  # deleted meanwhile
+            return
+        chunk = [ndjson_line({"type": "project", **project})]
+        # Milestones and tasks in board order, so the file diffs well; the
+        # (project_id, ...) indexes serve both without a sort.
+        for kind, stmt in (
+            (
+                "milestone",
+                select(*_MILESTONE_COLUMNS)
+                .where(models.Milestone.project_id == project_id)
+                .order_by(models.Milestone.order_index),
+            ),
+            (
+                "task",
+                select(*_TASK_COLUMNS)
+                .where(models.Task.project_id == project_id)
+                .order_by(models.Task.status, models.Task.order_index),
+            ),
+        ):
+            for rows in conn.execute(stmt).mappings().partitions():
+                chunk.extend(ndjson_line({"type": kind, **row}) for row in rows)
+                if len(chunk) >= EXPORT_CHUNK_ROWS:
+                    yield b"".join(chunk)
+                    chunk = []
+        if chunk:
+            yield b"".join(chunk)
+
+
+def export_chunks(project_ids: Optional[Sequence[int]] = None) -> Iterator[bytes]:
+    """NDJSON of every live project (or of ``project_ids``), oldest first.
+
+    Each project is read in its own session, so no connection is held for
+    the whole export.
+    """
+    after = 0
+    while True:
+        stmt = (
+            select(models.Project.id)
+            .where(models.Project.id > after, models.Project.deleted_at.is_(None))
+            .order_by(models.Project.id)
+            .limit(100)
+        )
+        if project_ids is not None:
+            stmt = stmt.where(models.Project.id.in_(project_ids))
+        with SessionLocal() as db:
+            page = db.scalars(stmt).all()
+        if not page:
+            return
+        for project_id in page:
+            yield from _export_project(project_id)
+        after = page[-1]
+
+
+# --- Import ---
+class LineError(NamedTuple):
+    """An import line that did not parse; ``type`` when it could be told."""
+
+    type: Optional[str]
+    detail: str
+
+
+@dataclass
+class _Project:
+    index: int
+    source_id: int
+    id: int
+    milestone_ids: Dict[int, int] = field(default_factory=dict)  # source -> new
+    milestones: int = 0
+    tasks: int = 0
+
+    def result(self) -> ImportResult:
+        return ImportResult(
+            index=self.index,
+            source_id=self.source_id,
+            status="created",
+            id=self.id,
+            milestones=self.milestones,
+            tasks=self.tasks,
+        )
+
+
+class ProjectImporter:
+    """Writes parsed import lines in order, one transaction per ``write``.
+
+    Lines are ``(line number, Export* model)``, or ``(line number,
+    LineError)`` for a line that did not parse. A project's result comes
+    back from the ``write`` (or ``finish``) that commits its last rows. A bad
+    line fails its project: rows already committed are hidden and purged
+    like a deleted project's, and the project's remaining lines are skipped.
+    A bad project line starts a new project, which fails on its own.
+    """
+
+    def __init__(self) -> None:
+        self._index = -1
+        self._current: Optional[_Project] = None
+        self._skipping = False
+        self._failed: List[int] = []
+        self._milestones: List[dict] = []
+        self._tasks: List[dict] = []
+
+    def write(
+        self, lines: Sequence[Tuple[int, Union[ExportLine, LineError]]]
+    ) -> List[ImportResult]:
+        results: List[ImportResult] = []
+        with SessionLocal() as db:
+            version = next_version(db)
+            if self._current is not None:
+                db.execute(
+                    update(models.Project)
+                    .where(models.Project.id == self._current.id)
+                    .values(version=version)
+                )
+
+            for line_no, line in lines:
+                if isinstance(line, ExportProject):
+                    if self._current is not None:
+                        self._flush(db)
+                        results.append(self._current.result())
+                    self._index += 1
+                    self._skipping = False
+                    self._current = _Project(
+                        self._index,
+                        line.id,
+                        db.scalar(
+                            insert(models.Project)
+                            .values(
+                                **line.model_dump(exclude={"type", "id"}),
+                                version=version,
+                            )
+                            .returning(models.Project.id)
+                        ),
+                    )
+                elif isinstance(line, LineError) and line.type == "project":
+                    if self._current is not None:  # complete: report it
+                        self._flush(db)
+                        results.append(self._current.result())
+                        self._current = None
+                    self._index += 1
+                    self._skipping = True
+                    results.append(
+                        ImportResult(
+                            index=self._index,
+                            status="failed",
+                            detail=f"Line {line_no}: {line.detail}",
+                        )
+                    )
+                elif self._skipping:
+                    continue
+                elif isinstance(line, LineError):
+                    results.append(self._fail(db, line_no, line.detail))
+                elif self._current is None:
+                    results.append(
+                        self._fail(db, line_no, f"{line.type} line before a project")
+                    )
+                elif isinstance(line, ExportMilestone):
+                    self._milestones.append(
+                        {
+                            **line.model_dump(exclude={"type"}),
+                            "project_id": self._current.id,
+                        }
+                    )
+                else:
+                    if self._milestones:  # tasks refer to their new ids
+                        self._flush(db)
+                    self._tasks.append(
+                        {
+                            **line.model_dump(exclude={"type", "id"}),
+                            "project_id": self._current.id,
+                        }
+                    )
+            self._flush(db)
+            db.commit()
+        return results
+
+    def _flush(self, db) -> None:
+        current = self._current
+        if self._milestones:
+            rows = self._milestones
+            ids = db.scalars(
+                insert(models.Milestone).returning(
+                    models.Milestone.id, sort_by_parameter_order=True
+                ),
+                [{k: v for k, v in m.items() if k != "id"} for m in rows],
+            ).all()
+            current.milestone_ids.update((m["id"], new) for m, new in zip(rows, ids))
+            current.milestones += len(rows)
+            self._milestones = []
+        if self._tasks:
+            # A task whose milestone is not in the file is imported without
+            # one (an export racing a write can produce that).
+            for t in self._tasks:
+                t["milestone_id"] = current.milestone_ids.get(t["milestone_id"])
+            db.execute(insert(models.Task), self._tasks)
+            current.tasks += len(self._tasks)
+            self._tasks = []
+
+    def _fail(self, db, line_no: int, detail: str) -> ImportResult:
+        current, self._current = self._current, None
+        self._skipping = True
+        self._milestones, self._tasks = [], []
+        detail = f"Line {line_no}: {detail}"
+        if current is None:
+            return ImportResult(status="failed", detail=detail)
+        # Hidden now; purged with the soft-deleted projects.
+        db.execute(
+            update(models.Project)
+            .where(models.Project.id == current.id)
+            .values(deleted_at=time.time())
+        )
+        self._failed.append(current.id)
+        return ImportResult(
+            index=current.index,
+            source_id=current.source_id,
+            status="failed",
+            detail=detail,
+        )
+
+    def finish(self) -> List[ImportResult]:
+        """Report the last project and purge failed ones."""
+        results = []
+        if self._current is not None:
+            results.append(self._current.result())
+            self._current = None
+        self._purge_failed()
+        return results
+
+    def abort(self) -> None:
+        """After a failed ``write`` or a disconnect: hide the project being
+        imported. Its rows are left to the background purger, so this stays
+        quick enough to run on the event loop."""
+        if self._current is not None:
+            with SessionLocal() as db:
+                db.execute(
+                    update(models.Project)
+                    .where(models.Project.id == self._current.id)
+                    .values(deleted_at=time.time())
+                )
+                db.commit()
+            self._current = None
+            schedule_purge()
+
+    def _purge_failed(self) -> None:
+        if self._failed and not schedule_purge():
+            for project_id in self._failed:
+                purge_project(project_id)
+        self._failed = []
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import hashlib
+from typing import Optional
+
+from fastapi import Request, Response
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Every write stamps the affected project with the next value of one global
+# counter. Project.version is therefore monotonic per project, and the pair
+# (project count, max version) changes on any create, update or delete, which
+# is what the list ETag is built from.
+
+
+def next_version(db: Session) -> int:
+    return db.execute(
+        update(models.VersionCounter)
+        .where(models.VersionCounter.id == 1)
+        .values(value=models.VersionCounter.value + 1)
+        .returning(models.VersionCounter.value)
+    ).scalar_one()
+
+
+def bump_project_version(db: Session, project_id: int) -> int:
+    version = next_version(db)
+    db.execute(
+        update(models.Project)
+        .where(models.Project.id == project_id)
+        .values(version=version),
+        execution_options={"synchronize_session": False},
+    )
+    return version
+
+
+# --- ETags ---
+def project_etag(project_id: int, version: int) -> str:
+    return f'"p{project_id}-v{version}"'
+
+
+def list_etag(db: Session, *parts: object) -> str:
+    count, max_version = db.execute(
+        select(func.count(), func.coalesce(func.max(models.Project.version), 0)).where(
+            models.Project.deleted_at.is_(None)
+        )
+    ).one()
+    raw = "|".join(str(p) for p in (count, max_version, *parts))
+    return '"l' + hashlib.sha256(raw.encode()).hexdigest()[:32] + '"'
+
+
+def project_version(db: Session, project_id: int) -> Optional[int]:
+    return db.execute(
+        select(models.Project.version).where(
+            models.Project.id == project_id, models.Project.deleted_at.is_(None)
+        )
+    ).scalar_one_or_none()
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """A 304 response when the request's If-None-Match covers ``etag``."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    tags = {t.strip().removeprefix("W/") for t in header.split(",")}
+    if "*" in tags or etag in tags:
+        return Response(status_code=304, headers=cache_headers(etag))
+    return None
+
+
+def cache_headers(etag: str) -> dict:
+    # no-cache: clients may store the body but must revalidate every time.
+    return {"ETag": etag, "Cache-Control": "no-cache"}
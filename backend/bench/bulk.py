@@ -0,0 +1,93 @@
+"""Cohort onboarding: one request per step vs POST /projects/bulk.
+
+sequential: POST /projects, POST /projects/{id}/plan/generate and
+POST /projects/{id}/plan/apply per project, one after another.
+bulk: one POST /projects/bulk with every item, reading the SSE stream;
+reports the time to the first stored project and to the end.
+
+COHORT projects share UNIQUE_GOALS goals, so either way there is one LLM
+call per goal and the rest come from the plan cache; bulk makes the calls
+concurrently and stores the projects in a few transactions. Each run uses
+a fresh database and cache.
+
+    cd backend && python -m bench.bulk
+"""
+
+from __future__ import annotations
+
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from .common import running_server
+
+COHORT = 40
+UNIQUE_GOALS = 10
+
+ENV = {
+    "LLM_PROVIDER": "fake",
+    "FAKE_LLM_LATENCY_MS": "400",
+    "FAKE_LLM_JITTER_MS": "0",
+    "BULK_PLAN_CONCURRENCY": "8",
+    # The goals differ only by a number; keep near-duplicate hits out of it.
+    "PLAN_CACHE_NEAR_THRESHOLD": "0",
+}
+
+
+def _project(i: int) -> dict:
+    return {
+        "title": f"Member {i}",
+        "goal_text": f"Onboarding track {i % UNIQUE_GOALS}",
+        "hours_per_week": 6,
+    }
+
+
+def _env() -> dict:
+    path = Path(tempfile.mkdtemp()) / "bulk.db"
+    return {**ENV, "DATABASE_URL": f"sqlite:///{path}"}
+
+
+def sequential() -> float:
+    with running_server(_env()) as base_url:
+        with httpx.Client(base_url=base_url, timeout=60) as client:
+            start = time.perf_counter()
+            for i in range(COHORT):
+                project = client.post("/projects", json=_project(i)).json()
+                base = f"/projects/{project['id']}/plan"
+                resp = client.post(f"{base}/generate", json=project)
+                resp.raise_for_status()
+                plan = resp.json()
+                client.post(f"{base}/apply", json=plan).raise_for_status()
+            return time.perf_counter() - start
+
+
+def bulk() -> tuple:
+    items = [{"project": _project(i)} for i in range(COHORT)]
+    with running_server(_env()) as base_url:
+        with httpx.Client(base_url=base_url, timeout=60) as client:
+            start = time.perf_counter()
+            first = None
+            with client.stream("POST", "/projects/bulk", json={"items": items}) as resp:
+                for line in resp.iter_lines():
+                    if line.startswith("event: item") and first is None:
+                        first = time.perf_counter() - start
+                    if line.startswith("data: ") and '"plans"' in line:
+                        summary = json.loads(line[6:])
+            return first, time.perf_counter() - start, summary
+
+
+def main() -> None:
+    print(
+        f"{COHORT} projects, {UNIQUE_GOALS} distinct goals, "
+        f"fake LLM {ENV['FAKE_LLM_LATENCY_MS']} ms"
+    )
+    print(f"sequential  total {sequential():6.2f}s")
+    first, total, summary = bulk()
+    print(f"bulk        total {total:6.2f}s  first item {first:5.2f}s  {summary}")
+
+
+if __name__ == "__main__":
+    main()
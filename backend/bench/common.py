@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import httpx
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import Session, sessionmaker
+
+from app import models
+from app.database import Base
+from app.ordering import spaced_keys
+
+
+def temp_engine():
+    path = Path(tempfile.mkdtemp()) / "bench.db"
+    engine = create_engine(
+        f"sqlite:///{path}", connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(engine)
+    return engine
+
+
+def session_factory(engine) -> sessionmaker:
+    return sessionmaker(bind=engine, expire_on_commit=False, class_=Session)
+
+
+def seed_project(db: Session, task_count: int, milestones: int = 3) -> int:
+    project = models.Project(title="Bench", goal_text="Benchmark goal " * 20)
+    db.add(project)
+    db.flush()
+    milestone_ids = []
+    for i in range(milestones):
+        m = models.Milestone(project_id=project.id, title=f"M{i}", order_index=i)
+        db.add(m)
+        db.flush()
+        milestone_ids.append(m.id)
+
+    statuses = ("todo", "in_progress", "done")
+    keys = spaced_keys(task_count)
+    db.execute(
+        insert(models.Task),
+        [
+            {
+                "project_id": project.id,
+                "milestone_id": milestone_ids[i % milestones],
+                "title": f"Task {i}",
+                "description": "Do the thing described here.",
+                "status": statuses[i % 3],
+                "estimate": "SML"[i % 3],
+                "order_index": keys[i],
+            }
+            for i in range(task_count)
+        ],
+    )
+    db.commit()
+    return project.id
+
+
+@contextmanager
+def count_queries(engine):
+    counter = {"n": 0}
+
+    def before(*_args, **_kwargs):
+        counter["n"] += 1
+
+    event.listen(engine, "before_cursor_execute", before)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", before)
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+
+    def pct(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+    return {
+        "p50": pct(0.50),
+        "p95": pct(0.95),
+        "p99": pct(0.99),
+        "mean": statistics.fmean(ordered),
+    }
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def running_server(env: Optional[Dict[str, str]] = None) -> Iterator[str]:
+    """Run the API under uvicorn; yields its base URL.
+
+    Uses a throwaway database unless ``env`` sets DATABASE_URL.
+    """
+    port = _free_port()
+    server_env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{Path(tempfile.mkdtemp()) / 'bench.db'}",
+        **(env or {}),
+    }
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        cwd=BACKEND_DIR,
+        env=server_env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(100):
+            try:
+                if httpx.get(f"{base_url}/health").status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            time.sleep(0.1)
+        else:
+            raise RuntimeError("server did not start")
+        yield base_url
+    finally:
+        server.terminate()
+        server.wait()
@@ -0,0 +1,88 @@
+"""Deleting a large project while another client keeps writing.
+
+Seeds a project with TASKS tasks (via plan apply) and, while DELETE
+/projects/{id} runs, PATCHes a task of another project in a loop.
+Reports the delete's response time and the other client's write latency,
+for one transaction per table (a chunk size larger than the project), for
+the default chunked purge and for ?soft=true, where the purge runs after
+the response.
+
+    cd backend && python -m bench.delete
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import List, Tuple
+
+import httpx
+
+from .common import percentiles, running_server
+
+TASKS = 20000
+RUNS = (
+    ("one txn", {"PROJECT_PURGE_CHUNK": str(10 * TASKS)}, ""),
+    ("chunked", {}, ""),
+    ("soft", {}, "?soft=true"),
+)
+
+
+async def _project(client: httpx.AsyncClient, tasks: int) -> Tuple[int, int]:
+    resp = await client.post("/projects", json={"title": "Bench", "goal_text": "g"})
+    project_id = resp.json()["id"]
+    plan = {
+        "milestones": [{"title": f"M{i}", "order_index": i} for i in range(10)],
+        "tasks": [
+            {
+                "title": f"Task {i}",
+                "description": "Do the thing described here." * 4,
+                "milestone_index": i % 10,
+                "order_index": i,
+            }
+            for i in range(tasks)
+        ],
+    }
+    resp = await client.post(f"/projects/{project_id}/plan/apply", json=plan)
+    resp.raise_for_status()
+    return project_id, resp.json()["tasks"][0]["id"]
+
+
+async def _run(base_url: str, query: str) -> Tuple[float, List[float]]:
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        big, _ = await _project(client, TASKS)
+        _, task_id = await _project(client, 1)
+        writes: List[float] = []
+        done = asyncio.Event()
+
+        async def writer() -> None:
+            i = 0
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.patch(f"/tasks/{task_id}", json={"title": f"Edit {i}"})
+                writes.append((time.perf_counter() - start) * 1000)
+                i += 1
+
+        background = asyncio.create_task(writer())
+        await asyncio.sleep(0.2)
+        start = time.perf_counter()
+        (await client.delete(f"/projects/{big}{query}")).raise_for_status()
+        elapsed = (time.perf_counter() - start) * 1000
+        await asyncio.sleep(1)  # soft: let the purge run alongside the writer
+        done.set()
+        await background
+        return elapsed, writes
+
+
+def main() -> None:
+    print(f"project with {TASKS} tasks; another client PATCHes a task meanwhile")
+    print(f"{'mode':<8} {'delete ms':>10} {'write p50':>10} {'write max':>10}")
+    for name, env, query in RUNS:
+        with running_server({**env, "PROJECT_PURGE_POLL_SECONDS": "1"}) as url:
+            elapsed, writes = asyncio.run(_run(url, query))
+        p = percentiles(writes)
+        print(f"{name:<8} {elapsed:>10.0f} {p['p50']:>10.1f} {max(writes):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Fan-out load test for GET /projects/{id}/events.
+
+Starts the API under uvicorn on a throwaway database, opens SUBSCRIBERS
+concurrent SSE streams on one project, issues WRITES task updates and
+reports how long each event took to reach every subscriber. A second part
+drives the in-process broker directly with consumers that never read, to
+show that their queues stay bounded and collapse into a resync event.
+
+    cd backend && python -m bench.event_fanout [subscribers] [writes]
+"""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+from .common import percentiles, running_server
+
+SUBSCRIBERS = 1_000
+WRITES = 100
+
+
+async def _subscribe(
+    client: httpx.AsyncClient,
+    project_id: int,
+    last_version: asyncio.Future,
+    ready: List[int],
+    received: Dict[int, List[float]],
+) -> None:
+    async with client.stream("GET", f"/projects/{project_id}/events") as resp:
+        event_id = None
+        async for line in resp.aiter_lines():
+            if line.startswith("id: "):
+                event_id = int(line[4:])
+            elif line == "event: ready":
+                ready[0] += 1
+            elif line.startswith("event: ") and event_id is not None:
+                received.setdefault(event_id, []).append(time.perf_counter())
+                if last_version.done() and event_id >= last_version.result():
+                    return
+
+
+async def _http_fanout(subscribers: int, writes: int) -> None:
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    with running_server({"EVENTS_HEARTBEAT_SECONDS": "60"}) as base_url:
+        async with httpx.AsyncClient(
+            base_url=base_url, limits=limits, timeout=None
+        ) as client:
+            project_id = (
+                await client.post("/projects", json={"title": "b", "goal_text": "g"})
+            ).json()["id"]
+            task_id = (
+                await client.post(
+                    "/tasks", json={"project_id": project_id, "title": "t0"}
+                )
+            ).json()["id"]
+
+            last_version: asyncio.Future = asyncio.get_running_loop().create_future()
+            ready = [0]
+            received: Dict[int, List[float]] = {}
+            streams = [
+                asyncio.create_task(
+                    _subscribe(client, project_id, last_version, ready, received)
+                )
+                for _ in range(subscribers)
+            ]
+            start = time.perf_counter()
+            while ready[0] < subscribers:
+                await asyncio.sleep(0.05)
+            connect_s = time.perf_counter() - start
+
+            sent: Dict[int, float] = {}
+            for i in range(writes):
+                t0 = time.perf_counter()
+                await client.patch(f"/tasks/{task_id}", json={"title": f"t{i}"})
+                version = (await client.get(f"/projects/{project_id}")).json()[
+                    "version"
+                ]
+                sent[version] = t0
+            # One more write so every stream sees an id past the last sample.
+            last_version.set_result(max(sent) + 1)
+            await client.patch(f"/tasks/{task_id}", json={"title": "done"})
+            await asyncio.wait_for(asyncio.gather(*streams), 120)
+
+        first, last = [], []
+        for version, t0 in sent.items():
+            times = received.get(version, [])
+            if len(times) != subscribers:
+                print(f"version {version}: {len(times)}/{subscribers} delivered")
+                continue
+            first.append((min(times) - t0) * 1000)
+            last.append((max(times) - t0) * 1000)
+
+        print(f"{subscribers} subscribers connected in {connect_s:.2f}s")
+        print(f"{'delivery':<14} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for name, samples in (("first client", first), ("last client", last)):
+            stats = percentiles(samples)
+            print(
+                f"{name:<14} {stats['p50']:>8.1f} {stats['p95']:>8.1f} "
+                f"{stats['p99']:>8.1f}"
+            )
+
+
+async def _slow_consumers(subscribers: int, events: int) -> None:
+    from app.events import RESYNC, InProcessBroker, make_event
+
+    broker = InProcessBroker(max_queue=256)
+    subs = [broker.subscribe(1) for _ in range(subscribers)]
+
+    start = time.perf_counter()
+    await asyncio.to_thread(
+        lambda: [
+            broker.publish(make_event("task.updated", 1, v)) for v in range(events)
+        ]
+    )
+    await asyncio.sleep(0)  # run the batched deliveries
+    elapsed = time.perf_counter() - start
+
+    queued = [s.backlog for s in subs]
+    first = await subs[0].get(0)
+    print(
+        f"\n{subscribers} non-reading subscribers, {events} events published "
+        f"from a worker thread in {elapsed * 1000:.0f} ms"
+    )
+    print(
+        f"max queued per subscriber: {max(queued)} (limit {broker.max_queue}), "
+        f"dropped total: {broker.stats()['dropped']}, "
+        f"next event: {first['type']}"
+    )
+    assert first["type"] in (RESYNC, "task.updated")
+    for s in subs:
+        s.close()
+
+
+def main() -> None:
+    subscribers = int(sys.argv[1]) if len(sys.argv) > 1 else SUBSCRIBERS
+    writes = int(sys.argv[2]) if len(sys.argv) > 2 else WRITES
+    asyncio.run(_http_fanout(subscribers, writes))
+    asyncio.run(_slow_consumers(subscribers, 5_000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Plan latency under an upstream tail: hedged vs unhedged calls.
+
+The fake LLM answers in ~300 ms, but SLOW_RATE of its calls take SLOW_MS
+longer, and FAILURE_RATE fail outright. REQUESTS distinct goals (so none
+come from the plan cache) go through POST /plan/generate, CONCURRENCY at
+a time, once with LLM_HEDGE=0 and once with LLM_HEDGE=1. Reports latency,
+errors and, from /metrics, which path answered and how many extra
+requests were sent.
+
+    cd backend && python -m bench.llm_tail
+"""
+
+from __future__ import annotations
+
+import asyncio
+import re
+import time
+from typing import Dict, List, Tuple
+
+import httpx
+
+from .common import percentiles, running_server
+
+REQUESTS = 300
+CONCURRENCY = 8
+SLOW_RATE = 0.05
+SLOW_MS = 4000
+FAILURE_RATE = 0.02
+
+ENV = {
+    "LLM_PROVIDER": "fake",
+    "FAKE_LLM_LATENCY_MS": "300",
+    "FAKE_LLM_JITTER_MS": "100",
+    "FAKE_LLM_SEED": "7",
+    "FAKE_LLM_SLOW_RATE": str(SLOW_RATE),
+    "FAKE_LLM_SLOW_MS": str(SLOW_MS),
+    "FAKE_LLM_FAILURE_RATE": str(FAILURE_RATE),
+    "PLAN_CACHE_NEAR_THRESHOLD": "0",
+    "LLM_RETRY_BACKOFF_SECONDS": "0.2",
+    # Warm-up: hedge after 1 s until 20 samples give a p95.
+    "LLM_HEDGE_DEFAULT_SECONDS": "1",
+}
+
+_COUNTER = re.compile(
+    r"^(llm_calls_total|llm_extra_requests_total)\{(.*)\} (\S+)$", re.M
+)
+
+
+def _counters(text: str) -> Dict[str, float]:
+    return {
+        f"{name}{{{labels}}}": float(value)
+        for name, labels, value in _COUNTER.findall(text)
+    }
+
+
+async def _load(base_url: str) -> Tuple[List[float], int, Dict[str, float]]:
+    samples: List[float] = []
+    errors = 0
+    gate = asyncio.Semaphore(CONCURRENCY)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+
+        async def one(i: int) -> None:
+            nonlocal errors
+            async with gate:
+                start = time.perf_counter()
+                resp = await client.post(
+                    "/plan/generate", json={"goal_text": f"Tail goal {i}"}
+                )
+                samples.append((time.perf_counter() - start) * 1000)
+                errors += resp.status_code != 200
+
+        await asyncio.gather(*(one(i) for i in range(REQUESTS)))
+        counters = _counters((await client.get("/metrics")).text)
+    return samples, errors, counters
+
+
+def main() -> None:
+    print(
+        f"{REQUESTS} requests, {CONCURRENCY} at a time; {SLOW_RATE:.0%} of LLM "
+        f"calls +{SLOW_MS} ms, {FAILURE_RATE:.0%} fail"
+    )
+    print(
+        f"{'hedge':<6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+        f"{'max ms':>8} {'errors':>7}"
+    )
+    runs = []
+    for hedge in ("0", "1"):
+        with running_server({**ENV, "LLM_HEDGE": hedge}) as base_url:
+            samples, errors, counters = asyncio.run(_load(base_url))
+        p = percentiles(samples)
+        print(
+            f"{hedge:<6} {p['p50']:>8.0f} {p['p95']:>8.0f} {p['p99']:>8.0f} "
+            f"{max(samples):>8.0f} {errors:>7}"
+        )
+        runs.append((hedge, counters))
+    for hedge, counters in runs:
+        print(f"\nLLM_HEDGE={hedge}")
+        for name, value in sorted(counters.items()):
+            print(f"  {name} {value:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""HTTP load test of the hot paths, offline.
+
+Runs the API under uvicorn with LLM_PROVIDER=fake, so plan generation and
+revision cost a simulated round trip (FAKE_LLM_LATENCY_MS, default 300 ms
+here) and no API key. Each scenario runs REQUESTS requests at every
+concurrency level and reports throughput, p50/p95/p99 and errors.
+
+    cd backend && python -m bench.load [--requests N] [--concurrency 1 8 32]
+                                       [--only reorder plan_generate ...]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import random
+import time
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+
+from .common import percentiles, running_server
+
+REQUESTS = 200
+CONCURRENCY = (1, 8, 32, 64)
+SEED_TASKS = 500
+
+FAKE_LLM_ENV = {
+    "LLM_PROVIDER": "fake",
+    "FAKE_LLM_LATENCY_MS": "300",
+    "FAKE_LLM_JITTER_MS": "100",
+    "FAKE_LLM_SEED": "1",
+    "OPENAI_MAX_CONCURRENCY": "64",
+}
+
+Scenario = Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]
+
+
+def _plan(size: int, label: str) -> dict:
+    return {
+        "milestones": [{"title": f"M{i}", "order_index": i} for i in range(3)],
+        "tasks": [
+            {
+                "title": f"{label} task {i}",
+                "milestone_index": i % 3,
+                "order_index": i,
+            }
+            for i in range(size)
+        ],
+    }
+
+
+async def _setup(client: httpx.AsyncClient) -> Dict[str, object]:
+    async def project(title: str) -> int:
+        resp = await client.post(
+            "/projects", json={"title": title, "goal_text": "Load test goal"}
+        )
+        return resp.json()["id"]
+
+    board = await project("Board")
+    detail = (
+        await client.post(f"/projects/{board}/plan/apply", json=_plan(SEED_TASKS, "a"))
+    ).json()
+    draft = (
+        await client.post("/plan/generate", json={"goal_text": "Load test goal"})
+    ).json()
+    return {
+        "board": board,
+        "task_ids": [t["id"] for t in detail["tasks"]],
+        "apply_project": await project("Apply"),
+        "draft": draft,
+        "rng": random.Random(7),
+        "unique": itertools.count(),
+    }
+
+
+def _scenarios(ctx: Dict[str, object]) -> Dict[str, Scenario]:
+    board = ctx["board"]
+    task_ids: List[int] = ctx["task_ids"]
+    rng: random.Random = ctx["rng"]
+    unique = ctx["unique"]
+    plans = [_plan(40, "x"), _plan(40, "y")]
+
+    return {
+        "project_summaries": lambda c, i: c.get("/projects/summaries"),
+        "project_detail": lambda c, i: c.get(f"/projects/{board}"),
+        "task_create": lambda c, i: c.post(
+            "/tasks", json={"project_id": board, "title": f"new {i}"}
+        ),
+        "task_update": lambda c, i: c.patch(
+            f"/tasks/{rng.choice(task_ids)}", json={"title": f"edited {i}"}
+        ),
+        "reorder": lambda c, i: c.patch(
+            f"/projects/{board}/tasks/order",
+            json={
+                "tasks": [
+                    {
+                        "id": rng.choice(task_ids),
+                        "status": "todo",
+                        "order_index": rng.randrange(50),
+                    }
+                ]
+            },
+        ),
+        "plan_generate": lambda c, i: c.post(
+            "/plan/generate", json={"goal_text": f"Goal {next(unique)}"}
+        ),
+        "plan_revise": lambda c, i: c.post(
+            f"/projects/{board}/plan/revise",
+            json={
+                "goal_text": "Load test goal",
+                "current_plan": ctx["draft"],
+                "adjustment": f"Change {next(unique)}",
+            },
+        ),
+        "plan_apply": lambda c, i: c.post(
+            f"/projects/{ctx['apply_project']}/plan/apply?mode=diff",
+            json=plans[i % 2],
+        ),
+    }
+
+
+async def _run_level(
+    client: httpx.AsyncClient, scenario: Scenario, requests: int, concurrency: int
+) -> Dict[str, float]:
+    counter = itertools.count()
+    samples: List[float] = []
+    errors = 0
+
+    async def worker() -> None:
+        nonlocal errors
+        while (i := next(counter)) < requests:
+            start = time.perf_counter()
+            try:
+                resp = await scenario(client, i)
+                ok = resp.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            samples.append((time.perf_counter() - start) * 1000)
+            errors += not ok
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {**percentiles(samples), "rps": requests / elapsed, "errors": errors}
+
+
+async def _run(requests: int, levels: List[int], only: List[str]) -> None:
+    limits = httpx.Limits(max_connections=max(levels) + 4)
+    with running_server(FAKE_LLM_ENV) as base_url:
+        async with httpx.AsyncClient(
+            base_url=base_url, limits=limits, timeout=60
+        ) as client:
+            scenarios = _scenarios(await _setup(client))
+            print(
+                f"{'scenario':<18} {'conc':>5} {'req/s':>8} {'p50 ms':>8} "
+                f"{'p95 ms':>8} {'p99 ms':>8} {'errors':>6}"
+            )
+            for name, scenario in scenarios.items():
+                if only and name not in only:
+                    continue
+                for level in levels:
+                    r = await _run_level(client, scenario, requests, level)
+                    print(
+                        f"{name:<18} {level:>5} {r['rps']:>8.1f} {r['p50']:>8.1f} "
+                        f"{r['p95']:>8.1f} {r['p99']:>8.1f} {r['errors']:>6}"
+                    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--requests", type=int, default=REQUESTS)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=CONCURRENCY)
+    parser.add_argument("--only", nargs="*", default=[])
+    args = parser.parse_args()
+    asyncio.run(_run(args.requests, list(args.concurrency), args.only))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Plan job queue: per-client fairness and surviving a restart.
+
+fairness: a batch client queues BATCH jobs, then an interactive client
+submits a few, one at a time. Both run at the same priority; the claim
+order serves the interactive client next instead of after the backlog.
+Reports submit-to-result latency per client.
+
+restart: queues RESTART_JOBS jobs, stops the server part-way through and
+starts a new one on the same database, which finishes the rest.
+
+Both use the fake LLM (FAKE_LLM_LATENCY_MS=200 here).
+
+    cd backend && python -m bench.plan_jobs
+"""
+
+from __future__ import annotations
+
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+from .common import percentiles, running_server
+
+WORKERS = 4
+BATCH = 80
+INTERACTIVE = 8
+RESTART_JOBS = 24
+
+ENV = {
+    "LLM_PROVIDER": "fake",
+    "FAKE_LLM_LATENCY_MS": "200",
+    "FAKE_LLM_JITTER_MS": "0",
+    "PLAN_JOB_WORKERS": str(WORKERS),
+    "PLAN_JOB_POLL_SECONDS": "0.2",
+}
+
+
+async def _submit(client: httpx.AsyncClient, who: str, goal: str) -> str:
+    resp = await client.post(
+        "/plan/jobs",
+        json={"kind": "generate", "input": {"goal_text": goal}},
+        headers={"X-Client-Id": who},
+    )
+    resp.raise_for_status()
+    return resp.json()["id"]
+
+
+async def _result(client: httpx.AsyncClient, job_id: str) -> dict:
+    while True:
+        job = (await client.get(f"/plan/jobs/{job_id}?wait=30")).json()
+        if job["status"] in ("succeeded", "failed"):
+            return job
+
+
+async def _timed_job(client: httpx.AsyncClient, who: str, goal: str) -> float:
+    start = time.perf_counter()
+    await _result(client, await _submit(client, who, goal))
+    return (time.perf_counter() - start) * 1000
+
+
+async def fairness(base_url: str) -> None:
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        batch = [
+            asyncio.create_task(_timed_job(client, "batch", f"Batch goal {i}"))
+            for i in range(BATCH)
+        ]
+        await asyncio.sleep(0.5)
+
+        interactive: List[float] = []
+        for i in range(INTERACTIVE):
+            interactive.append(await _timed_job(client, "web", f"Web goal {i}"))
+        batch_ms = await asyncio.gather(*batch)
+
+    print(f"fairness: {WORKERS} workers, {BATCH} batch jobs queued first")
+    print(f"{'client':<12} {'jobs':>5} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+    for name, samples in (("batch", batch_ms), ("interactive", interactive)):
+        p = percentiles(samples)
+        print(
+            f"{name:<12} {len(samples):>5} {p['p50']:>8.0f} {p['p95']:>8.0f} "
+            f"{max(samples):>8.0f}"
+        )
+
+
+def restart() -> None:
+    env = {
+        **ENV,
+        "PLAN_JOB_WORKERS": "1",
+        "DATABASE_URL": f"sqlite:///{Path(tempfile.mkdtemp()) / 'jobs.db'}",
+    }
+
+    async def submit(base_url: str) -> List[str]:
+        async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+            return [
+                await _submit(client, "batch", f"Restart goal {i}")
+                for i in range(RESTART_JOBS)
+            ]
+
+    async def statuses(base_url: str, ids: List[str], wait: bool) -> Dict[str, int]:
+        async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+            counts: Dict[str, int] = {}
+            for job_id in ids:
+                if wait:
+                    job = await _result(client, job_id)
+                else:
+                    job = (await client.get(f"/plan/jobs/{job_id}")).json()
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+            return counts
+
+    with running_server(env) as base_url:
+        ids = asyncio.run(submit(base_url))
+        time.sleep(1)
+        before = asyncio.run(statuses(base_url, ids, wait=False))
+    with running_server(env) as base_url:
+        start = time.perf_counter()
+        after = asyncio.run(statuses(base_url, ids, wait=True))
+        elapsed = time.perf_counter() - start
+
+    print(f"\nrestart: {RESTART_JOBS} jobs, one worker")
+    print(f"at shutdown   {before}")
+    print(f"after restart {after} in {elapsed:.1f}s")
+
+
+def main() -> None:
+    with running_server(ENV) as base_url:
+        asyncio.run(fairness(base_url))
+    restart()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Project progress from precomputed counters vs counting tasks.
+
+Lists PAGE project summaries (task and done counts) over projects of
+TASKS tasks each, once counting every task (GROUP BY over tasks, as the
+summaries query did before task_progress) and once reading task_progress.
+Then times single-task status updates with and without the counter
+triggers, the cost the counters add to writes.
+
+    cd backend && python -m bench.progress
+"""
+
+from __future__ import annotations
+
+from time import perf_counter
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy import case, func, select, update
+
+from app import models, queries
+from app.progress import install_progress
+from app.queries import GOAL_EXCERPT_CHARS, list_project_summaries
+from app.schemas import ProjectSummary
+
+from .common import percentiles, seed_project, session_factory, temp_engine
+
+PAGE = 200
+SIZES = (10, 100, 1_000)
+REPEAT = 20
+UPDATES = 500
+
+
+def counted_summaries(db, limit: int) -> List[ProjectSummary]:
+    """The summaries query before task_progress."""
+    rows = queries._rows(
+        db,
+        queries._page(
+            select(
+                models.Project.id,
+                models.Project.title,
+                func.substr(models.Project.goal_text, 1, GOAL_EXCERPT_CHARS).label(
+                    "goal_excerpt"
+                ),
+                models.Project.deadline,
+                models.Project.hours_per_week,
+                queries._created_at_raw.label("cursor_created_at"),
+            ),
+            limit,
+            None,
+        ),
+    )
+    queries._next_cursor(rows, limit)
+    counts = db.connection().execute(
+        select(
+            models.Task.project_id,
+            func.count(),
+            func.sum(case((models.Task.status == "done", 1), else_=0)),
+        )
+        .where(models.Task.project_id.in_([r["id"] for r in rows]))
+        .group_by(models.Task.project_id)
+    )
+    by_project = {pid: (total, done or 0) for pid, total, done in counts}
+    for r in rows:
+        r["task_count"], r["done_count"] = by_project.get(r["id"], (0, 0))
+    return TypeAdapter(List[ProjectSummary]).validate_python(rows)
+
+
+def _timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = perf_counter()
+        fn()
+        samples.append((perf_counter() - start) * 1000)
+    return percentiles(samples)["p50"]
+
+
+def _updates(engine) -> float:
+    Session = session_factory(engine)
+    with Session() as db:
+        task_ids = [tid for (tid,) in db.execute(select(models.Task.id).limit(UPDATES))]
+    statuses = ("todo", "in_progress", "done")
+    start = perf_counter()
+    with Session() as db:
+        for i, task_id in enumerate(task_ids):
+            db.execute(
+                update(models.Task)
+                .where(models.Task.id == task_id)
+                .values(status=statuses[(i + 1) % 3], estimate="SML"[i % 3])
+            )
+            db.commit()
+    return (perf_counter() - start) * 1000 / len(task_ids)
+
+
+def main() -> None:
+    print(f"{PAGE} project summaries")
+    print(f"{'tasks/project':>13} {'count ms':>9} {'counters ms':>12}")
+    for size in SIZES:
+        engine = temp_engine()
+        with engine.begin() as conn:
+            install_progress(conn)
+        Session = session_factory(engine)
+        with Session() as db:
+            for _ in range(PAGE):
+                seed_project(db, size)
+        with Session() as db:
+            counted = _timed(lambda: counted_summaries(db, PAGE), REPEAT)
+            stored = _timed(lambda: list_project_summaries(db, PAGE), REPEAT)
+        print(f"{size:>13} {counted:>9.1f} {stored:>12.1f}")
+
+    print(f"\nsingle-task status updates, {UPDATES} commits")
+    for label, triggers in (("without counters", False), ("with counters", True)):
+        engine = temp_engine()
+        if triggers:
+            with engine.begin() as conn:
+                install_progress(conn)
+        with session_factory(engine)() as db:
+            for _ in range(5):
+                seed_project(db, 1_000)
+        print(f"{label:<17} {_updates(engine):>6.3f} ms per update")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Query count and latency of GET /projects/{id} serialisation.
+
+Compares the old path (ORM Project + lazy relationships + from_attributes
+validation) with ``queries.project_detail``.
+
+    cd backend && python -m bench.project_detail
+"""
+
+from __future__ import annotations
+
+from time import perf_counter
+
+from app import models
+from app.queries import project_detail
+from app.schemas import ProjectDetailResponse
+
+from .common import (
+    count_queries,
+    percentiles,
+    seed_project,
+    session_factory,
+    temp_engine,
+)
+
+SIZES = (10, 1_000, 10_000)
+
+
+def orm_detail(db, project_id: int) -> ProjectDetailResponse:
+    project = db.query(models.Project).filter(models.Project.id == project_id).first()
+    return ProjectDetailResponse.model_validate(project)
+
+
+def main() -> None:
+    engine = temp_engine()
+    Session = session_factory(engine)
+
+    print(f"{'tasks':>7} {'path':<8} {'queries':>7} {'p50 ms':>8} {'p95 ms':>8}")
+    for size in SIZES:
+        with Session() as db:
+            project_id = seed_project(db, size)
+
+        repeat = 50 if size <= 1_000 else 10
+        for name, fn in (("orm", orm_detail), ("columns", project_detail)):
+            samples = []
+            for _ in range(repeat):
+                with Session() as db, count_queries(engine) as counter:
+                    start = perf_counter()
+                    fn(db, project_id).model_dump_json()
+                    samples.append((perf_counter() - start) * 1000)
+            stats = percentiles(samples)
+            print(
+                f"{size:>7} {name:<8} {counter['n']:>7} "
+                f"{stats['p50']:>8.2f} {stats['p95']:>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Tokens and latency per plan revision: full regeneration vs patches.
+
+Runs POST /plan/revise against a server per PLAN_REVISE_MODE. The fake LLM
+charges a fixed round trip plus decode time per output token, and counts
+tokens as characters / 4; tokens per revision come from /metrics. Every
+revision has a new adjustment, so none is served from the plan cache.
+
+The fake regenerates at most 12 tasks, so for the 40-task plan the full
+mode's output (and latency) is understated.
+
+    cd backend && python -m bench.revision
+"""
+
+from __future__ import annotations
+
+import re
+import time
+from typing import Dict, List
+
+import httpx
+
+from app.llm_providers import fake_plan
+
+from .common import percentiles, running_server
+
+REVISIONS = 20
+PLAN_SIZES = (("simple", 8), ("detailed", 12), ("detailed", 40))
+
+ENV = {
+    "LLM_PROVIDER": "fake",
+    "FAKE_LLM_LATENCY_MS": "250",
+    "FAKE_LLM_JITTER_MS": "0",
+    # ~80 output tokens/s, in line with small hosted models.
+    "FAKE_LLM_MS_PER_OUTPUT_TOKEN": "12",
+}
+
+_TOKENS = re.compile(r'^llm_tokens_total\{model="[^"]*",kind="(\w+)"\} (\S+)$', re.M)
+
+
+def _plan(detail: str, size: int) -> dict:
+    plan = fake_plan(f"GOAL: Bench\nDETAIL: {detail}").model_dump(mode="json")
+    tasks = plan["tasks"]
+    while len(tasks) < size:
+        extra = dict(tasks[len(tasks) % 12], order_index=len(tasks))
+        extra["title"] = f"{extra['title']} (part {len(tasks)})"
+        tasks.append(extra)
+    plan["tasks"] = tasks[:size]
+    return plan
+
+
+def _tokens(client: httpx.Client) -> Dict[str, float]:
+    text = client.get("/metrics").text
+    totals: Dict[str, float] = {}
+    for kind, value in _TOKENS.findall(text):
+        totals[kind] = totals.get(kind, 0) + float(value)
+    return totals
+
+
+def _run(mode: str) -> List[dict]:
+    rows = []
+    with running_server({**ENV, "PLAN_REVISE_MODE": mode}) as base_url:
+        with httpx.Client(base_url=base_url, timeout=60) as client:
+            for detail, size in PLAN_SIZES:
+                plan = _plan(detail, size)
+                before = _tokens(client)
+                samples = []
+                for i in range(REVISIONS):
+                    start = time.perf_counter()
+                    resp = client.post(
+                        "/plan/revise",
+                        json={
+                            "goal_text": "Bench",
+                            "detail_level": detail,
+                            "current_plan": plan,
+                            "adjustment": f"Make step {i} shorter",
+                        },
+                    )
+                    resp.raise_for_status()
+                    samples.append((time.perf_counter() - start) * 1000)
+                after = _tokens(client)
+                rows.append(
+                    {
+                        "mode": mode,
+                        "tasks": size,
+                        "input": (after["input"] - before.get("input", 0)) / REVISIONS,
+                        "output": (after["output"] - before.get("output", 0))
+                        / REVISIONS,
+                        **percentiles(samples),
+                    }
+                )
+    return rows
+
+
+def main() -> None:
+    print(f"{REVISIONS} revisions per plan size")
+    print(
+        f"{'mode':<6} {'tasks':>5} {'in tok':>7} {'out tok':>7} "
+        f"{'p50 ms':>8} {'p95 ms':>8}"
+    )
+    for mode in ("full", "patch"):
+        for r in _run(mode):
+            print(
+                f"{r['mode']:<6} {r['tasks']:>5} {r['input']:>7.0f} "
+                f"{r['output']:>7.0f} {r['p50']:>8.0f} {r['p95']:>8.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
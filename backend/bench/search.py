@@ -0,0 +1,117 @@
+"""GET /search query time on a large index.
+
+Builds a database of TASKS tasks over PROJECTS projects (titles and
+descriptions drawn from a Zipf-like vocabulary, so some words are in a
+large share of tasks and most are rare), indexed through the same triggers
+as the app, then times search.search() per query shape (first page and
+the five pages after it), ranking every match and ranking only the newest
+SEARCH_RANK_WINDOW. A query without a trailing space matches its last word
+as a prefix, as while typing.
+
+    cd backend && python -m bench.search [--tasks 1000000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import random
+import time
+
+from sqlalchemy import insert
+
+from app import models
+from app import search as fts
+
+from .common import percentiles, session_factory, temp_engine
+
+PROJECTS = 2000
+REPEAT = 5
+VOCABULARY = [f"w{i}" for i in range(20000)]
+CUM_WEIGHTS = list(itertools.accumulate(1 / (i + 1) for i in range(len(VOCABULARY))))
+STATUSES = ("todo", "in_progress", "done")
+
+QUERIES = (
+    ("rare word", "w15000 ", {}),
+    ("common word", "w1 ", {}),
+    ("two words", "w3 w40 ", {}),
+    ("prefix", "w12", {}),
+    ("common + project", "w1 ", {"project_id": 7}),
+    ("common + status", "w1 ", {"status": "done"}),
+)
+
+
+def _words(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choices(VOCABULARY, cum_weights=CUM_WEIGHTS, k=n))
+
+
+def _seed(engine, tasks: int) -> None:
+    rng = random.Random(1)
+    with engine.begin() as conn:
+        fts.install_search(conn)
+        conn.execute(
+            insert(models.Project),
+            [
+                {"title": _words(rng, 3), "goal_text": _words(rng, 20)}
+                for _ in range(PROJECTS)
+            ],
+        )
+        batch = 50000
+        for start in range(0, tasks, batch):
+            conn.execute(
+                insert(models.Task),
+                [
+                    {
+                        "project_id": rng.randrange(1, PROJECTS + 1),
+                        "title": _words(rng, 5),
+                        "description": _words(rng, 25),
+                        "status": rng.choice(STATUSES),
+                        "order_index": i,
+                    }
+                    for i in range(start, min(tasks, start + batch))
+                ],
+            )
+        conn.exec_driver_sql(
+            "INSERT INTO search_index(search_index) VALUES ('optimize')"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    engine = temp_engine()
+    start = time.perf_counter()
+    _seed(engine, args.tasks)
+    print(f"{args.tasks} tasks indexed in {time.perf_counter() - start:.0f}s")
+
+    Session = session_factory(engine)
+    windows = (("all", args.tasks * 2 + PROJECTS), ("window", fts.RANK_WINDOW))
+    print(f"{'query':<18} {'matches':>8} {'ranked':>7} {'p50 ms':>8} {'+5 pages':>9}")
+    with Session() as db:
+        conn = db.connection()
+        for name, q, filters in QUERIES:
+            match = fts.match_expression(q, **filters)
+            matches = conn.exec_driver_sql(
+                "SELECT count(*) FROM search_index WHERE search_index MATCH ?",
+                (match,),
+            ).scalar()
+            for label, window in windows:
+                fts.RANK_WINDOW = window
+                samples = []
+                for _ in range(REPEAT):
+                    t = time.perf_counter()
+                    _, cursor = fts.search(db, match, 20)
+                    samples.append((time.perf_counter() - t) * 1000)
+                t = time.perf_counter()
+                for _ in range(5):
+                    if cursor:
+                        _, cursor = fts.search(db, match, 20, cursor)
+                pages = (time.perf_counter() - t) * 1000
+                p50 = percentiles(samples)["p50"]
+                print(f"{name:<18} {matches:>8} {label:>7} {p50:>8.1f} {pages:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
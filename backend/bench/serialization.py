@@ -0,0 +1,87 @@
+"""Serialisation time and bytes on the wire for GET /projects/{id}.
+
+"before" is the path FastAPI takes for a ``response_model`` route on the
+versions this repo supports: validate the returned model against the
+response model, ``jsonable_encoder`` it and ``json.dumps`` the result.
+"after" is ``responses.model_response``: one pydantic-core dump of the
+already-validated model. Wire sizes are for identity, gzip and brotli with
+the CompressionMiddleware defaults.
+
+    cd backend && python -m bench.serialization
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+from time import perf_counter
+
+from fastapi.encoders import jsonable_encoder
+
+from app.compression import CompressionMiddleware, brotli
+from app.queries import project_detail
+from app.responses import model_response
+from app.schemas import ProjectDetailResponse
+
+from .common import percentiles, seed_project, session_factory, temp_engine
+
+TASKS = 10_000
+REPEAT = 30
+
+
+def before(project: ProjectDetailResponse) -> bytes:
+    value = ProjectDetailResponse.model_validate(project)
+    return json.dumps(
+        jsonable_encoder(value),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def after(project: ProjectDetailResponse) -> bytes:
+    return model_response(project).body
+
+
+def _timed(fn, *args) -> dict:
+    samples = []
+    for _ in range(REPEAT):
+        start = perf_counter()
+        fn(*args)
+        samples.append((perf_counter() - start) * 1000)
+    return percentiles(samples)
+
+
+def main() -> None:
+    engine = temp_engine()
+    Session = session_factory(engine)
+    with Session() as db:
+        project_id = seed_project(db, TASKS)
+        project = project_detail(db, project_id)
+
+    print(f"{TASKS} tasks, {REPEAT} runs")
+    print(f"{'serialise':<10} {'bytes':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, fn in (("before", before), ("after", after)):
+        body = fn(project)
+        stats = _timed(fn, project)
+        print(f"{name:<10} {len(body):>9} {stats['p50']:>8.2f} {stats['p99']:>8.2f}")
+
+    options = CompressionMiddleware.options_from_env()
+    middleware = CompressionMiddleware(None, **options)
+    body = after(project)
+    encodings = ["gzip"] + (["br"] if brotli is not None else [])
+    print(f"\n{'encoding':<10} {'bytes':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    print(f"{'identity':<10} {len(body):>9} {'-':>8} {'-':>8}")
+    for encoding in encodings:
+        size = len(middleware._compress(body, encoding))
+        stats = _timed(middleware._compress, body, encoding)
+        print(f"{encoding:<10} {size:>9} {stats['p50']:>8.2f} {stats['p99']:>8.2f}")
+
+    # Sanity: both paths produce the same document.
+    assert json.loads(before(project)) == json.loads(after(project))
+    assert gzip.decompress(middleware._compress(body, "gzip")) == body
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Copying projects with GET /export and POST /import.
+
+Seeds PROJECTS projects of TASKS tasks each (via plan apply), then times
+reading them back with GET /export against one GET /projects/{id} per
+project, and writing them again with POST /import (streamed in chunks)
+against recreating them one request per row: POST /projects, the
+milestones via plan apply and POST /tasks per task, as a client without
+the import endpoint would.
+
+    cd backend && python -m bench.transfer
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from typing import Iterator
+
+import httpx
+
+from .common import running_server
+
+PROJECTS = 10
+TASKS = 1000
+MILESTONES = 10
+
+
+def _seed(client: httpx.Client) -> None:
+    for p in range(PROJECTS):
+        resp = client.post(
+            "/projects", json={"title": f"Project {p}", "goal_text": "Ship it."}
+        )
+        plan = {
+            "milestones": [
+                {"title": f"M{i}", "order_index": i} for i in range(MILESTONES)
+            ],
+            "tasks": [
+                {
+                    "title": f"Task {i}",
+                    "description": "Do the thing described here." * 4,
+                    "milestone_index": i % MILESTONES,
+                    "status": ("todo", "in_progress", "done")[i % 3],
+                    "order_index": i,
+                }
+                for i in range(TASKS)
+            ],
+        }
+        client.post(
+            f"/projects/{resp.json()['id']}/plan/apply", json=plan
+        ).raise_for_status()
+
+
+def _per_row(client: httpx.Client, lines) -> None:
+    milestone_ids = {}
+    for line in lines:
+        if line["type"] == "project":
+            fields = {k: line[k] for k in ("title", "goal_text", "hours_per_week")}
+            project_id = client.post("/projects", json=fields).json()["id"]
+            milestones = []
+        elif line["type"] == "milestone":
+            milestones.append(line)
+        else:
+            if milestones:
+                plan = {"milestones": milestones, "tasks": []}
+                applied = client.post(f"/projects/{project_id}/plan/apply", json=plan)
+                milestone_ids = {
+                    m["id"]: new["id"]
+                    for m, new in zip(milestones, applied.json()["milestones"])
+                }
+                milestones = []
+            task = {k: v for k, v in line.items() if k not in ("type", "id")}
+            task.update(
+                project_id=project_id,
+                milestone_id=milestone_ids.get(line["milestone_id"]),
+            )
+            client.post("/tasks", json=task).raise_for_status()
+
+
+def _chunks(data: bytes, size: int = 64 * 1024) -> Iterator[bytes]:
+    for i in range(0, len(data), size):
+        yield data[i : i + size]
+
+
+def _timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def main() -> None:
+    print(f"{PROJECTS} projects x {TASKS} tasks, {MILESTONES} milestones each")
+    with running_server() as url, httpx.Client(base_url=url, timeout=600) as client:
+        _seed(client)
+        ids = [p["id"] for p in client.get("/projects").json()]
+
+        exported = {}
+
+        def export() -> None:
+            exported["data"] = client.get("/export").content
+
+        read_export = _timed(export)
+        read_each = _timed(lambda: [client.get(f"/projects/{i}") for i in ids])
+        data = exported["data"]
+        lines = [json.loads(line) for line in data.splitlines()]
+
+        def do_import() -> None:
+            resp = client.post("/import", content=_chunks(data))
+            assert json.loads(resp.text.splitlines()[-1])["failed"] == 0
+
+        write_import = _timed(do_import)
+        write_each = _timed(lambda: _per_row(client, lines))
+
+    print(f"{len(lines)} lines, {len(data) / 1e6:.1f} MB")
+    print(f"{'':<8} {'per request ms':>15} {'stream ms':>10}")
+    print(f"{'read':<8} {read_each:>15.0f} {read_export:>10.0f}")
+    print(f"{'write':<8} {write_each:>15.0f} {write_import:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
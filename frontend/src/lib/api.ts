@@ -19,12 +19,40 @@ export type TaskStatus = "todo" | "in_progress" | "done";
 export type TaskSize = "S" | "M" | "L";
 
 // --- API Responses ---
+// Estimate weights: S=1, M=2, L=3; tasks without an estimate weigh 0.
+export type Progress = {
+  todo: number;
+  in_progress: number;
+  done: number;
+  task_count: number;
+  estimate_weight: number;
+  done_weight: number;
+  percent_done: number;
+};
+
 export type ProjectResponse = {
   id: number;
   title: string;
   goal_text: string;
   deadline?: string | null;
   hours_per_week?: number | null;
+  version: number;
+  progress: Progress;
+};
+
+export type ProjectSummary = {
+  id: number;
+  title: string;
+  goal_excerpt: string;
+  deadline?: string | null;
+  hours_per_week?: number | null;
+  task_count: number;
+  done_count: number;
+};
+
+export type ProjectSummaryPage = {
+  items: ProjectSummary[];
+  next_cursor?: string | null;
 };
 
 export type MilestoneResponse = {
@@ -50,6 +78,29 @@ export type ProjectDetailResponse = ProjectResponse & {
   tasks: TaskResponse[];
 };
 
+export type MilestoneProgress = {
+  id: number;
+  title: string;
+  progress: Progress;
+};
+
+export type ProjectStats = {
+  id: number;
+  version: number;
+  progress: Progress;
+  milestones: MilestoneProgress[];
+};
+
+export type ProjectChanges = {
+  since: number;
+  version: number;
+  milestones: MilestoneResponse[];
+  tasks: TaskResponse[];
+  deleted_milestone_ids: number[];
+  deleted_task_ids: number[];
+  progress?: Progress | null;
+};
+
 // --- Requests ---
 export type ProjectCreateRequest = {
   title: string;
@@ -79,6 +130,12 @@ export type TaskCreateRequest = {
   milestone_id?: number | null;
 };
 
+export type TaskOrderItem = {
+  id: number;
+  status: TaskStatus;
+  order_index: number;
+};
+
 // -----------------------------
 export type PlanGenerateInput = {
   goal_text: string;
@@ -111,7 +168,11 @@ export type PlanResponse = {
   tasks: ProposeTask[];
 };
 
-export type GeneratePlanResponse = PlanResponse;
+export type GeneratePlanResponse = PlanResponse & {
+  // Reused from a cached plan for a similar goal.
+  near_hit?: boolean;
+  similarity?: number | null;
+};
 
 export type RevisePlanInput = {
   goal_text: string;
@@ -129,6 +190,144 @@ export type PlanApplyInput = {
   tasks: ProposeTask[];
 };
 
+export type PlanApplyMode = "replace" | "diff";
+
+export type PlanApplyChanges = {
+  milestones_inserted: number;
+  milestones_updated: number;
+  milestones_deleted: number;
+  tasks_inserted: number;
+  tasks_updated: number;
+  tasks_deleted: number;
+};
+
+export type PlanApplyResponse = ProjectDetailResponse & {
+  changes?: PlanApplyChanges | null;
+};
+
+export type PlanJobStatus = "queued" | "running" | "succeeded" | "failed";
+
+export type PlanJobCreate = (
+  | { kind: "generate"; input: PlanGenerateInput }
+  | { kind: "revise"; input: RevisePlanInput }
+) & {
+  project_id?: number | null;
+  priority?: number;
+};
+
+export type PlanJob = {
+  id: string;
+  kind: "generate" | "revise";
+  status: PlanJobStatus;
+  priority: number;
+  project_id?: number | null;
+  attempts: number;
+  max_attempts: number;
+  error?: string | null;
+  result?: GeneratePlanResponse | null;
+  created_at: number;
+  run_after: number;
+  started_at?: number | null;
+  finished_at?: number | null;
+};
+
+export type BulkProjectItem = {
+  project: ProjectCreateRequest;
+  plan?: PlanGenerateInput | null;
+};
+
+export type BulkProjectResult = {
+  index: number;
+  status: "created" | "failed";
+  project?: ProjectResponse | null;
+  milestones: number;
+  tasks: number;
+  near_hit: boolean;
+  detail?: string | null;
+};
+
+export type BulkProjectSummary = {
+  created: number;
+  failed: number;
+  plans: number;
+};
+
+export type SearchKind = "task" | "project";
+
+export type SearchHit = {
+  kind: SearchKind;
+  id: number;
+  project_id: number;
+  project_title: string;
+  // HTML-escaped, matched words wrapped in <mark>
+  title: string;
+  snippet: string;
+  status?: TaskStatus | null;
+  score: number;
+};
+
+export type SearchPage = {
+  items: SearchHit[];
+  next_cursor?: string | null;
+};
+
+export type SearchFilters = {
+  kind?: SearchKind;
+  status?: TaskStatus;
+  project_id?: number;
+  limit?: number;
+  cursor?: string | null;
+};
+
+export type ImportResult = {
+  type: "project";
+  index?: number | null; // position among the file's projects
+  source_id?: number | null;
+  status: "created" | "failed";
+  id?: number | null;
+  milestones: number;
+  tasks: number;
+  detail?: string | null;
+};
+
+export type ImportSummary = {
+  type: "done";
+  created: number;
+  failed: number;
+  detail?: string | null;
+};
+
+export type PlanStreamHandlers = {
+  onMilestone?: (milestone: ProposeMilestone) => void;
+  onTask?: (task: ProposeTask) => void;
+};
+
+export type ProjectEventType =
+  | "ready"
+  | "resync"
+  | "task.created"
+  | "task.updated"
+  | "task.deleted"
+  | "tasks.reordered"
+  | "plan.applied"
+  | "project.deleted";
+
+export type ProjectEvent = {
+  type: ProjectEventType;
+  version: number;
+};
+
+const PROJECT_EVENT_TYPES: ProjectEventType[] = [
+  "ready",
+  "resync",
+  "task.created",
+  "task.updated",
+  "task.deleted",
+  "tasks.reordered",
+  "plan.applied",
+  "project.deleted",
+];
+
 // -----------------------------
 type RequestOptions = RequestInit & { signal?: AbortSignal };
 
@@ -144,30 +343,115 @@ async function request<T>(
     },
   });
 
-  if (!res.ok) {
-    let detail: string | undefined;
-    try {
-      const data = (await res.json()) as ApiErrorBody;
-      detail = data?.detail;
-    } catch {
-      // ignore JSON parse errors
-    }
-    const message = detail
-      ? `API error ${res.status}: ${detail}`
-      : `API error ${res.status}`;
-    throw new ApiError(res.status, message, detail);
-  }
+  if (!res.ok) await throwApiError(res);
 
   if (res.status === 204) return undefined as T;
 
   return (await res.json()) as T;
 }
 
+async function throwApiError(res: Response): Promise<never> {
+  let detail: string | undefined;
+  try {
+    const data = (await res.json()) as ApiErrorBody;
+    detail = data?.detail;
+  } catch {
+    // ignore JSON parse errors
+  }
+  const message = detail
+    ? `API error ${res.status}: ${detail}`
+    : `API error ${res.status}`;
+  throw new ApiError(res.status, message, detail);
+}
+
+// POSTs payload and calls onEvent for each SSE event in the response.
+async function postEventStream(
+  path: string,
+  payload: unknown,
+  onEvent: (event: string, data: unknown) => void,
+  signal?: AbortSignal,
+): Promise<void> {
+  const res = await fetch(`${BASE_URL}${path}`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+      Accept: "text/event-stream",
+    },
+    body: JSON.stringify(payload),
+    signal,
+  });
+  if (!res.ok || !res.body) await throwApiError(res);
+
+  const reader = res.body!.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = "";
+
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += value;
+
+    let sep: number;
+    while ((sep = buffer.indexOf("\n\n")) !== -1) {
+      const block = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+
+      let event = "message";
+      let data = "";
+      for (const line of block.split("\n")) {
+        if (line.startsWith("event:")) event = line.slice(6).trim();
+        else if (line.startsWith("data:")) data += line.slice(5).trim();
+      }
+      if (!data) continue;
+      onEvent(event, JSON.parse(data));
+    }
+  }
+}
+
+// Reads a plan SSE stream, calling the handlers for each milestone/task as it
+// arrives. Resolves with the final plan from the closing "plan" event.
+async function streamPlan(
+  path: string,
+  payload: unknown,
+  handlers: PlanStreamHandlers,
+  signal?: AbortSignal,
+): Promise<PlanResponse> {
+  let plan: PlanResponse | null = null;
+
+  await postEventStream(
+    path,
+    payload,
+    (event, parsed) => {
+      if (event === "milestone")
+        handlers.onMilestone?.(parsed as ProposeMilestone);
+      else if (event === "task") handlers.onTask?.(parsed as ProposeTask);
+      else if (event === "plan") plan = parsed as PlanResponse;
+      else if (event === "error") {
+        const detail = (parsed as ApiErrorBody).detail;
+        throw new ApiError(502, `API error 502: ${detail}`, detail);
+      }
+    },
+    signal,
+  );
+
+  if (!plan) throw new ApiError(502, "API error 502: plan stream ended early");
+  return plan;
+}
+
 // --- Projects ---
 export function listProjects(signal?: AbortSignal) {
   return request<ProjectResponse[]>("/projects", { signal });
 }
 
+export function listProjectSummaries(
+  cursor?: string | null,
+  signal?: AbortSignal,
+) {
+  const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : "";
+  return request<ProjectSummaryPage>(`/projects/summaries${query}`, {
+    signal,
+  });
+}
+
 export function createProject(
   payload: ProjectCreateRequest,
   signal?: AbortSignal,
@@ -179,17 +463,186 @@ export function createProject(
   });
 }
 
+// Creates projects with generated plans; onItem fires per project as it is
+// stored, in completion order.
+export async function bulkCreateProjects(
+  items: BulkProjectItem[],
+  onItem: (result: BulkProjectResult) => void,
+  signal?: AbortSignal,
+): Promise<BulkProjectSummary> {
+  let summary: BulkProjectSummary | null = null;
+  await postEventStream(
+    "/projects/bulk",
+    { items },
+    (event, data) => {
+      if (event === "item") onItem(data as BulkProjectResult);
+      else if (event === "done") summary = data as BulkProjectSummary;
+    },
+    signal,
+  );
+  if (!summary)
+    throw new ApiError(502, "API error 502: bulk stream ended early");
+  return summary;
+}
+
 export function getProject(projectId: number, signal?: AbortSignal) {
   return request<ProjectDetailResponse>(`/projects/${projectId}`, { signal });
 }
 
-export function deleteProject(projectId: number, signal?: AbortSignal) {
-  return request<{ ok: boolean }>(`/projects/${projectId}`, {
+export function getProjectStats(projectId: number, signal?: AbortSignal) {
+  return request<ProjectStats>(`/projects/${projectId}/stats`, { signal });
+}
+
+export function getProjectChanges(
+  projectId: number,
+  since: number,
+  signal?: AbortSignal,
+) {
+  return request<ProjectChanges>(
+    `/projects/${projectId}/changes?since=${since}`,
+    { signal },
+  );
+}
+
+function mergeRows<T extends { id: number; order_index: number }>(
+  rows: T[],
+  deleted: number[],
+  changed: T[],
+): T[] {
+  // Deletions first: a deleted id may be reused by a row created later.
+  const byId = new Map(rows.map((r) => [r.id, r]));
+  for (const id of deleted) byId.delete(id);
+  for (const r of changed) byId.set(r.id, r);
+  return [...byId.values()].sort((a, b) => a.order_index - b.order_index);
+}
+
+/** Apply a delta from getProjectChanges to a cached project. */
+export function applyProjectChanges(
+  project: ProjectDetailResponse,
+  changes: ProjectChanges,
+): ProjectDetailResponse {
+  if (changes.version === project.version) return project;
+  return {
+    ...project,
+    version: changes.version,
+    progress: changes.progress ?? project.progress,
+    milestones: mergeRows(
+      project.milestones,
+      changes.deleted_milestone_ids,
+      changes.milestones,
+    ),
+    tasks: mergeRows(project.tasks, changes.deleted_task_ids, changes.tasks),
+  };
+}
+
+/**
+ * Listen to a project's change feed. Events are hints: the caller should
+ * catch up with getProjectChanges. EventSource reconnects on its own and a
+ * fresh "ready" event follows every reconnect. Returns a close function.
+ */
+export function subscribeProjectEvents(
+  projectId: number,
+  onEvent: (event: ProjectEvent) => void,
+): () => void {
+  const source = new EventSource(`${BASE_URL}/projects/${projectId}/events`);
+  for (const type of PROJECT_EVENT_TYPES) {
+    source.addEventListener(type, (e) => {
+      const data = JSON.parse((e as MessageEvent).data);
+      onEvent({ type, version: data.version });
+      if (type === "project.deleted") source.close();
+    });
+  }
+  return () => source.close();
+}
+
+// soft: the server hides the project and purges its rows in the background.
+export function deleteProject(
+  projectId: number,
+  signal?: AbortSignal,
+  soft = true,
+) {
+  const query = soft ? "?soft=true" : "";
+  return request<{ ok: boolean }>(`/projects/${projectId}${query}`, {
     method: "DELETE",
     signal,
   });
 }
 
+export function reorderTasks(
+  projectId: number,
+  tasks: TaskOrderItem[],
+  signal?: AbortSignal,
+) {
+  return request<TaskOrderItem[]>(`/projects/${projectId}/tasks/order`, {
+    method: "PATCH",
+    body: JSON.stringify({ tasks }),
+    signal,
+  });
+}
+
+// --- Search ---
+export function search(
+  q: string,
+  filters: SearchFilters = {},
+  signal?: AbortSignal,
+) {
+  const params = new URLSearchParams({ q });
+  for (const [key, value] of Object.entries(filters)) {
+    if (value !== undefined && value !== null) params.set(key, String(value));
+  }
+  return request<SearchPage>(`/search?${params}`, { signal });
+}
+
+// --- Export / import (NDJSON) ---
+// Every project, or the given ones, as an NDJSON file.
+export async function exportProjects(
+  projectIds: number[] = [],
+  signal?: AbortSignal,
+): Promise<Blob> {
+  const params = new URLSearchParams();
+  for (const id of projectIds) params.append("project_id", String(id));
+  const query = projectIds.length ? `?${params}` : "";
+  const res = await fetch(`${BASE_URL}/export${query}`, { signal });
+  if (!res.ok) await throwApiError(res);
+  return res.blob();
+}
+
+// Uploads an export file; onResult fires per project as it is committed.
+export async function importProjects(
+  file: Blob,
+  onResult: (result: ImportResult) => void,
+  signal?: AbortSignal,
+): Promise<ImportSummary> {
+  const res = await fetch(`${BASE_URL}/import`, {
+    method: "POST",
+    headers: { "Content-Type": "application/x-ndjson" },
+    body: file,
+    signal,
+  });
+  if (!res.ok || !res.body) await throwApiError(res);
+
+  const reader = res.body!.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = "";
+  let summary: ImportSummary | null = null;
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += value;
+    let sep: number;
+    while ((sep = buffer.indexOf("\n")) !== -1) {
+      const line = buffer.slice(0, sep).trim();
+      buffer = buffer.slice(sep + 1);
+      if (!line) continue;
+      const data = JSON.parse(line) as ImportResult | ImportSummary;
+      if (data.type === "done") summary = data;
+      else onResult(data);
+    }
+  }
+  if (!summary)
+    throw new ApiError(502, "API error 502: import stream ended early");
+  return summary;
+}
+
 // --- Tasks ---
 export function createTask(payload: TaskCreateRequest, signal?: AbortSignal) {
   return request<TaskResponse>("/tasks", {
@@ -243,16 +696,48 @@ export function revisePlan(
   });
 }
 
+export function generatePlanStream(
+  projectId: number,
+  payload: PlanGenerateInput,
+  handlers: PlanStreamHandlers,
+  signal?: AbortSignal,
+) {
+  return streamPlan(
+    `/projects/${projectId}/plan/generate/stream`,
+    payload,
+    handlers,
+    signal,
+  );
+}
+
+export function revisePlanStream(
+  projectId: number,
+  payload: RevisePlanInput,
+  handlers: PlanStreamHandlers,
+  signal?: AbortSignal,
+) {
+  return streamPlan(
+    `/projects/${projectId}/plan/revise/stream`,
+    payload,
+    handlers,
+    signal,
+  );
+}
+
 export function applyPlan(
   projectId: number,
   payload: PlanApplyInput,
   signal?: AbortSignal,
+  mode: PlanApplyMode = "replace",
 ) {
-  return request<ProjectDetailResponse>(`/projects/${projectId}/plan/apply`, {
-    method: "POST",
-    body: JSON.stringify(payload),
-    signal,
-  });
+  return request<PlanApplyResponse>(
+    `/projects/${projectId}/plan/apply?mode=${mode}`,
+    {
+      method: "POST",
+      body: JSON.stringify(payload),
+      signal,
+    },
+  );
 }
 
 // --- Draft plans ---
@@ -277,3 +762,43 @@ export function revisePlanDraft(
     signal,
   });
 }
+
+export function generatePlanDraftStream(
+  payload: PlanGenerateInput,
+  handlers: PlanStreamHandlers,
+  signal?: AbortSignal,
+) {
+  return streamPlan("/plan/generate/stream", payload, handlers, signal);
+}
+
+export function revisePlanDraftStream(
+  payload: RevisePlanInput,
+  handlers: PlanStreamHandlers,
+  signal?: AbortSignal,
+) {
+  return streamPlan("/plan/revise/stream", payload, handlers, signal);
+}
+
+// --- Plan jobs ---
+export function createPlanJob(payload: PlanJobCreate, signal?: AbortSignal) {
+  return request<PlanJob>("/plan/jobs", {
+    method: "POST",
+    body: JSON.stringify(payload),
+    signal,
+  });
+}
+
+// ``wait`` long-polls up to that many seconds (max 30) for the job to finish.
+export function getPlanJob(jobId: string, wait = 0, signal?: AbortSignal) {
+  return request<PlanJob>(
+    `/plan/jobs/${encodeURIComponent(jobId)}?wait=${wait}`,
+    { signal },
+  );
+}
+
+export async function waitForPlanJob(jobId: string, signal?: AbortSignal) {
+  for (;;) {
+    const job = await getPlanJob(jobId, 30, signal);
+    if (job.status === "succeeded" || job.status === "failed") return job;
+  }
+}